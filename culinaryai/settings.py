@@ -80,6 +80,21 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
 }
 AUTH_USER_MODEL = "users.User"
+
+# Per-process LRU budget for cached recommendation rankings (recipes.cache)
+RECOMMENDATION_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# Per-process LRU budget for rendered recipe detail JSON (recipes.cache)
+RECIPE_DETAIL_CACHE_MAX_BYTES = 32 * 1024 * 1024
+
+# Barcodes kept in each process's LRU in front of the product catalog (pantry.products)
+PRODUCT_CACHE_SIZE = 50_000
+
+# Longest substitution chain (butter -> margarine -> oil) considered when covering a missing ingredient
+SUBSTITUTION_MAX_HOPS = 2
+
+# Worker processes rendering recipe image variants (recipes.thumbnails); 0 renders inline
+RECIPE_THUMBNAIL_WORKERS = 2
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
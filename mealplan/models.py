@@ -1,16 +1,20 @@
 from django.db import models
 from django.conf import settings
-from recipes.models import Recipe
-from pantry.models import PantryItem
+from recipes.models import Recipe, VersionBumpMixin
+from recipes.units import from_base
+from pantry.models import PantryChange, PantryItem
 from django.utils import timezone
+from collections import defaultdict
 from datetime import timedelta
 
 # ---------------- Weekly Meal Plan ----------------
-class MealPlan(models.Model):
+class MealPlan(VersionBumpMixin, models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="meal_plans")
     week_start = models.DateField()  # Monday of the week
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Bumped on every write to the plan or its daily meals; drives ETag/Last-Modified
+    version = models.PositiveIntegerField(default=1, editable=False)
 
     class Meta:
         unique_together = ["user", "week_start"]
@@ -49,13 +53,47 @@ class CookingEvent(models.Model):
     cooked_at = models.DateTimeField(auto_now_add=True)
 
     def deduct_ingredients(self):
-        pantry_items = {item.name.lower(): item for item in self.daily_meal.recipe.created_by.pantry_items.all()}
-        for ing in self.daily_meal.recipe.ingredients.all():
-            qty_needed = ing.quantity * self.daily_meal.servings
-            pantry_item = pantry_items.get(ing.name.lower())
-            if pantry_item:
-                pantry_item.quantity = max(0, pantry_item.quantity - qty_needed)
-                pantry_item.save()
+        """
+        Take the recipe's ingredients out of the pantry of the meal plan's owner (the
+        person cooking, not the recipe's author), comparing base quantities
+        (recipes.units) so cups come off litres; earliest-expiring items go first.
+        Ingredients whose unit has no base quantity ("2 cloves", "1 can") can't be
+        weighed against the pantry; their names are left in self.not_deducted.
+        """
+        self.not_deducted = []
+        recipe = self.daily_meal.recipe
+        if recipe is None:
+            return
+        needed = defaultdict(float)  # (catalog id, base unit) -> base quantity
+        rows = recipe.ingredients.filter(catalog__isnull=False)
+        for name, catalog_id, base_quantity, base_unit in rows.values_list(
+            "name", "catalog_id", "base_quantity", "base_unit"
+        ):
+            if base_quantity is None:
+                self.not_deducted.append(name)
+                continue
+            needed[catalog_id, base_unit] += base_quantity * self.daily_meal.servings
+        if not needed:
+            return
+
+        user = self.daily_meal.meal_plan.user
+        now = timezone.now()
+        changed = []
+        items = user.pantry_items.filter(
+            catalog_id__in={catalog_id for catalog_id, _ in needed}, base_quantity__gt=0
+        ).order_by("expiry_date", "id")
+        for item in items:
+            key = (item.catalog_id, item.base_unit)
+            if needed.get(key, 0) <= 0:
+                continue
+            taken = min(item.base_quantity, needed[key])
+            needed[key] -= taken
+            item.base_quantity -= taken
+            item.quantity = from_base(item.base_quantity, item.unit, item.name)
+            item.updated_at = now
+            changed.append(item)
+        PantryItem.objects.bulk_update(changed, ["quantity", "base_quantity", "updated_at"])
+        PantryChange.objects.record(user.id, [item.pk for item in changed])
 
     def save(self, *args, **kwargs):
         super().save(*args, **kwargs)
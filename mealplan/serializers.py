@@ -1,14 +1,21 @@
 from rest_framework import serializers
 from .models import MealPlan, DailyMeal, CookingEvent
-from recipes.serializers import RecipeSerializer
+from recipes.serializers import RecipeSummary
 
 class DailyMealSerializer(serializers.ModelSerializer):
-    recipe_details = RecipeSerializer(source='recipe', read_only=True)
+    recipe_details = serializers.SerializerMethodField(read_only=True)
 
     class Meta:
         model = DailyMeal
         fields = ['id', 'day', 'recipe', 'recipe_details', 'servings']
 
+    def get_recipe_details(self, obj):
+        # One RecipeSummary per response; MealPlanViewSet primes it with every plan's recipes
+        summary = self.context.get('recipe_summary')
+        if summary is None:
+            summary = self.context['recipe_summary'] = RecipeSummary(self.context.get('request'))
+        return summary.get(obj.recipe_id)
+
 
 class MealPlanSerializer(serializers.ModelSerializer):
     daily_meals = DailyMealSerializer(many=True, read_only=True)
@@ -19,7 +26,13 @@ class MealPlanSerializer(serializers.ModelSerializer):
 
 
 class CookingEventSerializer(serializers.ModelSerializer):
+    # Ingredients left in the pantry because their unit doesn't convert (set when cooked)
+    not_deducted = serializers.SerializerMethodField(read_only=True)
+
     class Meta:
         model = CookingEvent
-        fields = ['id', 'daily_meal', 'cooked_at']
-        read_only_fields = ['cooked_at']
\ No newline at end of file
+        fields = ['id', 'daily_meal', 'cooked_at', 'not_deducted']
+        read_only_fields = ['cooked_at']
+
+    def get_not_deducted(self, obj):
+        return getattr(obj, 'not_deducted', [])
\ No newline at end of file
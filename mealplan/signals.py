@@ -0,0 +1,10 @@
+from django.db.models import F
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+from .models import MealPlan, DailyMeal
+
+
+@receiver([post_save, post_delete], sender=DailyMeal)
+def touch_meal_plan(sender, instance, **kwargs):
+    MealPlan.objects.filter(pk=instance.meal_plan_id).update(version=F('version') + 1, updated_at=timezone.now())
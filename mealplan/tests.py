@@ -1,3 +1,94 @@
+from datetime import date, timedelta
+
 from django.test import TestCase
+from rest_framework.test import APIClient
+
+from pantry.models import PantryChange, PantryItem
+from recipes.models import Ingredient, Recipe
+from users.models import User
+from .models import DailyMeal, MealPlan
+
+
+class CookTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user("author", "author@example.com", "pw")
+        self.cook = User.objects.create_user("cook", "cook@example.com", "pw")
+        self.recipe = Recipe.objects.create(name="Garlic milk", created_by=self.author)
+        Ingredient.objects.create(recipe=self.recipe, name="milk", quantity=1, unit="cups")
+        Ingredient.objects.create(recipe=self.recipe, name="garlic", quantity=2, unit="cloves")
+        self.plan = MealPlan.objects.create(user=self.cook, week_start=date(2026, 10, 12))
+        DailyMeal.objects.create(meal_plan=self.plan, day="monday", recipe=self.recipe, servings=2)
+        self.client = APIClient()
+        self.client.force_authenticate(self.cook)
+
+    def cook_monday(self):
+        return self.client.post(f"/api/mealplans/{self.plan.id}/cook/", {"day": "monday"}, format="json")
+
+    def test_deducts_from_the_plan_owners_pantry_in_base_units(self):
+        today = date.today()
+        soon = PantryItem.objects.create(
+            user=self.cook, name="milk", quantity=0.25, unit="l", expiry_date=today + timedelta(days=1)
+        )
+        later = PantryItem.objects.create(
+            user=self.cook, name="Milk", quantity=1, unit="l", expiry_date=today + timedelta(days=5)
+        )
+        authors = PantryItem.objects.create(user=self.author, name="milk", quantity=1, unit="l")
+        garlic = PantryItem.objects.create(user=self.cook, name="garlic", quantity=3, unit="pcs")
+
+        response = self.cook_monday()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["not_deducted"], ["garlic"])
+        for item in (soon, later, authors, garlic):
+            item.refresh_from_db()
+        # 2 servings x 1 cup = 0.473 l: the quarter litre expiring first is used up first
+        self.assertAlmostEqual(soon.quantity, 0)
+        self.assertAlmostEqual(later.quantity, 1 - (2 * 0.236588 - 0.25), places=6)
+        self.assertEqual((authors.quantity, garlic.quantity), (1, 3))
+        changed = PantryChange.objects.filter(user=self.cook).order_by("-id")[:2]
+        self.assertEqual({change.item_id for change in changed}, {soon.id, later.id})
+
+    def test_cooking_twice_deducts_once(self):
+        milk = PantryItem.objects.create(user=self.cook, name="milk", quantity=1, unit="l")
+        self.cook_monday()
+        self.cook_monday()
+        milk.refresh_from_db()
+        self.assertAlmostEqual(milk.quantity, 1 - 2 * 0.236588, places=6)
+
+
+class MealPlanETagTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("cook", "cook@example.com", "pw")
+        self.planned = Recipe.objects.create(name="Planned")
+        self.other = Recipe.objects.create(name="Other")
+        self.plan = MealPlan.objects.create(user=self.user, week_start=date(2026, 10, 12))
+        DailyMeal.objects.create(meal_plan=self.plan, day="monday", recipe=self.planned)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def etags(self):
+        detail = self.client.get(f"/api/mealplans/{self.plan.id}/")
+        return self.client.get("/api/mealplans/")["ETag"], detail["ETag"]
+
+    def test_unreferenced_recipe_write_keeps_the_etag(self):
+        before = self.etags()
+        self.other.name = "Renamed"
+        self.other.save()
+        Ingredient.objects.create(recipe=self.other, name="salt", quantity=1)
+        self.assertEqual(self.etags(), before)
+
+    def test_referenced_recipe_write_changes_the_etag(self):
+        before = self.etags()
+        Ingredient.objects.create(recipe=self.planned, name="salt", quantity=1)
+        after = self.etags()
+        self.assertNotEqual(after[0], before[0])
+        self.assertNotEqual(after[1], before[1])
+        response = self.client.get(f"/api/mealplans/{self.plan.id}/", HTTP_IF_NONE_MATCH=after[1])
+        self.assertEqual(response.status_code, 304)
 
-# Create your tests here.
+    def test_referenced_recipe_delete_changes_the_etag(self):
+        before = self.etags()
+        self.planned.delete()
+        after = self.etags()
+        self.assertNotEqual(after[0], before[0])
+        self.assertNotEqual(after[1], before[1])
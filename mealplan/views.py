@@ -5,6 +5,9 @@ from rest_framework.response import Response
 from .models import MealPlan, DailyMeal, CookingEvent
 from .serializers import MealPlanSerializer, DailyMealSerializer, CookingEventSerializer
 from recipes.models import Recipe
+from recipes.allergens import mask_for_allergies
+from recipes.serializers import RecipeSummary
+from recipes.versioning import collection_stamp, conditional_response, favorites_stamp, latest, make_etag
 from django.utils import timezone
 from datetime import timedelta, date
 
@@ -13,7 +16,59 @@ class MealPlanViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return MealPlan.objects.filter(user=self.request.user).order_by('-week_start')
+        return MealPlan.objects.filter(user=self.request.user).prefetch_related(
+            'daily_meals'
+        ).order_by('-week_start')
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['recipe_summary'] = RecipeSummary(self.request)
+        return context
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        if args:
+            # Load every recipe summary the plans reference in one query
+            plans = args[0] if kwargs.get('many') else [args[0]]
+            serializer.context['recipe_summary'].prime(
+                meal.recipe_id for plan in plans for meal in plan.daily_meals.all()
+            )
+        return serializer
+
+    # ---------------- Conditional reads ----------------
+    # Plans embed recipe summaries, so the stamps of the recipes they reference and the
+    # favorites stamp are part of the ETag; writes to other recipes leave it alone
+    def recipes_stamp(self, plans):
+        """(count, latest updated_at) of the recipes the plans' daily meals reference."""
+        meals = DailyMeal.objects.filter(meal_plan__in=plans).values('recipe_id')
+        return collection_stamp(Recipe.objects.filter(id__in=meals), 'updated_at')
+
+    def list(self, request, *args, **kwargs):
+        plans, last_planned = collection_stamp(self.get_queryset(), 'updated_at')
+        recipes, last_updated = self.recipes_stamp(self.get_queryset())
+        favorites, last_favorited = favorites_stamp(request.user)
+        etag = make_etag('mealplans', plans, last_planned, recipes, last_updated, favorites, last_favorited)
+        return conditional_response(
+            request, etag, latest(last_planned, last_updated, last_favorited),
+            lambda: super(MealPlanViewSet, self).list(request, *args, **kwargs),
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            pk = int(kwargs['pk'])
+        except ValueError:
+            return super().retrieve(request, *args, **kwargs)
+        stamp = self.get_queryset().filter(pk=pk).values_list('version', 'updated_at').first()
+        if stamp is None:
+            return super().retrieve(request, *args, **kwargs)
+        version, last_planned = stamp
+        recipes, last_updated = self.recipes_stamp(self.get_queryset().filter(pk=pk))
+        favorites, last_favorited = favorites_stamp(request.user)
+        etag = make_etag('mealplan', pk, version, recipes, last_updated, favorites, last_favorited)
+        return conditional_response(
+            request, etag, latest(last_planned, last_updated, last_favorited),
+            lambda: super(MealPlanViewSet, self).retrieve(request, *args, **kwargs),
+        )
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
@@ -30,29 +85,25 @@ class MealPlanViewSet(viewsets.ModelViewSet):
         meal_plan = MealPlan.objects.create(user=user, week_start=monday)
 
         # User data
-        pantry_items = {item.name.lower() for item in user.pantry_items.all()}
-        allergies = {a.allergy_type.lower() for a in user.allergies.all()}
+        allergy_mask = mask_for_allergies(user.allergies.values_list('allergy_type', flat=True))
         dietary_pref = getattr(user, 'dietary_profile', None)
 
-        # Filter recipes
+        # Filter recipes: allergens in SQL via the precomputed bitmask
         recipes = []
-        for recipe in Recipe.objects.all().prefetch_related('ingredients'):
-            ing_names = {ing.name.lower() for ing in recipe.ingredients.all()}
-            if ing_names & allergies:
-                continue
+        for recipe_id, tags in Recipe.objects.without_allergens(allergy_mask).values_list('id', 'allergens'):
             if dietary_pref and dietary_pref.dietary_preference != 'none':
-                recipe_tags = {tag.lower() for tag in recipe.allergens}
+                recipe_tags = {tag.lower() for tag in tags}
                 if dietary_pref.dietary_preference.lower() not in recipe_tags:
                     continue
-            recipes.append(recipe)
+            recipes.append(recipe_id)
 
         days = ['monday','tuesday','wednesday','thursday','friday','saturday','sunday']
         for i, day in enumerate(days):
             if recipes:
-                recipe = recipes[i % len(recipes)]
-                DailyMeal.objects.create(meal_plan=meal_plan, day=day, recipe=recipe)
+                recipe_id = recipes[i % len(recipes)]
+                DailyMeal.objects.create(meal_plan=meal_plan, day=day, recipe_id=recipe_id)
 
-        serializer = MealPlanSerializer(meal_plan, context={'request': request})
+        serializer = self.get_serializer(meal_plan)
         return Response(serializer.data)
 
     # ---------------- Add Recipe to a Day ----------------
@@ -71,7 +122,7 @@ class MealPlanViewSet(viewsets.ModelViewSet):
             day=day,
             defaults={"recipe_id": recipe_id, "servings": servings}
         )
-        serializer = DailyMealSerializer(daily_meal)
+        serializer = DailyMealSerializer(daily_meal, context={'request': request})
         return Response(serializer.data)
 
     # ---------------- Cook Daily Meal ----------------
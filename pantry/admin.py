@@ -1,6 +1,12 @@
 from django.contrib import admin
-from .models import PantryItem
+from .models import PantryItem, Product
 
 @admin.register(PantryItem)
 class PantryItemAdmin(admin.ModelAdmin):
-    list_display = ('name', 'category', 'quantity', 'user', 'expiry_date')
\ No newline at end of file
+    list_display = ('name', 'category', 'quantity', 'user', 'expiry_date')
+
+
+@admin.register(Product)
+class ProductAdmin(admin.ModelAdmin):
+    list_display = ('barcode', 'name', 'category', 'unit', 'shelf_life_days')
+    search_fields = ('barcode', 'name')
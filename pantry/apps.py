@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class PantryConfig(AppConfig):
     name = 'pantry'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from recipes.migrations._catalog import resolver
+
+
+def backfill_pantryitem_catalog(apps, schema_editor):
+    PantryItem = apps.get_model('pantry', 'PantryItem')
+    resolve = resolver(apps)
+    for obj in PantryItem.objects.only('id', 'name').iterator():
+        obj.catalog_id = resolve(obj.name)
+        obj.save(update_fields=['catalog'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pantry', '0008_pantryitem_user'),
+        ('recipes', '0008_ingredient_catalog'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pantryitem',
+            name='catalog',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='pantry_items', to='recipes.ingredientcatalog'),
+        ),
+        migrations.RunPython(backfill_pantryitem_catalog, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:25
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_changes(apps, schema_editor):
+    PantryItem = apps.get_model('pantry', 'PantryItem')
+    PantryChange = apps.get_model('pantry', 'PantryChange')
+    PantryItem.objects.update(updated_at=models.F('created_at'))
+    PantryChange.objects.bulk_create(
+        [PantryChange(user_id=user_id, item_id=item_id)
+         for item_id, user_id in PantryItem.objects.order_by('id').values_list('id', 'user_id')],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pantry', '0009_pantryitem_catalog'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pantryitem',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.CreateModel(
+            name='PantryChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('item_id', models.BigIntegerField()),
+                ('deleted', models.BooleanField(default=False)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pantry_changes', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'id'], name='pantry_change_seq_idx'), models.Index(fields=['user', 'item_id'], name='pantry_change_item_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_changes, migrations.RunPython.noop),
+    ]
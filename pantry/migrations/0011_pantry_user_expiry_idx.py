@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:27
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pantry', '0010_pantry_changes'),
+        ('recipes', '0015_recipe_similarity'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='pantryitem',
+            index=models.Index(fields=['user', 'expiry_date'], name='pantry_user_expiry_idx'),
+        ),
+    ]
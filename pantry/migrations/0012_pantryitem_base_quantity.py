@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:28
+
+from django.db import migrations, models
+
+from recipes.migrations._units import set_base_quantity
+
+
+def backfill_pantryitem_base_quantity(apps, schema_editor):
+    PantryItem = apps.get_model('pantry', 'PantryItem')
+    rows = list(PantryItem.objects.only('id', 'name', 'quantity', 'unit'))
+    for obj in rows:
+        set_base_quantity(obj)
+    PantryItem.objects.bulk_update(rows, ['base_quantity', 'base_unit'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pantry', '0011_pantry_user_expiry_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pantryitem',
+            name='base_quantity',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='pantryitem',
+            name='base_unit',
+            field=models.CharField(blank=True, default='', editable=False, max_length=3),
+        ),
+        migrations.RunPython(backfill_pantryitem_base_quantity, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pantry', '0012_pantryitem_base_quantity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Product',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('barcode', models.CharField(max_length=32, unique=True)),
+                ('name', models.CharField(max_length=150)),
+                ('category', models.CharField(choices=[('vegetable', 'Vegetable'), ('fruit', 'Fruit'), ('dairy', 'Dairy'), ('protein', 'Protein'), ('spice', 'Spice'), ('baking', 'Baking'), ('other', 'Other')], default='other', max_length=50)),
+                ('unit', models.CharField(choices=[('kg', 'Kilogram'), ('g', 'Gram'), ('l', 'Liter'), ('ml', 'Milliliter'), ('pcs', 'Pieces')], default='pcs', max_length=10)),
+                ('shelf_life_days', models.PositiveIntegerField(blank=True, null=True)),
+            ],
+        ),
+    ]
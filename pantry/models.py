@@ -2,6 +2,8 @@ from django.db import models
 from django.utils import timezone
 from datetime import timedelta
 from django.conf import settings
+from recipes.models import IngredientCatalog
+from recipes.units import set_base_quantity
 
 
 def default_expiry_date():
@@ -37,6 +39,30 @@ class PantryItem(models.Model):
     expiry_date = models.DateField(default=default_expiry_date)
     barcode = models.CharField(max_length=100, blank=True, null=True)
     created_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True)
+    catalog = models.ForeignKey(
+        IngredientCatalog, on_delete=models.SET_NULL, null=True, blank=True,
+        editable=False, related_name="pantry_items"
+    )
+    # quantity/unit converted to grams, millilitres or pieces (see recipes.units)
+    base_quantity = models.FloatField(null=True, blank=True, editable=False)
+    base_unit = models.CharField(max_length=3, blank=True, default="", editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "expiry_date"], name="pantry_user_expiry_idx"),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.catalog_id = IngredientCatalog.objects.resolve(self.name)
+        set_base_quantity(self)
+        if kwargs.get("update_fields") is not None:
+            kwargs["update_fields"] = {*kwargs["update_fields"], "updated_at"}
+            if "name" in kwargs["update_fields"]:
+                kwargs["update_fields"].add("catalog")
+            if kwargs["update_fields"] & {"name", "quantity", "unit"}:
+                kwargs["update_fields"] |= {"base_quantity", "base_unit"}
+        super().save(*args, **kwargs)
 
     def is_expiring_soon(self):
         return (self.expiry_date - timezone.now().date()).days <= 3
@@ -45,4 +71,48 @@ class PantryItem(models.Model):
         return self.quantity <= 1
 
     def __str__(self):
-        return self.name
\ No newline at end of file
+        return self.name
+
+
+class Product(models.Model):
+    """Local barcode catalog for POST scan/, loaded with the import_products command."""
+    barcode = models.CharField(max_length=32, unique=True)
+    name = models.CharField(max_length=150)
+    category = models.CharField(max_length=50, choices=PantryItem.CATEGORY_CHOICES, default="other")
+    unit = models.CharField(max_length=10, choices=PantryItem.UNIT_CHOICES, default="pcs")
+    # Days from purchase to expiry; None leaves PantryItem's default
+    shelf_life_days = models.PositiveIntegerField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.barcode} {self.name}"
+
+
+class PantryChangeManager(models.Manager):
+    def record(self, user_id, item_ids, deleted=False):
+        """Give each item a new, higher sequence number (its id in this table)."""
+        item_ids = list(item_ids)
+        if not item_ids:
+            return
+        self.filter(user_id=user_id, item_id__in=item_ids).delete()
+        self.bulk_create([self.model(user_id=user_id, item_id=i, deleted=deleted) for i in item_ids])
+
+
+class PantryChange(models.Model):
+    """
+    Latest change to each of a user's pantry items, for delta sync (GET changes/).
+    Every write replaces the item's row, so the auto-increment id is a change sequence
+    and the table holds one row per item: live items plus tombstones for deleted ones.
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="pantry_changes"
+    )
+    item_id = models.BigIntegerField()
+    deleted = models.BooleanField(default=False)
+
+    objects = PantryChangeManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "id"], name="pantry_change_seq_idx"),
+            models.Index(fields=["user", "item_id"], name="pantry_change_item_idx"),
+        ]
@@ -0,0 +1,122 @@
+"""
+Barcode lookups against the local Product catalog.
+
+Lookups go through an in-process LRU (settings.PRODUCT_CACHE_SIZE entries) in front of
+the unique index on Product.barcode, so repeat scans never touch the database. Unknown
+codes are not cached, so products imported later are found straight away; edits to a
+product reach other processes when its entry is evicted or they restart.
+
+CSV and SQLite catalogs both carry barcode, name, category, unit and shelf_life_days
+(in a "products" table for SQLite). Unknown categories and units fall back to the
+PantryItem defaults.
+"""
+import csv
+import sqlite3
+from functools import lru_cache
+
+from django.conf import settings
+
+from .models import PantryItem, Product
+
+COLUMNS = ("barcode", "name", "category", "unit", "shelf_life_days")
+_CATEGORIES = {value for value, _ in PantryItem.CATEGORY_CHOICES}
+_UNITS = {value for value, _ in PantryItem.UNIT_CHOICES}
+
+
+def normalize_barcode(code):
+    return "".join((code or "").split())
+
+
+@lru_cache(maxsize=getattr(settings, "PRODUCT_CACHE_SIZE", 50_000))
+def _cached(barcode):
+    row = Product.objects.filter(barcode=barcode).values(*COLUMNS).first()
+    if row is None:
+        raise KeyError(barcode)
+    return row
+
+
+def lookup_product(code):
+    """{barcode, name, category, unit, shelf_life_days} for a barcode, or None."""
+    try:
+        return dict(_cached(normalize_barcode(code)))
+    except KeyError:
+        return None
+
+
+def clear_cache():
+    _cached.cache_clear()
+
+
+def cache_stats():
+    info = _cached.cache_info()
+    lookups = info.hits + info.misses
+    return {
+        "entries": info.currsize,
+        "max_entries": info.maxsize,
+        "hits": info.hits,
+        "misses": info.misses,
+        "hit_rate": info.hits / lookups if lookups else 0.0,
+    }
+
+
+# ---------------- catalog import ----------------
+def _csv_rows(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        yield from csv.DictReader(f)
+
+
+def _sqlite_rows(path):
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    conn.row_factory = sqlite3.Row
+    try:
+        yield from (dict(row) for row in conn.execute(f"SELECT {', '.join(COLUMNS)} FROM products"))
+    finally:
+        conn.close()
+
+
+def _product(row):
+    barcode = normalize_barcode(str(row.get("barcode") or ""))
+    name = (row.get("name") or "").strip()
+    if not barcode or not name:
+        return None
+    category = (row.get("category") or "").strip().lower()
+    unit = (row.get("unit") or "").strip().lower()
+    try:
+        shelf_life = int(row["shelf_life_days"])
+    except (KeyError, TypeError, ValueError):
+        shelf_life = None
+    return Product(
+        barcode=barcode, name=name,
+        category=category if category in _CATEGORIES else "other",
+        unit=unit if unit in _UNITS else "pcs",
+        shelf_life_days=shelf_life if shelf_life is not None and shelf_life >= 0 else None,
+    )
+
+
+def import_products(path, chunk_size=1000):
+    """Upsert a CSV or SQLite (.sqlite/.sqlite3/.db) catalog by barcode; returns (rows, imported)."""
+    rows = _sqlite_rows(path) if path.lower().endswith((".sqlite", ".sqlite3", ".db")) else _csv_rows(path)
+    total = imported = 0
+    chunk = {}
+
+    def flush():
+        Product.objects.bulk_create(
+            chunk.values(), update_conflicts=True, unique_fields=["barcode"],
+            update_fields=["name", "category", "unit", "shelf_life_days"],
+        )
+
+    for row in rows:
+        total += 1
+        product = _product(row)
+        if product is None:
+            continue
+        chunk[product.barcode] = product
+        if len(chunk) >= chunk_size:
+            flush()
+            imported += len(chunk)
+            chunk = {}
+    if chunk:
+        flush()
+        imported += len(chunk)
+    clear_cache()
+    return total, imported
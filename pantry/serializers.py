@@ -14,4 +14,25 @@ class PantryItemSerializer(serializers.ModelSerializer):
         return obj.is_expiring_soon()
 
     def get_low_stock(self, obj):
-        return obj.is_low_stock()
\ No newline at end of file
+        return obj.is_low_stock()
+
+class PantryBatchOperationSerializer(serializers.Serializer):
+    """One entry of a batch request: create (data), update (id + partial data) or delete (id)."""
+    OPS = ("create", "update", "delete")
+
+    op = serializers.ChoiceField(choices=OPS)
+    id = serializers.IntegerField(required=False)
+    data = serializers.DictField(required=False)
+
+    def validate(self, attrs):
+        if attrs["op"] == "create" and "id" in attrs:
+            raise serializers.ValidationError({"id": "Not allowed when creating."})
+        if attrs["op"] != "create" and "id" not in attrs:
+            raise serializers.ValidationError({"id": "This field is required."})
+        if attrs["op"] != "delete" and "data" not in attrs:
+            raise serializers.ValidationError({"data": "This field is required."})
+        return attrs
+
+class BarcodeScanSerializer(serializers.Serializer):
+    """Body of POST scan/; numeric JSON barcodes are taken as their digits."""
+    barcode = serializers.CharField(max_length=100)
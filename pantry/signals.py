@@ -0,0 +1,22 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import PantryItem, PantryChange, Product
+from .products import clear_cache
+
+
+@receiver(post_save, sender=PantryItem)
+def record_pantry_change(sender, instance, **kwargs):
+    PantryChange.objects.record(instance.user_id, [instance.pk])
+
+
+@receiver(post_delete, sender=PantryItem)
+def record_pantry_tombstone(sender, instance, origin=None, **kwargs):
+    # Deleting the user takes their change log with it
+    if not isinstance(origin, get_user_model()):
+        PantryChange.objects.record(instance.user_id, [instance.pk], deleted=True)
+
+
+@receiver([post_save, post_delete], sender=Product)
+def clear_product_cache(sender, **kwargs):
+    clear_cache()
@@ -1,3 +1,193 @@
+from datetime import date, timedelta
+
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from users.models import User
+from .models import PantryChange, PantryItem, Product
+from .products import clear_cache
+
+
+class CleanupSuggestionsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("cook", "cook@example.com", "pw")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        today = date.today()
+        self.expired = PantryItem.objects.create(
+            user=self.user, name="milk", quantity=1, expiry_date=today - timedelta(days=1)
+        )
+        self.expiring = PantryItem.objects.create(
+            user=self.user, name="spinach", quantity=3, expiry_date=today + timedelta(days=2)
+        )
+        self.low = PantryItem.objects.create(
+            user=self.user, name="rice", quantity=0.5, expiry_date=today + timedelta(days=30)
+        )
+        PantryItem.objects.create(user=self.user, name="flour", quantity=5, expiry_date=today + timedelta(days=30))
+        other = User.objects.create_user("other", "other@example.com", "pw")
+        PantryItem.objects.create(user=other, name="egg", quantity=1, expiry_date=today)
+
+    def test_buckets(self):
+        response = self.client.get("/api/pantry/cleanup-suggestions/")
+        self.assertEqual(response.status_code, 200)
+        ids = {bucket: [item["id"] for item in items] for bucket, items in response.data.items()}
+        self.assertEqual(ids, {
+            "expired": [self.expired.id],
+            "expiring_soon": [self.expiring.id],
+            "low_stock": [self.expired.id, self.low.id],
+        })
+
+    def test_single_query(self):
+        with self.assertNumQueries(1):
+            self.client.get("/api/pantry/cleanup-suggestions/")
+
+
+class BatchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("cook", "cook@example.com", "pw")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.milk = PantryItem.objects.create(user=self.user, name="milk", quantity=1)
+        self.rice = PantryItem.objects.create(user=self.user, name="rice", quantity=2)
+
+    def post(self, *operations):
+        return self.client.post("/api/pantry/batch/", {"operations": list(operations)}, format="json")
+
+    def test_applies_operations_in_request_order(self):
+        response = self.post(
+            {"op": "update", "id": self.milk.id, "data": {"quantity": 3}},
+            {"op": "create", "data": {"name": "eggs", "quantity": 6}},
+            {"op": "delete", "id": self.rice.id},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([r["status"] for r in response.data["results"]], ["updated", "created", "deleted"])
+        self.assertEqual(
+            sorted(PantryItem.objects.filter(user=self.user).values_list("name", "quantity")),
+            [("eggs", 6), ("milk", 3)],
+        )
+
+    def test_query_count_does_not_grow_with_batch_size(self):
+        def run(size):
+            items = PantryItem.objects.bulk_create(
+                [PantryItem(user=self.user, name="milk", quantity=1) for _ in range(2 * size)]
+            )
+            with CaptureQueriesContext(connection) as queries:
+                response = self.post(
+                    *[{"op": "create", "data": {"name": "milk", "quantity": 1}} for _ in range(size)],
+                    *[{"op": "update", "id": item.id, "data": {"quantity": 2}} for item in items[:size]],
+                    *[{"op": "delete", "id": item.id} for item in items[size:]],
+                )
+            self.assertEqual(response.status_code, 200)
+            return len(queries.captured_queries)
+
+        self.assertEqual(run(1), run(10))
+        self.assertEqual(PantryChange.objects.filter(user=self.user, deleted=True).count(), 11)
+
+    def test_invalid_operation_rolls_back_everything(self):
+        other = User.objects.create_user("other", "other@example.com", "pw")
+        foreign = PantryItem.objects.create(user=other, name="egg", quantity=1)
+        response = self.post(
+            {"op": "create", "data": {"name": "eggs", "quantity": 6}},
+            {"op": "update", "id": self.milk.id, "data": {"quantity": "lots"}},
+            {"op": "delete", "id": self.rice.id},
+            {"op": "delete", "id": foreign.id},
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.json()["operations"]), {"1", "3"})
+        self.assertIn("quantity", response.json()["operations"]["1"])
+        self.assertEqual(
+            sorted(PantryItem.objects.filter(user=self.user).values_list("name", "quantity")),
+            [("milk", 1), ("rice", 2)],
+        )
+
+    def test_repeated_item_is_rejected(self):
+        response = self.post(
+            {"op": "update", "id": self.milk.id, "data": {"quantity": 3}},
+            {"op": "delete", "id": self.milk.id},
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.json()["operations"]), {"1"})
+        self.assertTrue(PantryItem.objects.filter(id=self.milk.id, quantity=1).exists())
+
+
+class ChangesTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("cook", "cook@example.com", "pw")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.milk = PantryItem.objects.create(user=self.user, name="milk", quantity=1)
+        self.rice = PantryItem.objects.create(user=self.user, name="rice", quantity=2)
+
+    def sync(self, token=None):
+        response = self.client.get("/api/pantry/changes/", {"since": token} if token else {})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_full_then_delta(self):
+        full = self.sync()
+        self.assertEqual([item["id"] for item in full["items"]], [self.milk.id, self.rice.id])
+
+        self.milk.quantity = 5
+        self.milk.save()
+        eggs = PantryItem.objects.create(user=self.user, name="eggs", quantity=6)
+        delta = self.sync(full["token"])
+        self.assertEqual([item["id"] for item in delta["items"]], [self.milk.id, eggs.id])
+        self.assertEqual(delta["deleted"], [])
+
+        self.assertEqual(self.sync(delta["token"])["items"], [])
+
+    def test_delete_leaves_tombstone(self):
+        token = self.sync()["token"]
+        rice_id = self.rice.id
+        self.rice.delete()
+        delta = self.sync(token)
+        self.assertEqual((delta["items"], delta["deleted"]), ([], [rice_id]))
+
+    def test_other_users_changes_are_hidden(self):
+        token = self.sync()["token"]
+        other = User.objects.create_user("other", "other@example.com", "pw")
+        PantryItem.objects.create(user=other, name="egg", quantity=1)
+        self.assertEqual(self.sync(token)["items"], [])
+
+    def test_invalid_token(self):
+        for token in ("abc", "-1", "1.5"):
+            response = self.client.get("/api/pantry/changes/", {"since": token})
+            self.assertEqual(response.status_code, 400, token)
+
+
+class ScanTests(TestCase):
+    def setUp(self):
+        clear_cache()
+        self.user = User.objects.create_user("cook", "cook@example.com", "pw")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        Product.objects.create(barcode="4006381333931", name="Milk", category="dairy", unit="l", shelf_life_days=7)
+
+    def test_scan_creates_item_from_catalog(self):
+        response = self.client.post("/api/pantry/scan/", {"barcode": "4006381333931"}, format="json")
+        self.assertEqual(response.status_code, 201)
+        item = PantryItem.objects.get(user=self.user)
+        self.assertEqual((item.name, item.category, item.unit, item.barcode), ("Milk", "dairy", "l", "4006381333931"))
+        self.assertEqual(item.expiry_date, date.today() + timedelta(days=7))
+
+    def test_repeat_scan_skips_catalog_query(self):
+        self.client.post("/api/pantry/scan/", {"barcode": "4006381333931"}, format="json")
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post("/api/pantry/scan/", {"barcode": "4006381333931"}, format="json")
+        self.assertFalse(any("pantry_product" in q["sql"] for q in queries.captured_queries))
+
+    def test_unknown_barcode(self):
+        response = self.client.post("/api/pantry/scan/", {"barcode": "000"}, format="json")
+        self.assertEqual(response.status_code, 404)
+
+    def test_numeric_barcode(self):
+        response = self.client.post("/api/pantry/scan/", {"barcode": 4006381333931}, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["barcode"], "4006381333931")
 
-# Create your tests here.
+    def test_missing_barcode(self):
+        response = self.client.post("/api/pantry/scan/", {}, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("barcode", response.data)
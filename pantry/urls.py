@@ -8,4 +8,7 @@ urlpatterns = [
     path("delete/<int:pk>/", views.delete_item),
     path("expiring/", views.expiring_items),
     path("cleanup-suggestions/", views.cleanup_suggestions),
+    path("batch/", views.batch),
+    path("changes/", views.changes),
+    path("scan/", views.scan),
 ]
\ No newline at end of file
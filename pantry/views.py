@@ -4,8 +4,18 @@ from rest_framework import status
 from rest_framework.permissions import AllowAny
 from datetime import date, timedelta
 from rest_framework.permissions import IsAuthenticated
-from .models import PantryItem
-from .serializers import PantryItemSerializer
+from django.db import transaction
+from django.db.models import Max, Q
+from django.utils import timezone
+from recipes.cache import recommendation_cache
+from recipes.models import IngredientCatalog
+from recipes.units import set_base_quantity
+from .models import PantryChange, PantryItem
+from .products import lookup_product
+from .serializers import BarcodeScanSerializer, PantryBatchOperationSerializer, PantryItemSerializer
+
+MAX_BATCH_OPERATIONS = 200
+MAX_SYNC_CHANGES = 500
 
 
 # ---------------- ADD ITEM ----------------
@@ -68,6 +78,183 @@ def delete_item(request, pk):
         )
 
 
+# ---------------- BATCH ----------------
+def _indexed_errors(errors):
+    """(position, error) pairs from a many=True serializer's errors, in dict or list form."""
+    if isinstance(errors, dict):
+        return errors.items()
+    return [(position, error) for position, error in enumerate(errors) if error]
+
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def batch(request):
+    """
+    Apply {"operations": [{"op": "create"|"update"|"delete", "id": ..., "data": {...}}]}
+    in one transaction with one bulk query per kind. Nothing is written unless every
+    operation is valid; errors are keyed by operation index, results are in request order.
+    """
+    if not isinstance(request.data, dict):
+        return Response({"operations": "This field is required."}, status=status.HTTP_400_BAD_REQUEST)
+    operations = PantryBatchOperationSerializer(data=request.data.get("operations"), many=True)
+    if not operations.is_valid():
+        return Response({"operations": operations.errors}, status=status.HTTP_400_BAD_REQUEST)
+    operations = operations.validated_data
+    if len(operations) > MAX_BATCH_OPERATIONS:
+        return Response(
+            {"operations": f"At most {MAX_BATCH_OPERATIONS} operations per batch."},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    creates = [i for i, op in enumerate(operations) if op["op"] == "create"]
+    updates = [i for i, op in enumerate(operations) if op["op"] == "update"]
+    deletes = [i for i, op in enumerate(operations) if op["op"] == "delete"]
+    create_data = PantryItemSerializer(data=[operations[i]["data"] for i in creates], many=True)
+    update_data = PantryItemSerializer(data=[operations[i]["data"] for i in updates], many=True, partial=True)
+    create_data.is_valid()
+    update_data.is_valid()
+
+    errors = [{} for _ in operations]
+    for indexes, serializer in ((creates, create_data), (updates, update_data)):
+        for position, error in _indexed_errors(serializer.errors):
+            errors[indexes[position]] = error
+
+    ids = [operations[i]["id"] for i in updates + deletes]
+    items = PantryItem.objects.filter(user=request.user, id__in=ids).in_bulk()
+    seen = set()
+    for i in sorted(updates + deletes):
+        item_id = operations[i]["id"]
+        if item_id not in items:
+            errors[i] = {"id": "Item not found"}
+        elif item_id in seen:
+            errors[i] = {"id": "Each item may appear in only one operation."}
+        seen.add(item_id)
+    if any(errors):
+        # Keyed by operation index, like the first validation pass
+        errors = {i: error for i, error in enumerate(errors) if error}
+        return Response({"operations": errors}, status=status.HTTP_400_BAD_REQUEST)
+
+    now = timezone.now()
+    new_items = [PantryItem(user=request.user, **attrs) for attrs in create_data.validated_data]
+    changed_items, changed_fields, renamed = [], {"updated_at", "base_quantity", "base_unit"}, list(new_items)
+    for i, attrs in zip(updates, update_data.validated_data):
+        item = items[operations[i]["id"]]
+        for field, value in attrs.items():
+            setattr(item, field, value)
+        item.updated_at = now
+        changed_items.append(item)
+        changed_fields.update(attrs)
+        if "name" in attrs:
+            renamed.append(item)
+            changed_fields.add("catalog")
+
+    with transaction.atomic():
+        # bulk_create/bulk_update skip PantryItem.save(), so derive its fields here
+        catalog_ids = IngredientCatalog.objects.resolve_many({item.name for item in renamed})
+        for item in renamed:
+            item.catalog_id = catalog_ids.get(item.name)
+        for item in new_items + changed_items:
+            set_base_quantity(item)
+        PantryItem.objects.bulk_create(new_items)
+        if changed_items:
+            PantryItem.objects.bulk_update(changed_items, sorted(changed_fields))
+        PantryChange.objects.record(request.user.id, [item.pk for item in new_items + changed_items])
+        deleted_ids = [operations[i]["id"] for i in deletes]
+        PantryChange.objects.record(request.user.id, deleted_ids, deleted=True)
+        if deleted_ids:
+            # Nothing references pantry items, so skip the per-row post_delete a plain
+            # .delete() would send; its tombstones are the ones recorded just above
+            PantryItem.objects.filter(id__in=deleted_ids)._raw_delete(PantryItem.objects.db)
+        transaction.on_commit(lambda: recommendation_cache.invalidate_user(request.user.id))
+
+    results = [None] * len(operations)
+    for i, item in zip(creates, new_items):
+        results[i] = {"op": "create", "status": "created", "item": PantryItemSerializer(item).data}
+    for i, item in zip(updates, changed_items):
+        results[i] = {"op": "update", "status": "updated", "item": PantryItemSerializer(item).data}
+    for i in deletes:
+        results[i] = {"op": "delete", "status": "deleted", "id": operations[i]["id"]}
+    return Response({"results": results}, status=status.HTTP_200_OK)
+
+
+# ---------------- DELTA SYNC ----------------
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def changes(request):
+    """
+    Items created or updated and ids deleted since ?since=<token>, plus the token to
+    send next time. Without a token the whole pantry is returned. Large backlogs come
+    MAX_SYNC_CHANGES at a time with has_more set; repeat with the new token.
+    """
+    since = request.query_params.get("since")
+    if not since:
+        # Read the token first: anything written meanwhile is simply sent again next time
+        token = PantryChange.objects.filter(user=request.user).aggregate(seq=Max("id"))["seq"] or 0
+        items = PantryItem.objects.filter(user=request.user).order_by("id")
+        return Response({
+            "items": PantryItemSerializer(items, many=True).data,
+            "deleted": [],
+            "token": str(token),
+            "has_more": False,
+        }, status=status.HTTP_200_OK)
+
+    try:
+        since = int(since)
+    except ValueError:
+        since = -1
+    if since < 0:
+        return Response({"since": "Invalid token."}, status=status.HTTP_400_BAD_REQUEST)
+    log = list(
+        PantryChange.objects.filter(user=request.user, id__gt=since).order_by("id")
+        .values_list("id", "item_id", "deleted")[:MAX_SYNC_CHANGES + 1]
+    )
+    has_more = len(log) > MAX_SYNC_CHANGES
+    log = log[:MAX_SYNC_CHANGES]
+    items = PantryItem.objects.filter(
+        user=request.user, id__in=[item_id for _, item_id, deleted in log if not deleted]
+    ).order_by("id")
+    return Response({
+        "items": PantryItemSerializer(items, many=True).data,
+        "deleted": [item_id for _, item_id, deleted in log if deleted],
+        "token": str(log[-1][0] if log else since),
+        "has_more": has_more,
+    }, status=status.HTTP_200_OK)
+
+
+# ---------------- BARCODE SCAN ----------------
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def scan(request):
+    """
+    Add the product behind {"barcode": ...} from the local catalog (pantry.products).
+    quantity defaults to 1 and expiry_date to today plus the product's shelf life;
+    any other item field in the body overrides the catalog's value.
+    """
+    scanned = BarcodeScanSerializer(data=request.data)
+    if not scanned.is_valid():
+        return Response(scanned.errors, status=status.HTTP_400_BAD_REQUEST)
+    product = lookup_product(scanned.validated_data["barcode"])
+    if product is None:
+        return Response({"error": "Unknown barcode"}, status=status.HTTP_404_NOT_FOUND)
+
+    data = {
+        "name": product["name"],
+        "category": product["category"],
+        "unit": product["unit"],
+        "quantity": 1,
+    }
+    if product["shelf_life_days"] is not None:
+        data["expiry_date"] = date.today() + timedelta(days=product["shelf_life_days"])
+    data.update({k: v for k, v in request.data.items() if k in ("name", "category", "unit", "quantity", "expiry_date")})
+    data["barcode"] = product["barcode"]
+
+    serializer = PantryItemSerializer(data=data)
+    if serializer.is_valid():
+        serializer.save(user=request.user)
+        return Response({**serializer.data, "product": product}, status=status.HTTP_201_CREATED)
+    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
 # ---------------- EXPIRING ITEMS ----------------
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
@@ -75,7 +262,9 @@ def expiring_items(request):
     today = date.today()
     soon = today + timedelta(days=3)
 
-    items = PantryItem.objects.filter(user=request.user, expiry_date__range=(today, soon))
+    items = PantryItem.objects.filter(
+        user=request.user, expiry_date__range=(today, soon)
+    ).order_by("expiry_date", "id")
 
     serializer = PantryItemSerializer(items, many=True)
     return Response(serializer.data, status=status.HTTP_200_OK)
@@ -88,14 +277,17 @@ def cleanup_suggestions(request):
     today = date.today()
     soon = today + timedelta(days=3)
 
-    items = PantryItem.objects.filter(user=request.user)
-    
-    expired = items.filter(expiry_date__lt=today)
-    expiring = items.filter(expiry_date__range=(today, soon))
-    low_stock = items.filter(quantity__lte=1)
+    # One pass over only the rows that land in a bucket; each is serialized once
+    items = list(PantryItem.objects.filter(
+        Q(expiry_date__lte=soon) | Q(quantity__lte=1), user=request.user
+    ).order_by("expiry_date", "id"))
 
-    return Response({
-        "expired": PantryItemSerializer(expired, many=True).data,
-        "expiring_soon": PantryItemSerializer(expiring, many=True).data,
-        "low_stock": PantryItemSerializer(low_stock, many=True).data
-    }, status=status.HTTP_200_OK)
\ No newline at end of file
+    buckets = {"expired": [], "expiring_soon": [], "low_stock": []}
+    for item, data in zip(items, PantryItemSerializer(items, many=True).data):
+        if item.expiry_date < today:
+            buckets["expired"].append(data)
+        elif item.expiry_date <= soon:
+            buckets["expiring_soon"].append(data)
+        if item.quantity <= 1:
+            buckets["low_stock"].append(data)
+    return Response(buckets, status=status.HTTP_200_OK)
\ No newline at end of file
@@ -1,5 +1,7 @@
 from django.contrib import admin
-from .models import Recipe, Ingredient, Step, FavoriteRecipe, RecipeSubstitution
+from .models import (
+    Recipe, Ingredient, Step, FavoriteRecipe, RecipeSubstitution, IngredientCatalog, IngredientAlias,
+)
 
 class IngredientInline(admin.TabularInline):
     model = Ingredient
@@ -12,4 +14,20 @@ class StepInline(admin.TabularInline):
 @admin.register(Recipe)
 class RecipeAdmin(admin.ModelAdmin):
     list_display = ('name', 'category', 'created_at', 'created_by')
-    inlines = [IngredientInline, StepInline]
\ No newline at end of file
+    inlines = [IngredientInline, StepInline]
+
+
+class IngredientAliasInline(admin.TabularInline):
+    model = IngredientAlias
+    extra = 1
+
+@admin.register(IngredientCatalog)
+class IngredientCatalogAdmin(admin.ModelAdmin):
+    list_display = ('name',)
+    search_fields = ('name', 'aliases__alias')
+    inlines = [IngredientAliasInline]
+
+@admin.register(RecipeSubstitution)
+class RecipeSubstitutionAdmin(admin.ModelAdmin):
+    list_display = ('original_ingredient', 'substitute_ingredient', 'recipe')
+    list_filter = (('recipe', admin.EmptyFieldListFilter),)
@@ -0,0 +1,87 @@
+"""
+Allergen bitmasks over AllergyIntolerance.ALLERGY_TYPES.
+
+Each allergy type gets one bit (its position in ALLERGY_TYPES). A recipe's mask is derived
+from its ingredient names and its `allergens` tags, so exclusion for a user is a single
+`allergen_mask & user_mask == 0` predicate.
+"""
+import re
+
+from users.models import AllergyIntolerance
+
+ALLERGY_BITS = {code: 1 << i for i, (code, _) in enumerate(AllergyIntolerance.ALLERGY_TYPES)}
+
+# Ingredient words that imply an allergen even when the allergen isn't named
+ALLERGEN_KEYWORDS = {
+    "dairy": {
+        "dairy", "milk", "butter", "buttermilk", "cheese", "cream", "yogurt", "yoghurt",
+        "ghee", "whey", "casein", "lactose", "kefir", "custard", "parmesan", "mozzarella",
+        "cheddar", "feta", "ricotta", "mascarpone",
+    },
+    "eggs": {"egg", "mayonnaise", "mayo", "meringue", "albumen"},
+    "fish": {
+        "fish", "salmon", "tuna", "cod", "tilapia", "anchovy", "anchovie", "sardine", "trout",
+        "halibut", "mackerel", "haddock",
+    },
+    "shellfish": {
+        "shellfish", "shrimp", "prawn", "crab", "lobster", "clam", "mussel", "oyster",
+        "scallop", "crayfish",
+    },
+    "tree_nuts": {
+        "nut", "almond", "walnut", "cashew", "pecan", "pistachio", "hazelnut", "macadamia",
+    },
+    "peanuts": {"peanut"},
+    "wheat": {
+        "wheat", "flour", "bread", "breadcrumb", "pasta", "spaghetti", "couscous", "semolina",
+        "bulgur",
+    },
+    "soy": {"soy", "soya", "tofu", "edamame", "tempeh", "miso"},
+    "sesame": {"sesame", "tahini"},
+    "gluten": {
+        "gluten", "wheat", "flour", "bread", "breadcrumb", "pasta", "spaghetti", "couscous",
+        "semolina", "bulgur", "barley", "rye", "seitan",
+    },
+    "corn": {"corn", "maize", "cornmeal", "cornstarch", "polenta", "popcorn"},
+    "sulfites": {"sulfite", "sulphite", "wine"},
+}
+
+_KEYWORD_BITS = {}
+for _code, _words in ALLERGEN_KEYWORDS.items():
+    for _word in _words:
+        _KEYWORD_BITS[_word] = _KEYWORD_BITS.get(_word, 0) | ALLERGY_BITS[_code]
+
+
+def _word_bits(word):
+    bits = _KEYWORD_BITS.get(word, 0)
+    if not bits and word.endswith("s"):
+        bits = _KEYWORD_BITS.get(word[:-1], 0)
+    return bits
+
+
+def mask_for_names(names):
+    """
+    Allergen mask for ingredient names or recipe tags. Matching is word based and errs
+    on the side of exclusion ("peanut butter" flags peanuts and dairy); a word followed
+    by "free" ("gluten_free", "dairy-free") is ignored.
+    """
+    mask = 0
+    for name in names:
+        name = str(name).lower()
+        if name in ALLERGY_BITS:
+            mask |= ALLERGY_BITS[name]
+            continue
+        words = re.findall(r"[a-z]+", name)
+        for i, word in enumerate(words):
+            # "<allergen>-free" / "<allergen> free" states an absence, not a presence
+            if i + 1 < len(words) and words[i + 1] == "free":
+                continue
+            mask |= _word_bits(word)
+    return mask
+
+
+def mask_for_allergies(allergy_types):
+    """User mask for AllergyIntolerance.allergy_type codes."""
+    mask = 0
+    for code in allergy_types:
+        mask |= ALLERGY_BITS.get(code.lower(), 0)
+    return mask
@@ -0,0 +1,184 @@
+"""
+In-process LRU caches.
+
+Each worker process has its own caches, so entries are never trusted on signals alone:
+every entry carries a stamp read from the database and a lookup with a different stamp
+is a miss, whichever process made the write that moved it.
+
+RecommendationCache holds ranked recommendation results, keyed per user and stamped with
+the catalog, substitution and user-profile stamps (recipes.versioning) they were ranked
+from. Catalog-wide writes rely on those stamps alone; recipes.signals only drops a user's
+own entries early when their pantry or profile changes.
+
+RecipeDetailCache holds the rendered, user-independent JSON of a recipe's detail
+response. Entries carry the Recipe.version they were rendered from, and every write to
+a recipe or its ingredients/steps bumps that version, so a stale entry is simply a miss.
+Deleted recipes 404 before the cache is consulted.
+
+Both evict least-recently-used entries once their combined size passes a byte budget
+(settings.RECOMMENDATION_CACHE_MAX_BYTES, settings.RECIPE_DETAIL_CACHE_MAX_BYTES).
+"""
+import sys
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+
+
+def _nbytes(value):
+    """Approximate size of a cached value: arrays, sets and the containers holding them."""
+    if isinstance(value, (tuple, list)):
+        return sum(_nbytes(v) for v in value)
+    if isinstance(value, (set, frozenset)):
+        return sys.getsizeof(value) + sum(sys.getsizeof(v) for v in value)
+    return getattr(value, "nbytes", 0)
+
+
+class RecommendationCache:
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # (user_id, key) -> (value, stamp, nbytes)
+        self._keys_by_user = {}
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_or_compute(self, user_id, key, stamp, compute):
+        """Cached value for (user_id, key) if it was computed at this stamp, else compute() it."""
+        entry_key = (user_id, key)
+        with self._lock:
+            entry = self._entries.get(entry_key)
+            if entry is not None and entry[1] == stamp:
+                self._entries.move_to_end(entry_key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        value = compute()
+        size = _nbytes(value)
+        with self._lock:
+            self._discard(entry_key)
+            self._entries[entry_key] = (value, stamp, size)
+            self._keys_by_user.setdefault(user_id, set()).add(key)
+            self.bytes += size
+            while self.bytes > self.max_bytes and len(self._entries) > 1:
+                self._discard(next(iter(self._entries)))
+                self.evictions += 1
+        return value
+
+    def _discard(self, entry_key):
+        entry = self._entries.pop(entry_key, None)
+        if entry is None:
+            return
+        self.bytes -= entry[2]
+        user_id, key = entry_key
+        keys = self._keys_by_user.get(user_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_user[user_id]
+
+    def invalidate_user(self, user_id):
+        with self._lock:
+            for key in list(self._keys_by_user.get(user_id, ())):
+                self._discard((user_id, key))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_user.clear()
+            self.bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+class RecipeDetailCache:
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # (recipe_id, base_url) -> (version, body)
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.bytes_served = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_or_render(self, recipe_id, version, base_url, render):
+        """
+        Cached body for this version of the recipe, else render() -> bytes and cache it.
+        base_url is part of the key because image URLs in the body are absolute.
+        """
+        entry_key = (recipe_id, base_url)
+        with self._lock:
+            entry = self._entries.get(entry_key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(entry_key)
+                self.hits += 1
+                self.bytes_served += len(entry[1])
+                return entry[1]
+            self.misses += 1
+
+        body = render()
+        with self._lock:
+            current = self._entries.get(entry_key)
+            # A concurrent request may already have stored a newer version
+            if current is None or current[0] <= version:
+                self._discard(entry_key)
+                self._entries[entry_key] = (version, body)
+                self.bytes += len(body)
+                while self.bytes > self.max_bytes and len(self._entries) > 1:
+                    self._discard(next(iter(self._entries)))
+                    self.evictions += 1
+            self.bytes_served += len(body)
+        return body
+
+    def _discard(self, entry_key):
+        entry = self._entries.pop(entry_key, None)
+        if entry is not None:
+            self.bytes -= len(entry[1])
+
+    def invalidate_recipe(self, recipe_id):
+        with self._lock:
+            for entry_key in [k for k in self._entries if k[0] == recipe_id]:
+                self._discard(entry_key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "average_entry_bytes": self.bytes // len(self._entries) if self._entries else 0,
+                "bytes_served": self.bytes_served,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+recommendation_cache = RecommendationCache(
+    getattr(settings, "RECOMMENDATION_CACHE_MAX_BYTES", 64 * 1024 * 1024)
+)
+recipe_detail_cache = RecipeDetailCache(
+    getattr(settings, "RECIPE_DETAIL_CACHE_MAX_BYTES", 32 * 1024 * 1024)
+)
@@ -0,0 +1,35 @@
+"""
+Name normalization for the canonical ingredient catalog.
+
+Free-text names ("Eggs ", "tomatoes") are reduced to a lowercase singular key that
+IngredientCatalog/IngredientAlias rows are looked up by.
+"""
+
+_INVARIANT = {"asparagus", "couscous", "hummus", "molasses", "swiss", "grits", "oats"}
+
+
+def normalize_ingredient_name(name):
+    return (name or "").strip().lower()
+
+
+def singularize(word):
+    if word in _INVARIANT or len(word) <= 3:
+        return word
+    if word.endswith("ies"):
+        return word[:-3] + "y"
+    if word.endswith("oes"):
+        return word[:-2]
+    if word.endswith(("ches", "shes", "xes", "sses")):
+        return word[:-2]
+    if word.endswith("s") and not word.endswith(("ss", "us")):
+        return word[:-1]
+    return word
+
+
+def canonical_key(name):
+    """Lowercase, whitespace-collapsed name with its last word singularized."""
+    words = normalize_ingredient_name(name).split()
+    if not words:
+        return ""
+    words[-1] = singularize(words[-1])
+    return " ".join(words)
@@ -0,0 +1,121 @@
+"""
+Faceted filtering for the recipe list.
+
+Each facet turns its query parameters into one Q object. The list applies all of them;
+facet_counts() then reports, for every value of every facet, how many recipes match that
+value together with the *other* active facets, so picking a value never zeroes out its
+siblings. All counts come from a single aggregate query of conditional COUNTs.
+
+    ?category=lunch,dinner      any of the categories
+    ?allergen_free=tree_nuts,dairy  free of every listed allergen (Recipe.allergen_mask)
+    ?min_calories=&max_calories= per-serving range
+    ?min_ingredients=&max_ingredients=
+"""
+from django.db.models import Count, F, Q
+from rest_framework.exceptions import ValidationError
+
+from .allergens import ALLERGY_BITS
+from .models import Recipe
+
+# (label, low, high); high None means open-ended. Calorie buckets are half-open,
+# [low, high), as calories are fractional; ingredient counts are whole numbers, so those
+# bounds are inclusive. Recipes without ingredients get a bucket of their own.
+CALORIE_BUCKETS = [("0-200", 0, 200), ("200-400", 200, 400), ("400-600", 400, 600),
+                   ("600-800", 600, 800), ("800+", 800, None)]
+INGREDIENT_BUCKETS = [("0", 0, 0), ("1-5", 1, 5), ("6-10", 6, 10), ("11-15", 11, 15), ("16+", 16, None)]
+
+FACETS = ("category", "allergen_free", "calories", "ingredients")
+
+
+def _list_param(params, name, allowed):
+    values = [v.strip() for v in (params.get(name) or "").split(",") if v.strip()]
+    unknown = set(values) - set(allowed)
+    if unknown:
+        raise ValidationError({name: f"Unknown value(s): {', '.join(sorted(unknown))}."})
+    return values
+
+
+def _number_param(params, name, cast):
+    value = params.get(name)
+    if value in (None, ""):
+        return None
+    try:
+        return cast(value)
+    except ValueError:
+        raise ValidationError({name: "Must be a number."})
+
+
+def _range(field, low, high, upper_exclusive=False):
+    q = Q()
+    if low is not None:
+        q &= Q(**{f"{field}__gte": low})
+    if high is not None:
+        q &= Q(**{f"{field}__lt" if upper_exclusive else f"{field}__lte": high})
+    return q
+
+
+def _allergen_free(codes):
+    q = Q()
+    for code in codes:
+        q &= Q(**{f"allergen_{code}": 0})
+    return q
+
+
+def with_allergen_aliases(queryset):
+    """Alias allergen_<code> = allergen_mask & bit, for the allergen_free filter and facet."""
+    return queryset.alias(**{
+        f"allergen_{code}": F("allergen_mask").bitand(bit) for code, bit in ALLERGY_BITS.items()
+    })
+
+
+def facet_filters(params):
+    """{facet: Q} for the facet parameters in a request's query params."""
+    categories = _list_param(params, "category", [c for c, _ in Recipe.CATEGORY_CHOICES])
+    return {
+        "category": Q(category__in=categories) if categories else Q(),
+        "allergen_free": _allergen_free(_list_param(params, "allergen_free", ALLERGY_BITS)),
+        "calories": _range(
+            "calories_per_serving",
+            _number_param(params, "min_calories", float), _number_param(params, "max_calories", float),
+        ),
+        "ingredients": _range(
+            "ingredient_count",
+            _number_param(params, "min_ingredients", int), _number_param(params, "max_ingredients", int),
+        ),
+    }
+
+
+def _facet_values():
+    """(facet, label, Q) for every countable facet value."""
+    for value, _ in Recipe.CATEGORY_CHOICES:
+        yield "category", value, Q(category=value)
+    for code in ALLERGY_BITS:
+        yield "allergen_free", code, _allergen_free([code])
+    # Buckets are half-open so a value on a boundary is counted once
+    for label, low, high in CALORIE_BUCKETS:
+        yield "calories", label, _range("calories_per_serving", low, high, upper_exclusive=True)
+    for label, low, high in INGREDIENT_BUCKETS:
+        yield "ingredients", label, _range("ingredient_count", low, high)
+
+
+def facet_counts(queryset, filters):
+    """
+    Counts for every facet value over queryset (aliased with with_allergen_aliases and
+    not yet facet-filtered), each honouring every active filter except its own facet's.
+    """
+    others = {}
+    for facet in FACETS:
+        q = Q()
+        for name, f in filters.items():
+            if name != facet:
+                q &= f
+        others[facet] = q
+
+    values = list(_facet_values())
+    row = queryset.order_by().aggregate(**{
+        f"f{i}": Count("id", filter=q & others[facet]) for i, (facet, _, q) in enumerate(values)
+    })
+    counts = {facet: {} for facet in FACETS}
+    for i, (facet, label, _) in enumerate(values):
+        counts[facet][label] = row[f"f{i}"]
+    return counts
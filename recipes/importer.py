@@ -0,0 +1,186 @@
+"""
+Bulk recipe creation.
+
+create_recipes() writes already-validated recipe payloads with one bulk_create per table,
+filling in everything Recipe.save()/Ingredient.save() and the recipes.signals receivers
+would otherwise derive row by row: name_key, catalog ids, base quantities, nutrition
+totals, the allergen mask, the search index, the similarity signatures and queued
+image variants.
+import_stream() feeds it from a JSONL or CSV file chunk by chunk, so memory stays flat
+however large the file is.
+
+CSV rows carry one recipe each: name, description, category and servings as plain
+columns, allergens as a ";"-separated list, and ingredients, steps and substitutions as
+JSON arrays in the same shape the API accepts.
+"""
+import csv
+import json
+import time
+from itertools import islice
+
+from django.db import transaction
+
+from .allergens import mask_for_names
+from .catalog import normalize_ingredient_name
+from .models import (
+    Recipe, Ingredient, IngredientCatalog, RecipeBucket, RecipeSignature, Step, RecipeSubstitution,
+)
+from .search import index_recipes
+from .similarity import signature_rows
+from .thumbnails import queue_variants
+from .units import set_base_quantity
+
+DEFAULT_CHUNK_SIZE = 500
+MAX_REPORTED_ERRORS = 100
+
+_CSV_JSON_COLUMNS = ("ingredients", "steps", "substitutions")
+
+
+@transaction.atomic
+def create_recipes(payloads, created_by=None):
+    """
+    Insert validated recipe payloads (RecipeImportSerializer.validated_data) in one
+    transaction and return the created recipes. Runs a fixed number of queries however
+    many rows there are.
+    """
+    payloads = [dict(p) for p in payloads]
+    names = {
+        name
+        for p in payloads
+        for name in [i["name"] for i in p.get("ingredients", [])]
+        + [n for s in p.get("substitutions", []) for n in (s["original_ingredient"], s["substitute_ingredient"])]
+    }
+    catalog_ids = IngredientCatalog.objects.resolve_many(names)
+
+    recipes = []
+    for p in payloads:
+        ingredients = p.get("ingredients", [])
+        recipe = Recipe(
+            created_by=created_by,
+            **{k: v for k, v in p.items() if k not in ("ingredients", "steps", "substitutions", "created_by")},
+        )
+        for nutrient in Recipe.NUTRIENTS:
+            setattr(recipe, f"total_{nutrient}", sum(
+                i["quantity"] * i.get(f"{nutrient}_per_unit", 0) for i in ingredients
+            ))
+        recipe.ingredient_count = len(ingredients)
+        recipe._set_per_serving()
+        recipe.allergen_mask = mask_for_names(
+            list(recipe.allergens or []) + [normalize_ingredient_name(i["name"]) for i in ingredients]
+        )
+        recipes.append(recipe)
+    Recipe.objects.bulk_create(recipes)
+
+    ingredients, steps, substitutions = [], [], []
+    for recipe, p in zip(recipes, payloads):
+        for data in p.get("ingredients", []):
+            ingredient = Ingredient(
+                recipe=recipe,
+                name_key=normalize_ingredient_name(data["name"]),
+                catalog_id=catalog_ids.get(data["name"]),
+                **data,
+            )
+            set_base_quantity(ingredient)
+            ingredients.append(ingredient)
+        for data in p.get("steps", []):
+            steps.append(Step(recipe=recipe, **data))
+        for data in p.get("substitutions", []):
+            substitutions.append(RecipeSubstitution(
+                recipe=recipe,
+                original_catalog_id=catalog_ids.get(data["original_ingredient"]),
+                substitute_catalog_id=catalog_ids.get(data["substitute_ingredient"]),
+                **data,
+            ))
+    Ingredient.objects.bulk_create(ingredients)
+    Step.objects.bulk_create(steps)
+    RecipeSubstitution.objects.bulk_create(substitutions)
+    index_recipes(recipe.pk for recipe in recipes)
+    signatures, buckets = signature_rows({
+        recipe.pk: {catalog_ids[i["name"]] for i in p.get("ingredients", []) if i["name"] in catalog_ids}
+        for recipe, p in zip(recipes, payloads)
+    })
+    RecipeSignature.objects.bulk_create(signatures)
+    RecipeBucket.objects.bulk_create(buckets)
+    for recipe in recipes:
+        if recipe.image:
+            queue_variants(recipe.pk, recipe.image.name)
+
+    return recipes
+
+
+# ---------------- streaming import ----------------
+def _jsonl_records(lines):
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as exc:
+            yield exc
+
+
+def _csv_records(lines):
+    for row in csv.DictReader(lines):
+        record = {k: v for k, v in row.items() if k and v not in (None, "")}
+        if "allergens" in record:
+            record["allergens"] = [a.strip() for a in record["allergens"].split(";") if a.strip()]
+        try:
+            for column in _CSV_JSON_COLUMNS:
+                if column in record:
+                    record[column] = json.loads(record[column])
+        except ValueError as exc:
+            yield exc
+            continue
+        yield record
+
+
+def iter_records(lines, file_format="jsonl"):
+    """Yield (record number, record) from text lines; unparseable records come back as the ValueError."""
+    parse = _csv_records if file_format == "csv" else _jsonl_records
+    return enumerate(parse(lines), start=1)
+
+
+def import_stream(lines, file_format="jsonl", created_by=None, chunk_size=DEFAULT_CHUNK_SIZE, progress=None):
+    """
+    Validate and insert recipes from a text stream, one transaction per chunk.
+
+    Invalid rows are skipped and reported (up to MAX_REPORTED_ERRORS); valid rows in the
+    same chunk are still written. progress, if given, is called with the running stats
+    after every chunk.
+    """
+    from rest_framework.exceptions import ValidationError
+    from .serializers import RecipeImportSerializer
+
+    # One serializer reused for every record, the way ListSerializer validates its items:
+    # its field tree is built once instead of once per row
+    validator = RecipeImportSerializer()
+    stats = {"rows": 0, "created": 0, "failed": 0, "errors": [], "seconds": 0.0, "rows_per_sec": 0.0}
+    started = time.perf_counter()
+    records = iter_records(lines, file_format)
+    while True:
+        chunk = list(islice(records, chunk_size))
+        if not chunk:
+            break
+        valid = []
+        for row, record in chunk:
+            if isinstance(record, ValueError):
+                errors = {"non_field_errors": [str(record)]}
+            else:
+                try:
+                    valid.append(validator.run_validation(record))
+                    continue
+                except ValidationError as exc:
+                    errors = exc.detail
+            stats["failed"] += 1
+            if len(stats["errors"]) < MAX_REPORTED_ERRORS:
+                stats["errors"].append({"row": row, "errors": errors})
+        if valid:
+            create_recipes(valid, created_by=created_by)
+        stats["rows"] += len(chunk)
+        stats["created"] += len(valid)
+        stats["seconds"] = time.perf_counter() - started
+        stats["rows_per_sec"] = stats["rows"] / stats["seconds"] if stats["seconds"] else 0.0
+        if progress is not None:
+            progress(stats)
+    return stats
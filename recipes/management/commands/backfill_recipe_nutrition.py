@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+from recipes.models import Recipe, Ingredient
+
+
+class Command(BaseCommand):
+    help = "Recompute denormalized nutrition totals and ingredient counts for every recipe"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        nutrients = Recipe.NUTRIENTS
+
+        # One grouped aggregate for the whole catalog instead of one per recipe
+        totals = {
+            row["recipe_id"]: row
+            for row in Ingredient.objects.values("recipe_id").annotate(ingredient_count=Count("id"), **{
+                nutrient: Sum(F("quantity") * F(f"{nutrient}_per_unit")) for nutrient in nutrients
+            })
+        }
+
+        fields = [f"total_{n}" for n in nutrients] + [f"{n}_per_serving" for n in nutrients] + ["ingredient_count"]
+        # Rewritten rows get a new ETag and drop out of the detail cache like any other write
+        fields += ["version", "updated_at"]
+        now = timezone.now()
+        batch = []
+        updated = 0
+        for recipe in Recipe.objects.only("id", "servings").iterator(chunk_size=batch_size):
+            row = totals.get(recipe.id, {})
+            for nutrient in nutrients:
+                setattr(recipe, f"total_{nutrient}", row.get(nutrient) or 0)
+            recipe.ingredient_count = row.get("ingredient_count", 0)
+            recipe._set_per_serving()
+            recipe.version = F("version") + 1
+            recipe.updated_at = now
+            batch.append(recipe)
+            if len(batch) >= batch_size:
+                Recipe.objects.bulk_update(batch, fields)
+                updated += len(batch)
+                batch = []
+        if batch:
+            Recipe.objects.bulk_update(batch, fields)
+            updated += len(batch)
+
+        self.stdout.write(self.style.SUCCESS(f"✅ Backfilled nutrition for {updated} recipe(s)"))
@@ -0,0 +1,122 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from recipes.scoring import ScoringEngine, top_k_rows
+from recipes.substitutions import SubstitutionGraph
+
+
+def score_python(recipes, ingredients, substitutions, pantry_ids, allergen_mask,
+                 dietary_preference, primary_goal):
+    """
+    Reference implementation: a plain per-recipe loop applying the engine's rules (catalog
+    ids, allergen masks, recipe-scoped one-hop substitutions). It is not the loop
+    what_can_i_cook ran before the ingredient catalog, which compared lowercased names,
+    matched allergies against ingredient names and also listed recipes sharing nothing
+    with the pantry, so its rankings are not expected to agree with this one.
+    """
+    ids_by_recipe = {}
+    for recipe_id, catalog_id, _ in ingredients:
+        ids_by_recipe.setdefault(recipe_id, set()).add(catalog_id)
+    subs_by_recipe = {}
+    for recipe_id, orig, sub, _, _ in substitutions:
+        subs_by_recipe.setdefault(recipe_id, []).append((orig, sub))
+
+    suggested = []
+    for recipe_id, total_calories, total_protein, _, _, tags, recipe_mask in recipes:
+        ingredient_ids = ids_by_recipe.get(recipe_id, set())
+        if not ingredient_ids & pantry_ids:
+            continue
+        if recipe_mask & allergen_mask:
+            continue
+        if dietary_preference and dietary_preference != 'none':
+            if dietary_preference not in {tag.lower() for tag in tags}:
+                continue
+
+        missing = ingredient_ids - pantry_ids
+        available = ingredient_ids & pantry_ids
+        for orig, sub in subs_by_recipe.get(recipe_id, ()):
+            if orig in missing and sub in pantry_ids:
+                missing.remove(orig)
+                available.add(sub)
+
+        health_score = 0
+        if primary_goal == 'weight_loss':
+            health_score = max(0, 100 - total_calories)
+        elif primary_goal == 'build_muscle':
+            health_score = total_protein
+        elif primary_goal == 'maintain_weight':
+            health_score = max(0, 100 - abs(total_calories - 2000))
+
+        suggested.append((recipe_id, len(available) - len(missing) + health_score))
+
+    suggested.sort(key=lambda x: x[1], reverse=True)
+    return suggested
+
+
+def synthetic_catalog(size, vocab_size=2000, seed=0):
+    rng = random.Random(seed)
+    vocab = list(range(1, vocab_size + 1))
+    tags = ["vegan", "vegetarian", "keto", "gluten_free"]
+    recipes, ingredients, substitutions = [], [], []
+    for recipe_id in range(1, size + 1):
+        names = rng.sample(vocab, rng.randint(3, 12))
+        ingredients.extend((recipe_id, catalog_id, f"ingredient {catalog_id}") for catalog_id in names)
+        calories = rng.uniform(50, 2500)
+        recipes.append((recipe_id, calories, rng.uniform(0, 80), calories, 0.0,
+                        rng.sample(tags, rng.randint(0, 2)), rng.getrandbits(13) & rng.getrandbits(13)))
+        if rng.random() < 0.2:
+            sub = rng.choice(vocab)
+            substitutions.append((recipe_id, names[0], sub, f"ingredient {names[0]}", f"ingredient {sub}"))
+    return vocab, recipes, ingredients, substitutions
+
+
+class Command(BaseCommand):
+    help = "Compare the NumPy scoring engine with a per-recipe Python reference loop on a synthetic catalog"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--pantry-size", type=int, default=40)
+
+    def handle(self, *args, **options):
+        for size in options["sizes"]:
+            vocab, recipes, ingredients, substitutions = synthetic_catalog(size)
+            rng = random.Random(size)
+            pantry = frozenset(rng.sample(vocab, options["pantry_size"]))
+            user = dict(pantry_ids=pantry, allergen_mask=0b101,
+                        dietary_preference="vegan", primary_goal="weight_loss")
+
+            start = time.perf_counter()
+            engine = ScoringEngine(recipes, ingredients)
+            graph = SubstitutionGraph(
+                ((recipe_id, u, v, name) for recipe_id, u, v, _, name in substitutions), max_hops=1
+            )
+            build = time.perf_counter() - start
+
+            python_times, numpy_times = [], []
+            for _ in range(options["repeat"]):
+                start = time.perf_counter()
+                expected = score_python(recipes, ingredients, substitutions, **user)
+                python_times.append(time.perf_counter() - start)
+
+                start = time.perf_counter()
+                rows, scores = engine.score(**user, graph=graph)
+                page_rows, page_scores, _ = top_k_rows(rows, scores, len(rows), 0)
+                numpy_times.append(time.perf_counter() - start)
+
+            got = list(zip(engine.recipe_ids[page_rows].tolist(), page_scores.tolist()))
+            matches = len(got) == len(expected) and all(
+                a[0] == b[0] and abs(a[1] - b[1]) < 1e-9 for a, b in zip(got, expected)
+            )
+            python_ms = min(python_times) * 1000
+            numpy_ms = min(numpy_times) * 1000
+            self.stdout.write(
+                f"{size} recipes: python {python_ms:.1f} ms, numpy {numpy_ms:.1f} ms "
+                f"({python_ms / numpy_ms:.1f}x), engine build {build * 1000:.0f} ms, "
+                f"{len(expected)} scored"
+            )
+            if matches:
+                self.stdout.write(self.style.SUCCESS("✅ Engine ranking matches the Python reference loop"))
+            else:
+                self.stdout.write(self.style.ERROR("❌ Engine ranking differs from the Python reference loop"))
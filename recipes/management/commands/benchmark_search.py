@@ -0,0 +1,104 @@
+import random
+import sqlite3
+import time
+
+from django.core.management.base import BaseCommand
+from recipes import search
+
+SCHEMA = """
+    CREATE TABLE recipes_recipe (id INTEGER PRIMARY KEY, name TEXT, description TEXT, category TEXT);
+    CREATE TABLE recipes_ingredient (id INTEGER PRIMARY KEY, recipe_id INTEGER, name TEXT);
+    CREATE TABLE recipes_step (id INTEGER PRIMARY KEY, recipe_id INTEGER, instruction TEXT);
+    CREATE INDEX recipes_ingredient_recipe ON recipes_ingredient (recipe_id);
+    CREATE INDEX recipes_step_recipe ON recipes_step (recipe_id);
+"""
+
+# The icontains filter scan_search() issues, reduced to one word
+SCAN_SQL = """
+    SELECT r.id FROM recipes_recipe r
+    WHERE (r.name LIKE :p OR r.description LIKE :p
+        OR EXISTS (SELECT 1 FROM recipes_ingredient i WHERE i.recipe_id = r.id AND i.name LIKE :p)
+        OR EXISTS (SELECT 1 FROM recipes_step s WHERE s.recipe_id = r.id AND s.instruction LIKE :p))
+      {category}
+    ORDER BY r.id LIMIT :limit
+"""
+FTS_SQL = f"""
+    SELECT r.id FROM {search.TABLE} JOIN recipes_recipe r ON r.id = {search.TABLE}.rowid
+    WHERE {search.TABLE} MATCH :match {{category}}
+    ORDER BY rank LIMIT :limit
+"""
+
+CATEGORIES = ["breakfast", "lunch", "dinner", "snack", "dessert", "other"]
+
+
+def pseudo_words(rng, count):
+    """Distinct pronounceable words, so prefixes behave like real ingredient names."""
+    syllables = [c + v for c in "bcdfghklmnprstvz" for v in "aeiou"]
+    words = set()
+    while len(words) < count:
+        words.add("".join(rng.choices(syllables, k=rng.randint(2, 4))))
+    return sorted(words)
+
+
+def synthetic_catalog(conn, size, vocab_size=5000, seed=0):
+    rng = random.Random(seed)
+    vocab = pseudo_words(rng, vocab_size)
+    recipes, ingredients, steps = [], [], []
+    for recipe_id in range(1, size + 1):
+        recipes.append((recipe_id, " ".join(rng.sample(vocab, 3)), " ".join(rng.sample(vocab, 12)),
+                        rng.choice(CATEGORIES)))
+        for name in rng.sample(vocab, rng.randint(3, 10)):
+            ingredients.append((recipe_id, name))
+        for _ in range(rng.randint(2, 6)):
+            steps.append((recipe_id, " ".join(rng.sample(vocab, 8))))
+    conn.executemany("INSERT INTO recipes_recipe VALUES (?, ?, ?, ?)", recipes)
+    conn.executemany("INSERT INTO recipes_ingredient (recipe_id, name) VALUES (?, ?)", ingredients)
+    conn.executemany("INSERT INTO recipes_step (recipe_id, instruction) VALUES (?, ?)", steps)
+    return vocab
+
+
+class Command(BaseCommand):
+    help = "Compare FTS5 recipe search with the icontains scan on a synthetic in-memory catalog"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+        parser.add_argument("--queries", type=int, default=20)
+        parser.add_argument("--limit", type=int, default=-1, help="Rows per query; -1 returns every match")
+
+    def handle(self, *args, **options):
+        for size in options["sizes"]:
+            conn = sqlite3.connect(":memory:")
+            conn.executescript(SCHEMA)
+            vocab = synthetic_catalog(conn, size)
+
+            start = time.perf_counter()
+            conn.execute(search.CREATE_SQL)
+            conn.execute(search.RANK_SQL)
+            conn.execute(search.INDEX_SQL)
+            build = time.perf_counter() - start
+
+            rng = random.Random(size)
+            queries = [(word[:rng.randint(4, len(word))], rng.choice([None, rng.choice(CATEGORIES)]))
+                       for word in rng.sample(vocab, options["queries"])]
+
+            timings = {"scan": 0.0, "fts": 0.0}
+            found = {"scan": 0, "fts": 0}
+            for prefix, category in queries:
+                params = {"p": f"%{prefix}%", "match": search.match_expression(prefix),
+                          "limit": options["limit"], "category": category}
+                where = "AND r.category = :category" if category else ""
+                for name, sql in (("scan", SCAN_SQL), ("fts", FTS_SQL)):
+                    start = time.perf_counter()
+                    rows = conn.execute(sql.format(category=where), params).fetchall()
+                    timings[name] += time.perf_counter() - start
+                    found[name] += len(rows)
+            conn.close()
+
+            scan_ms = timings["scan"] * 1000 / len(queries)
+            fts_ms = timings["fts"] * 1000 / len(queries)
+            self.stdout.write(
+                f"{size} recipes: scan {scan_ms:.2f} ms/query, fts5 {fts_ms:.2f} ms/query "
+                f"({scan_ms / fts_ms:.1f}x), index build {build * 1000:.0f} ms, "
+                f"{found['fts']} / {found['scan']} rows returned"
+            )
+        self.stdout.write(self.style.SUCCESS("✅ Search benchmark finished"))
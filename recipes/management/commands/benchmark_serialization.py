@@ -0,0 +1,64 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from recipes.importer import create_recipes
+from recipes.models import Recipe
+from recipes.serializers import RecipeSerializer, RecipeSummary
+
+
+def synthetic_payloads(size, seed=0):
+    rng = random.Random(seed)
+    vocab = [f"ingredient {i}" for i in range(500)]
+    for i in range(size):
+        yield {
+            "name": f"Recipe {i}",
+            "description": "Synthetic benchmark recipe",
+            "category": rng.choice(["breakfast", "lunch", "dinner", "snack"]),
+            "servings": rng.randint(1, 6),
+            "allergens": [],
+            "ingredients": [
+                {"name": name, "quantity": rng.uniform(0.5, 4), "unit": "g",
+                 "calories_per_unit": rng.uniform(0, 9), "protein_per_unit": rng.uniform(0, 1)}
+                for name in rng.sample(vocab, rng.randint(4, 12))
+            ],
+            "steps": [{"step_number": n, "instruction": f"Step {n}"} for n in range(1, rng.randint(3, 8))],
+        }
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare RecipeSerializer with RecipeSummary on synthetic recipes "
+        "(written inside a transaction that is rolled back)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000])
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        for size in options["sizes"]:
+            with transaction.atomic():
+                ids = [recipe.pk for recipe in create_recipes(list(synthetic_payloads(size)))]
+                queryset = Recipe.objects.filter(id__in=ids).order_by("-created_at", "-id")
+
+                full_times, summary_times = [], []
+                for _ in range(options["repeat"]):
+                    start = time.perf_counter()
+                    RecipeSerializer(queryset.prefetch_related("ingredients", "steps"), many=True).data
+                    full_times.append(time.perf_counter() - start)
+
+                    start = time.perf_counter()
+                    summary = RecipeSummary()
+                    [summary.render(row) for row in RecipeSummary.values(queryset)]
+                    summary_times.append(time.perf_counter() - start)
+                transaction.set_rollback(True)
+
+            full_ms = min(full_times) * 1000
+            summary_ms = min(summary_times) * 1000
+            self.stdout.write(
+                f"{size} recipes: RecipeSerializer {full_ms:.1f} ms, RecipeSummary {summary_ms:.1f} ms "
+                f"({full_ms / summary_ms:.1f}x)"
+            )
+        self.stdout.write(self.style.SUCCESS("✅ Serialization benchmark finished"))
@@ -0,0 +1,44 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand
+from recipes.models import Recipe
+from recipes.thumbnails import job_args, render_variants, store_variants
+
+
+class Command(BaseCommand):
+    help = "Render missing or stale image variants for every recipe on a process pool"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+        parser.add_argument("--force", action="store_true", help="Re-render images that already have variants")
+
+    def handle(self, *args, **options):
+        jobs = [
+            (recipe_id, image)
+            for recipe_id, image, variants in Recipe.objects.exclude(image="").exclude(image__isnull=True)
+            .values_list("id", "image", "image_variants").iterator()
+            if options["force"] or (variants or {}).get("source") != image
+        ]
+
+        start = time.perf_counter()
+        rendered = failed = 0
+        with ProcessPoolExecutor(max_workers=max(1, options["workers"])) as pool:
+            futures = {pool.submit(render_variants, *job_args(recipe_id, image)): recipe_id
+                       for recipe_id, image in jobs}
+            for future in as_completed(futures):
+                recipe_id = futures[future]
+                try:
+                    variants = future.result()
+                except (OSError, ValueError) as exc:
+                    failed += 1
+                    self.stderr.write(f"recipe {recipe_id}: {exc}")
+                    continue
+                store_variants(recipe_id, variants)
+                rendered += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Rendered variants for {rendered} recipe(s), {failed} failed, "
+            f"in {time.perf_counter() - start:.1f}s"
+        ))
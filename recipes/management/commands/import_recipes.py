@@ -0,0 +1,45 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from recipes.importer import DEFAULT_CHUNK_SIZE, import_stream
+
+
+class Command(BaseCommand):
+    help = "Stream recipes from a JSONL or CSV file into the catalog with bulk inserts"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--format", dest="file_format", choices=["jsonl", "csv"],
+                            help="Defaults to csv for .csv files and jsonl otherwise")
+        parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+        parser.add_argument("--user", help="Username to record as created_by")
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        file_format = options["file_format"] or ("csv" if path.lower().endswith(".csv") else "jsonl")
+
+        created_by = None
+        if options["user"]:
+            try:
+                created_by = get_user_model().objects.get(username=options["user"])
+            except get_user_model().DoesNotExist:
+                raise CommandError(f"Unknown user {options['user']!r}")
+
+        def progress(stats):
+            self.stdout.write(
+                f"{stats['rows']} rows, {stats['created']} created, {stats['failed']} failed "
+                f"({stats['rows_per_sec']:.0f} rows/sec)"
+            )
+
+        try:
+            with open(path, newline="", encoding="utf-8") as f:
+                stats = import_stream(f, file_format, created_by=created_by,
+                                      chunk_size=options["chunk_size"], progress=progress)
+        except OSError as exc:
+            raise CommandError(str(exc))
+
+        for error in stats["errors"]:
+            self.stderr.write(f"row {error['row']}: {error['errors']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Imported {stats['created']} of {stats['rows']} recipe(s) in {stats['seconds']:.1f}s "
+            f"({stats['rows_per_sec']:.0f} rows/sec)"
+        ))
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:38
+
+from django.db import migrations, models
+
+
+def backfill_name_key(apps, schema_editor):
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    for ing in Ingredient.objects.only('id', 'name').iterator():
+        ing.name_key = (ing.name or '').strip().lower()
+        ing.save(update_fields=['name_key'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0004_ingredient_calories_per_unit_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingredient',
+            name='name_key',
+            field=models.CharField(default='', editable=False, max_length=100),
+        ),
+        migrations.RunPython(backfill_name_key, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=models.Index(fields=['name_key', 'recipe'], name='ingredient_name_recipe_idx'),
+        ),
+    ]
@@ -0,0 +1,100 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:45
+
+import re
+
+from django.db import migrations, models
+
+# Frozen copy of recipes.allergens as of this migration; keep it independent of app code.
+# Bit i is AllergyIntolerance.ALLERGY_TYPES[i].
+ALLERGY_CODES = [
+    "dairy", "eggs", "fish", "shellfish", "tree_nuts", "peanuts", "wheat", "soy", "sesame",
+    "gluten", "corn", "sulfites", "other",
+]
+ALLERGY_BITS = {code: 1 << i for i, code in enumerate(ALLERGY_CODES)}
+
+ALLERGEN_KEYWORDS = {
+    "dairy": {
+        "dairy", "milk", "butter", "buttermilk", "cheese", "cream", "yogurt", "yoghurt",
+        "ghee", "whey", "casein", "lactose", "kefir", "custard", "parmesan", "mozzarella",
+        "cheddar", "feta", "ricotta", "mascarpone",
+    },
+    "eggs": {"egg", "mayonnaise", "mayo", "meringue", "albumen"},
+    "fish": {
+        "fish", "salmon", "tuna", "cod", "tilapia", "anchovy", "anchovie", "sardine", "trout",
+        "halibut", "mackerel", "haddock",
+    },
+    "shellfish": {
+        "shellfish", "shrimp", "prawn", "crab", "lobster", "clam", "mussel", "oyster",
+        "scallop", "crayfish",
+    },
+    "tree_nuts": {
+        "nut", "almond", "walnut", "cashew", "pecan", "pistachio", "hazelnut", "macadamia",
+    },
+    "peanuts": {"peanut"},
+    "wheat": {
+        "wheat", "flour", "bread", "breadcrumb", "pasta", "spaghetti", "couscous", "semolina",
+        "bulgur",
+    },
+    "soy": {"soy", "soya", "tofu", "edamame", "tempeh", "miso"},
+    "sesame": {"sesame", "tahini"},
+    "gluten": {
+        "gluten", "wheat", "flour", "bread", "breadcrumb", "pasta", "spaghetti", "couscous",
+        "semolina", "bulgur", "barley", "rye", "seitan",
+    },
+    "corn": {"corn", "maize", "cornmeal", "cornstarch", "polenta", "popcorn"},
+    "sulfites": {"sulfite", "sulphite", "wine"},
+}
+
+_KEYWORD_BITS = {}
+for _code, _words in ALLERGEN_KEYWORDS.items():
+    for _word in _words:
+        _KEYWORD_BITS[_word] = _KEYWORD_BITS.get(_word, 0) | ALLERGY_BITS[_code]
+
+
+def _word_bits(word):
+    bits = _KEYWORD_BITS.get(word, 0)
+    if not bits and word.endswith("s"):
+        bits = _KEYWORD_BITS.get(word[:-1], 0)
+    return bits
+
+
+def mask_for_names(names):
+    mask = 0
+    for name in names:
+        name = str(name).lower()
+        if name in ALLERGY_BITS:
+            mask |= ALLERGY_BITS[name]
+            continue
+        words = re.findall(r"[a-z]+", name)
+        for i, word in enumerate(words):
+            if i + 1 < len(words) and words[i + 1] == "free":
+                continue
+            mask |= _word_bits(word)
+    return mask
+
+
+def backfill_allergen_mask(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    names = {}
+    for recipe_id, name_key in Ingredient.objects.values_list('recipe_id', 'name_key').iterator():
+        names.setdefault(recipe_id, []).append(name_key)
+    for recipe in Recipe.objects.only('id', 'allergens').iterator():
+        recipe.allergen_mask = mask_for_names(list(recipe.allergens or []) + names.get(recipe.id, []))
+        recipe.save(update_fields=['allergen_mask'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_recipe_nutrition_totals'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='allergen_mask',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_allergen_mask, migrations.RunPython.noop),
+    ]
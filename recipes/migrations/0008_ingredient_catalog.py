@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from recipes.migrations._catalog import resolver
+
+
+def backfill_ingredient_catalog(apps, schema_editor):
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    resolve = resolver(apps)
+    for obj in Ingredient.objects.only('id', 'name').iterator():
+        obj.catalog_id = resolve(obj.name)
+        obj.save(update_fields=['catalog'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_recipe_allergen_mask'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IngredientCatalog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='IngredientAlias',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('alias', models.CharField(max_length=100, unique=True)),
+                ('catalog', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='aliases', to='recipes.ingredientcatalog')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='ingredient',
+            name='catalog',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='recipe_ingredients', to='recipes.ingredientcatalog'),
+        ),
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=models.Index(fields=['catalog', 'recipe'], name='ingredient_catalog_recipe_idx'),
+        ),
+        migrations.RunPython(backfill_ingredient_catalog, migrations.RunPython.noop),
+    ]
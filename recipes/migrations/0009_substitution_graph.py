@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from recipes.migrations._catalog import resolver
+
+
+def backfill_substitution_catalog(apps, schema_editor):
+    RecipeSubstitution = apps.get_model('recipes', 'RecipeSubstitution')
+    resolve = resolver(apps)
+    for sub in RecipeSubstitution.objects.iterator():
+        sub.original_catalog_id = resolve(sub.original_ingredient)
+        sub.substitute_catalog_id = resolve(sub.substitute_ingredient)
+        sub.save(update_fields=['original_catalog', 'substitute_catalog'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0008_ingredient_catalog'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipesubstitution',
+            name='original_catalog',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='substituted_by', to='recipes.ingredientcatalog'),
+        ),
+        migrations.AddField(
+            model_name='recipesubstitution',
+            name='substitute_catalog',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='substitutes_for', to='recipes.ingredientcatalog'),
+        ),
+        migrations.AlterField(
+            model_name='recipesubstitution',
+            name='recipe',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='substitutions', to='recipes.recipe'),
+        ),
+        migrations.RunPython(backfill_substitution_catalog, migrations.RunPython.noop),
+    ]
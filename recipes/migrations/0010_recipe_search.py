@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Frozen copy of the recipes.search DDL as of this migration; keep it independent of app code
+CREATE_SQL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS recipes_recipe_search USING fts5("
+    "name, description, ingredients, steps, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+)
+RANK_SQL = "INSERT INTO recipes_recipe_search(recipes_recipe_search, rank) VALUES ('rank', 'bm25(10.0, 2.0, 5.0, 1.0)')"
+INDEX_SQL = """
+    INSERT INTO recipes_recipe_search(rowid, name, description, ingredients, steps)
+    SELECT r.id, r.name, COALESCE(r.description, ''),
+        COALESCE((SELECT group_concat(i.name, ' ') FROM recipes_ingredient i WHERE i.recipe_id = r.id), ''),
+        COALESCE((SELECT group_concat(s.instruction, ' ') FROM recipes_step s WHERE s.recipe_id = r.id), '')
+    FROM recipes_recipe r
+"""
+DROP_SQL = "DROP TABLE IF EXISTS recipes_recipe_search"
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(CREATE_SQL)
+        schema_editor.execute(RANK_SQL)
+        schema_editor.execute("DELETE FROM recipes_recipe_search")
+        schema_editor.execute(INDEX_SQL)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(DROP_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_substitution_graph'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeSearchEntry',
+            fields=[
+                ('recipe', models.OneToOneField(db_column='rowid', on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_entry', serialize=False, to='recipes.recipe')),
+                ('document', models.TextField(db_column='recipes_recipe_search')),
+                ('rank', models.FloatField()),
+            ],
+            options={
+                'db_table': 'recipes_recipe_search',
+                'managed': False,
+            },
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,83 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:10
+
+import hashlib
+
+import django.db.models.deletion
+import numpy as np
+from django.db import migrations, models
+
+# Frozen copy of the recipes.similarity hashing as of this migration; keep it independent
+# of app code. Signatures must match what the app computes with the same parameters.
+BANDS = 21
+ROWS = 3
+NUM_HASHES = BANDS * ROWS
+_PRIME = (1 << 31) - 1
+_rng = np.random.default_rng(20261018)
+_A = _rng.integers(1, _PRIME, NUM_HASHES, dtype=np.uint64)
+_B = _rng.integers(0, _PRIME, NUM_HASHES, dtype=np.uint64)
+
+
+def minhash(catalog_ids):
+    ids = np.fromiter(set(catalog_ids), dtype=np.uint64)
+    return ((_A[:, None] * ids[None, :] + _B[:, None]) % _PRIME).min(axis=1).astype(np.uint32)
+
+
+def band_buckets(signature):
+    return [
+        (band, int.from_bytes(
+            hashlib.blake2b(signature[band * ROWS:(band + 1) * ROWS].tobytes(), digest_size=8).digest(),
+            "big", signed=True,
+        ))
+        for band in range(BANDS)
+    ]
+
+
+def sign_recipes(apps, schema_editor):
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    RecipeSignature = apps.get_model('recipes', 'RecipeSignature')
+    RecipeBucket = apps.get_model('recipes', 'RecipeBucket')
+    ingredient_sets = {}
+    pairs = Ingredient.objects.filter(catalog__isnull=False).values_list('recipe_id', 'catalog_id')
+    for recipe_id, catalog_id in pairs.iterator():
+        ingredient_sets.setdefault(recipe_id, set()).add(catalog_id)
+
+    signatures, buckets = [], []
+    for recipe_id, catalog_ids in ingredient_sets.items():
+        signature = minhash(catalog_ids)
+        signatures.append(RecipeSignature(recipe_id=recipe_id, minhash=signature.tobytes()))
+        buckets += [
+            RecipeBucket(recipe_id=recipe_id, band=band, bucket=bucket)
+            for band, bucket in band_buckets(signature)
+        ]
+    RecipeSignature.objects.bulk_create(signatures, batch_size=1000)
+    RecipeBucket.objects.bulk_create(buckets, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0014_recipe_ingredient_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeSignature',
+            fields=[
+                ('recipe', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='signature', serialize=False, to='recipes.recipe')),
+                ('minhash', models.BinaryField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RecipeBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('band', models.PositiveSmallIntegerField()),
+                ('bucket', models.BigIntegerField()),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lsh_buckets', to='recipes.recipe')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['band', 'bucket', 'recipe'], name='lsh_band_bucket_idx')],
+            },
+        ),
+        migrations.RunPython(sign_recipes, migrations.RunPython.noop),
+    ]
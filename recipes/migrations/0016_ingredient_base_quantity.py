@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:28
+
+from django.db import migrations, models
+
+from recipes.migrations._units import set_base_quantity
+
+
+def backfill_ingredient_base_quantity(apps, schema_editor):
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    rows = list(Ingredient.objects.only('id', 'name', 'quantity', 'unit'))
+    for obj in rows:
+        set_base_quantity(obj)
+    Ingredient.objects.bulk_update(rows, ['base_quantity', 'base_unit'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0015_recipe_similarity'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingredient',
+            name='base_quantity',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='ingredient',
+            name='base_unit',
+            field=models.CharField(blank=True, default='', editable=False, max_length=3),
+        ),
+        migrations.RunPython(backfill_ingredient_base_quantity, migrations.RunPython.noop),
+    ]
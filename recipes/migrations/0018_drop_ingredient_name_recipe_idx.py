@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:52
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0017_recipesubstitution_updated_at'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='ingredient',
+            name='ingredient_name_recipe_idx',
+        ),
+    ]
@@ -0,0 +1,50 @@
+"""
+Frozen copy of the catalog name normalization (recipes.catalog) and alias resolution
+(IngredientCatalogManager.resolve) for data migrations, as of 0008_ingredient_catalog.
+
+Migrations must keep producing the same keys whatever later happens to the app code, so
+nothing here imports from the app; models come from the historical `apps` registry.
+The leading underscore keeps the migration loader from treating this as a migration.
+"""
+
+_INVARIANT = {"asparagus", "couscous", "hummus", "molasses", "swiss", "grits", "oats"}
+
+
+def singularize(word):
+    if word in _INVARIANT or len(word) <= 3:
+        return word
+    if word.endswith("ies"):
+        return word[:-3] + "y"
+    if word.endswith("oes"):
+        return word[:-2]
+    if word.endswith(("ches", "shes", "xes", "sses")):
+        return word[:-2]
+    if word.endswith("s") and not word.endswith(("ss", "us")):
+        return word[:-1]
+    return word
+
+
+def canonical_key(name):
+    words = (name or "").strip().lower().split()
+    if not words:
+        return ""
+    words[-1] = singularize(words[-1])
+    return " ".join(words)
+
+
+def resolver(apps):
+    """resolve(name) -> catalog id, creating the catalog entry and alias on first sight."""
+    IngredientCatalog = apps.get_model('recipes', 'IngredientCatalog')
+    IngredientAlias = apps.get_model('recipes', 'IngredientAlias')
+    known = dict(IngredientAlias.objects.values_list('alias', 'catalog_id'))
+
+    def resolve(name):
+        key = canonical_key(name)
+        if not key:
+            return None
+        if key not in known:
+            catalog, _ = IngredientCatalog.objects.get_or_create(name=key)
+            IngredientAlias.objects.get_or_create(alias=key, defaults={'catalog': catalog})
+            known[key] = catalog.id
+        return known[key]
+    return resolve
@@ -1,7 +1,139 @@
 from django.db import models
 from django.conf import settings
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from .allergens import mask_for_names
+from .catalog import canonical_key, normalize_ingredient_name
+from .search import Match
+from .units import set_base_quantity
 
-class Recipe(models.Model):
+
+class IngredientCatalogManager(models.Manager):
+    def lookup_ids(self, names):
+        """Map each name to its catalog id, for names the catalog already knows."""
+        keys = {name: canonical_key(name) for name in names}
+        found = dict(
+            IngredientAlias.objects.filter(alias__in=set(keys.values())).values_list("alias", "catalog_id")
+        )
+        return {name: found[key] for name, key in keys.items() if key in found}
+
+    def resolve_many(self, names):
+        """Map each name to a catalog id with a fixed number of queries, creating unknown entries."""
+        keys = {name: canonical_key(name) for name in names}
+        wanted = set(keys.values()) - {""}
+        found = dict(IngredientAlias.objects.filter(alias__in=wanted).values_list("alias", "catalog_id"))
+        unknown = wanted - found.keys()
+        if unknown:
+            self.bulk_create([IngredientCatalog(name=key) for key in unknown], ignore_conflicts=True)
+            catalog_ids = dict(self.filter(name__in=unknown).values_list("name", "id"))
+            IngredientAlias.objects.bulk_create(
+                [IngredientAlias(alias=key, catalog_id=catalog_ids[key]) for key in unknown],
+                ignore_conflicts=True,
+            )
+            found.update(IngredientAlias.objects.filter(alias__in=unknown).values_list("alias", "catalog_id"))
+        return {name: found.get(key) for name, key in keys.items()}
+
+    def resolve(self, name):
+        """Catalog id for `name`, adding a catalog entry the first time a name is seen."""
+        key = canonical_key(name)
+        if not key:
+            return None
+        catalog_id = IngredientAlias.objects.filter(alias=key).values_list("catalog_id", flat=True).first()
+        if catalog_id is None:
+            catalog, _ = self.get_or_create(name=key)
+            IngredientAlias.objects.get_or_create(alias=key, defaults={"catalog": catalog})
+            catalog_id = catalog.id
+        return catalog_id
+
+
+class IngredientCatalog(models.Model):
+    name = models.CharField(max_length=100, unique=True)  # canonical singular form, e.g. "tomato"
+
+    objects = IngredientCatalogManager()
+
+    class Meta:
+        ordering = ["name"]
+
+    def __str__(self):
+        return self.name
+
+
+class IngredientAlias(models.Model):
+    """Surface form ("aubergine", "roma tomato") that resolves to a catalog entry."""
+    alias = models.CharField(max_length=100, unique=True)
+    catalog = models.ForeignKey(IngredientCatalog, on_delete=models.CASCADE, related_name="aliases")
+
+    def save(self, *args, **kwargs):
+        self.alias = canonical_key(self.alias)
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.alias} -> {self.catalog.name}"
+
+
+class VersionBumpMixin:
+    """
+    save() for models with a version counter and an auto_now updated_at (Recipe, MealPlan):
+    updates bump the version in SQL, since child writes touch() the row and self.version
+    may already be stale, then read the new value back.
+    """
+    def save(self, *args, **kwargs):
+        updating = not self._state.adding
+        if updating:
+            self.version = models.F("version") + 1
+            if kwargs.get("update_fields") is not None:
+                kwargs["update_fields"] = {*kwargs["update_fields"], "version", "updated_at"}
+        super().save(*args, **kwargs)
+        if updating:
+            self.refresh_from_db(fields=["version"])
+
+
+class RecipeQuerySet(models.QuerySet):
+    def without_allergens(self, mask):
+        """Exclude recipes sharing any bit with an allergen mask (see recipes.allergens)."""
+        if not mask:
+            return self
+        return self.alias(
+            allergen_hits=models.F("allergen_mask").bitand(mask)
+        ).filter(allergen_hits=0)
+
+    def with_pantry_coverage(self, user):
+        """
+        Annotate pantry_matched (ingredients whose catalog entry is in the user's pantry),
+        pantry_total (Recipe.ingredient_count) and pantry_missing, all computed in SQL.
+        """
+        pantry = user.pantry_items.filter(catalog__isnull=False).values("catalog_id")
+        matched = (
+            Ingredient.objects.filter(recipe=models.OuterRef("pk"), catalog_id__in=pantry)
+            .order_by().values("recipe").annotate(n=models.Count("id")).values("n")
+        )
+        return self.annotate(
+            pantry_matched=Coalesce(models.Subquery(matched), 0),
+            pantry_total=models.F("ingredient_count"),
+        ).annotate(pantry_missing=models.F("pantry_total") - models.F("pantry_matched"))
+
+    def with_pantry_sufficiency(self, user):
+        """
+        Annotate pantry_sufficient: ingredients the user's pantry holds enough of, comparing
+        base quantities (recipes.units) of the same catalog entry and base unit in SQL.
+        """
+        held = (
+            user.pantry_items.filter(catalog_id=models.OuterRef("catalog_id"), base_unit=models.OuterRef("base_unit"))
+            .order_by().values("catalog_id").annotate(total=models.Sum("base_quantity")).values("total")
+        )
+        enough = (
+            Ingredient.objects.filter(recipe=models.OuterRef("pk"), base_quantity__isnull=False)
+            .annotate(held=models.Subquery(held)).filter(held__gte=models.F("base_quantity"))
+            .order_by().values("recipe").annotate(n=models.Count("id")).values("n")
+        )
+        return self.annotate(pantry_sufficient=Coalesce(models.Subquery(enough), 0))
+
+    def touch(self):
+        """Bump version/updated_at without loading rows (used when child rows change)."""
+        return self.update(version=models.F("version") + 1, updated_at=timezone.now())
+
+
+class Recipe(VersionBumpMixin, models.Model):
     CATEGORY_CHOICES = [
         ("breakfast", "Breakfast"),
         ("lunch", "Lunch"),
@@ -14,6 +146,8 @@ class Recipe(models.Model):
     name = models.CharField(max_length=150, default="Unnamed Recipe")
     description = models.TextField(blank=True, null=True)
     image = models.ImageField(upload_to='recipes/', null=True, blank=True)
+    # Resized copies of image, filled in by recipes.thumbnails after upload
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     category = models.CharField(max_length=50, choices=CATEGORY_CHOICES, default="other")
     created_by = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -25,9 +159,86 @@ class Recipe(models.Model):
     servings = models.PositiveIntegerField(default=1)
     allergens = models.JSONField(default=list, blank=True)  # e.g., ["nuts", "gluten"]
 
+    # Bumped on every write to the recipe or its ingredients/steps; drives ETag/Last-Modified
+    version = models.PositiveIntegerField(default=1, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    # Nutrition totals, recomputed from ingredients on write (see refresh_derived_fields)
+    total_calories = models.FloatField(default=0)
+    total_protein = models.FloatField(default=0)
+    total_carbs = models.FloatField(default=0)
+    total_fat = models.FloatField(default=0)
+    calories_per_serving = models.FloatField(default=0)
+    protein_per_serving = models.FloatField(default=0)
+    carbs_per_serving = models.FloatField(default=0)
+    fat_per_serving = models.FloatField(default=0)
+
+    # Bits over AllergyIntolerance.ALLERGY_TYPES, from ingredients and allergens tags
+    allergen_mask = models.IntegerField(default=0)
+    # Number of ingredient rows, kept by refresh_derived_fields; backs the ingredient-count facet
+    ingredient_count = models.PositiveIntegerField(default=0)
+
+    objects = RecipeQuerySet.as_manager()
+
+    NUTRIENTS = ("calories", "protein", "carbs", "fat")
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["calories_per_serving"], name="recipe_calories_serving_idx"),
+            models.Index(fields=["protein_per_serving"], name="recipe_protein_serving_idx"),
+            # Keyset pagination of the recipe list (recipes.ranking.RecipeCursorPagination)
+            models.Index(fields=["created_at", "id"], name="recipe_created_id_idx"),
+            models.Index(fields=["updated_at"], name="recipe_updated_idx"),
+            # Faceted list filters (recipes.facets)
+            models.Index(fields=["category", "created_at", "id"], name="recipe_category_created_idx"),
+            models.Index(fields=["ingredient_count"], name="recipe_ingredient_count_idx"),
+        ]
+
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        self._set_per_serving()
+        self.allergen_mask = self.compute_allergen_mask()
+        super().save(*args, **kwargs)
+
+    def compute_allergen_mask(self):
+        names = list(self.allergens or [])
+        if self.pk:
+            names += self.ingredients.values_list("name_key", flat=True)
+        return mask_for_names(names)
+
+    def _set_per_serving(self):
+        servings = self.servings or 1
+        for nutrient in self.NUTRIENTS:
+            setattr(self, f"{nutrient}_per_serving", getattr(self, f"total_{nutrient}") / servings)
+
+    def refresh_derived_fields(self):
+        """
+        Recompute nutrition totals, ingredient_count and allergen_mask from the ingredient
+        rows and write them, with the version bump, in a single UPDATE.
+        """
+        totals = self.ingredients.aggregate(
+            ingredient_count=models.Count("id"),
+            **{
+                nutrient: models.Sum(models.F("quantity") * models.F(f"{nutrient}_per_unit"))
+                for nutrient in self.NUTRIENTS
+            },
+        )
+        for nutrient in self.NUTRIENTS:
+            setattr(self, f"total_{nutrient}", totals[nutrient] or 0)
+        self.ingredient_count = totals["ingredient_count"]
+        self._set_per_serving()
+        self.allergen_mask = self.compute_allergen_mask()
+        fields = [f"{prefix}{nutrient}{suffix}"
+                  for nutrient in self.NUTRIENTS
+                  for prefix, suffix in (("total_", ""), ("", "_per_serving"))]
+        fields += ["ingredient_count", "allergen_mask"]
+        Recipe.objects.filter(pk=self.pk).update(
+            version=models.F("version") + 1, updated_at=timezone.now(),
+            **{f: getattr(self, f) for f in fields},
+        )
+
 
 class Ingredient(models.Model):
     recipe = models.ForeignKey(Recipe, related_name="ingredients", on_delete=models.CASCADE)
@@ -41,6 +252,35 @@ class Ingredient(models.Model):
     carbs_per_unit = models.FloatField(default=0)
     fat_per_unit = models.FloatField(default=0)
 
+    # Lowercased display name and canonical catalog entry, both derived from name on save
+    name_key = models.CharField(max_length=100, default="", editable=False)
+    catalog = models.ForeignKey(
+        IngredientCatalog, on_delete=models.SET_NULL, null=True, blank=True,
+        editable=False, related_name="recipe_ingredients"
+    )
+    # quantity/unit converted to grams, millilitres or pieces (see recipes.units)
+    base_quantity = models.FloatField(null=True, blank=True, editable=False)
+    base_unit = models.CharField(max_length=3, blank=True, default="", editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["catalog", "recipe"], name="ingredient_catalog_recipe_idx"),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.name_key = normalize_ingredient_name(self.name)
+        self.catalog_id = IngredientCatalog.objects.resolve(self.name)
+        set_base_quantity(self)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            update_fields = set(update_fields)
+            if "name" in update_fields:
+                update_fields |= {"name_key", "catalog"}
+            if update_fields & {"name", "quantity", "unit"}:
+                update_fields |= {"base_quantity", "base_unit"}
+            kwargs["update_fields"] = update_fields
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"{self.quantity} {self.unit} {self.name}".strip()
 
@@ -71,13 +311,73 @@ class FavoriteRecipe(models.Model):
 
 
 class RecipeSubstitution(models.Model):
+    # A substitution without a recipe applies to every recipe (see recipes.substitutions)
     recipe = models.ForeignKey(
         Recipe,
         on_delete=models.CASCADE,
-        related_name="substitutions"
+        related_name="substitutions",
+        null=True,
+        blank=True
     )
     original_ingredient = models.CharField(max_length=100)
     substitute_ingredient = models.CharField(max_length=100)
+    original_catalog = models.ForeignKey(
+        IngredientCatalog, on_delete=models.SET_NULL, null=True, blank=True,
+        editable=False, related_name="substituted_by"
+    )
+    substitute_catalog = models.ForeignKey(
+        IngredientCatalog, on_delete=models.SET_NULL, null=True, blank=True,
+        editable=False, related_name="substitutes_for"
+    )
+    # Moves substitution_stamp() on edits, so every process's graph notices them
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def save(self, *args, **kwargs):
+        self.original_catalog_id = IngredientCatalog.objects.resolve(self.original_ingredient)
+        self.substitute_catalog_id = IngredientCatalog.objects.resolve(self.substitute_ingredient)
+        super().save(*args, **kwargs)
 
     def __str__(self):
-        return f"{self.substitute_ingredient} for {self.original_ingredient} in {self.recipe.name}"
\ No newline at end of file
+        scope = self.recipe.name if self.recipe else "any recipe"
+        return f"{self.substitute_ingredient} for {self.original_ingredient} in {scope}"
+
+
+class RecipeSignature(models.Model):
+    """MinHash signature of a recipe's ingredient catalog ids (see recipes.similarity)."""
+    recipe = models.OneToOneField(
+        Recipe, on_delete=models.CASCADE, primary_key=True, related_name="signature"
+    )
+    minhash = models.BinaryField()
+
+
+class RecipeBucket(models.Model):
+    """One LSH band of a recipe's signature; recipes sharing a (band, bucket) are similarity candidates."""
+    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE, related_name="lsh_buckets")
+    band = models.PositiveSmallIntegerField()
+    bucket = models.BigIntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["band", "bucket", "recipe"], name="lsh_band_bucket_idx"),
+        ]
+
+
+class RecipeSearchEntry(models.Model):
+    """
+    One row of the FTS5 search index (see recipes.search). The table is created and kept
+    in sync with raw SQL; the model only exists so querysets can join and rank on it.
+    """
+    recipe = models.OneToOneField(
+        Recipe, on_delete=models.DO_NOTHING, primary_key=True,
+        db_column="rowid", related_name="search_entry"
+    )
+    # FTS5's hidden column named after the table: MATCH against it searches every column
+    document = models.TextField(db_column="recipes_recipe_search")
+    rank = models.FloatField()
+
+    class Meta:
+        managed = False
+        db_table = "recipes_recipe_search"
+
+
+RecipeSearchEntry._meta.get_field("document").register_lookup(Match)
@@ -0,0 +1,139 @@
+import base64
+import binascii
+from datetime import datetime
+
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+def encode_cursor(offset):
+    return base64.urlsafe_b64encode(f"o={offset}".encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        key, value = base64.urlsafe_b64decode(cursor.encode()).decode().split("=", 1)
+        offset = int(value)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValidationError({"cursor": "Invalid cursor."})
+    if key != "o" or offset < 0:
+        raise ValidationError({"cursor": "Invalid cursor."})
+    return offset
+
+
+def decode_position(cursor):
+    """Keyset cursor -> ((created_at, id), reverse)."""
+    try:
+        key, value = base64.urlsafe_b64decode(cursor.encode()).decode().split("=", 1)
+        created_at, pk, reverse = value.rsplit("|", 2)
+        position = (datetime.fromisoformat(created_at), int(pk))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValidationError({"cursor": "Invalid cursor."})
+    if key != "p" or reverse not in ("0", "1"):
+        raise ValidationError({"cursor": "Invalid cursor."})
+    return position, reverse == "1"
+
+
+def encode_position(created_at, pk, reverse=False):
+    value = f"p={created_at.isoformat()}|{pk}|{int(reverse)}"
+    return base64.urlsafe_b64encode(value.encode()).decode()
+
+
+def get_page_size(request):
+    limit = request.query_params.get("limit")
+    if limit in (None, ""):
+        return DEFAULT_PAGE_SIZE
+    try:
+        limit = int(limit)
+    except ValueError:
+        raise ValidationError({"limit": "Must be an integer."})
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def get_page_params(request):
+    """Read ?limit= and ?cursor= into a (limit, offset) pair."""
+    cursor = request.query_params.get("cursor")
+    offset = decode_cursor(cursor) if cursor else 0
+    return get_page_size(request), offset
+
+
+def offset_links(request, limit, offset, has_more):
+    """(next, previous) URLs for an offset-cursor page."""
+    url = request.build_absolute_uri()
+    next_url = None
+    if has_more:
+        next_url = replace_query_param(url, "cursor", encode_cursor(offset + limit))
+    previous_url = None
+    if offset > 0:
+        previous_offset = max(0, offset - limit)
+        previous_url = (
+            replace_query_param(url, "cursor", encode_cursor(previous_offset))
+            if previous_offset else remove_query_param(url, "cursor")
+        )
+    return next_url, previous_url
+
+
+def paginated_response(request, results, limit, offset, has_more):
+    next_url, previous_url = offset_links(request, limit, offset, has_more)
+    return Response({"next": next_url, "previous": previous_url, "results": results})
+
+
+def _position(row):
+    """(created_at, id) of a model instance or a .values() row."""
+    if isinstance(row, dict):
+        return row["created_at"], row["id"]
+    return row.created_at, row.pk
+
+
+class RecipeCursorPagination(BasePagination):
+    """
+    Keyset pagination for the recipe list, newest first on (created_at, id): each page is
+    one index range scan however deep the client pages, and rows inserted meanwhile do
+    not shift later pages. Querysets in any other order (search results ranked by ?q=)
+    page by offset instead.
+    """
+    ordering = ("-created_at", "-id")
+
+    def paginate_queryset(self, queryset, request, view=None):
+        limit = get_page_size(request)
+        url = request.build_absolute_uri()
+        cursor = request.query_params.get("cursor")
+
+        if tuple(queryset.query.order_by) != self.ordering:
+            offset = decode_cursor(cursor) if cursor else 0
+            page = list(queryset[offset:offset + limit + 1])
+            self.next_url, self.previous_url = offset_links(request, limit, offset, len(page) > limit)
+            return page[:limit]
+
+        position, reverse = decode_position(cursor) if cursor else (None, False)
+        if position is not None:
+            created_at, pk = position
+            if reverse:
+                queryset = queryset.filter(
+                    Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk)
+                ).order_by("created_at", "id")
+            else:
+                queryset = queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk))
+        page = list(queryset[:limit + 1])
+        has_more = len(page) > limit
+        page = page[:limit]
+        if reverse:
+            page.reverse()
+
+        self.next_url = self.previous_url = None
+        if page and (has_more if not reverse else True):
+            self.next_url = replace_query_param(url, "cursor", encode_position(*_position(page[-1])))
+        if page and (has_more if reverse else position is not None):
+            self.previous_url = replace_query_param(
+                url, "cursor", encode_position(*_position(page[0]), reverse=True)
+            )
+        return page
+
+    def get_paginated_response(self, data):
+        return Response({"next": self.next_url, "previous": self.previous_url, "results": data})
@@ -0,0 +1,201 @@
+"""
+Vectorized pantry scoring for what_can_i_cook.
+
+The catalog is held as a sparse recipe x ingredient matrix in CSR form (indptr/indices
+over IngredientCatalog ids) plus dense per-recipe nutrition arrays. Scoring a
+user is then a handful of NumPy operations over the whole catalog; Python-level work
+is limited to the recipes where the substitution graph can cover a missing ingredient
+and the returned page.
+
+Each process keeps one engine and checks it against catalog_stamp() on every
+get_engine(): every write to a recipe or its ingredients bumps Recipe.updated_at and
+deletes change the recipe count, whichever process makes them.
+"""
+import threading
+from collections import defaultdict
+
+import numpy as np
+
+from .models import Recipe, Ingredient
+from .versioning import catalog_stamp
+
+
+class ScoringEngine:
+    def __init__(self, recipes, ingredients):
+        """
+        recipes: iterable of (id, total_calories, total_protein, calories_per_serving,
+                 protein_per_serving, allergens, allergen_mask)
+        ingredients: iterable of (recipe_id, catalog_id, name_key)
+        """
+        recipes = sorted(recipes, key=lambda r: r[0])
+        n = len(recipes)
+        self.recipe_ids = np.fromiter((r[0] for r in recipes), dtype=np.int64, count=n)
+        self.row_of = {recipe_id: row for row, recipe_id in enumerate(self.recipe_ids.tolist())}
+        self.total_calories = np.fromiter((r[1] for r in recipes), dtype=np.float64, count=n)
+        self.total_protein = np.fromiter((r[2] for r in recipes), dtype=np.float64, count=n)
+        self.allergen_mask = np.fromiter((r[6] for r in recipes), dtype=np.int64, count=n)
+        self.per_serving = {
+            "calories_per_serving": np.fromiter((r[3] for r in recipes), dtype=np.float64, count=n),
+            "protein_per_serving": np.fromiter((r[4] for r in recipes), dtype=np.float64, count=n),
+        }
+
+        tag_rows = defaultdict(list)
+        for row, r in enumerate(recipes):
+            for tag in {str(t).lower() for t in (r[5] or [])}:
+                tag_rows[tag].append(row)
+        self.tag_rows = {tag: np.array(rows, dtype=np.int64) for tag, rows in tag_rows.items()}
+
+        # Columns are catalog ids; each row keeps the display name of its first spelling
+        self.vocab = {}
+        self.row_names = [{} for _ in range(n)]
+        for recipe_id, catalog_id, name_key in ingredients:
+            row = self.row_of.get(recipe_id)
+            if row is not None and catalog_id is not None:
+                self.row_names[row].setdefault(catalog_id, name_key)
+        for names in self.row_names:
+            for catalog_id in names:
+                self.vocab.setdefault(catalog_id, len(self.vocab))
+
+        counts = np.fromiter((len(names) for names in self.row_names), dtype=np.int64, count=n)
+        self.indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(counts, out=self.indptr[1:])
+        self.indices = np.fromiter(
+            (self.vocab[catalog_id] for names in self.row_names for catalog_id in names),
+            dtype=np.int64, count=int(self.indptr[-1]),
+        )
+        self.entry_rows = np.repeat(np.arange(n, dtype=np.int64), counts)
+        self.ingredient_counts = counts
+
+    @classmethod
+    def build(cls):
+        return cls(
+            Recipe.objects.values_list(
+                "id", "total_calories", "total_protein",
+                "calories_per_serving", "protein_per_serving", "allergens", "allergen_mask",
+            ).iterator(),
+            Ingredient.objects.values_list("recipe_id", "catalog_id", "name_key").iterator(),
+        )
+
+    def _column_vector(self, catalog_ids):
+        vec = np.zeros(len(self.vocab), dtype=bool)
+        cols = [self.vocab[catalog_id] for catalog_id in catalog_ids if catalog_id in self.vocab]
+        vec[cols] = True
+        return vec
+
+    def score(self, pantry_ids, allergen_mask=0, dietary_preference=None,
+              primary_goal=None, nutrition_bounds=None, graph=None):
+        """
+        Score every recipe for one user, given the catalog ids of their pantry items.
+
+        Returns (rows, scores): the eligible catalog rows in id order and their final
+        scores. The pantry score (available - missing) and health-goal bonus are the
+        original what_can_i_cook loop's, applied to catalog ids rather than names.
+        """
+        n = len(self.recipe_ids)
+        pantry = self._column_vector(pantry_ids)
+
+        # Pantry coverage: sparse matrix x dense vector product
+        available = np.bincount(self.entry_rows, weights=pantry[self.indices], minlength=n).astype(np.int64)
+        missing = self.ingredient_counts - available
+
+        eligible = (available > 0) & ((self.allergen_mask & allergen_mask) == 0)
+        if dietary_preference and dietary_preference != "none":
+            tag_mask = np.zeros(n, dtype=bool)
+            tag_mask[self.tag_rows.get(dietary_preference.lower(), [])] = True
+            eligible &= tag_mask
+        for lookup, value in (nutrition_bounds or {}).items():
+            field, op = lookup.split("__")
+            column = self.per_serving[field]
+            eligible &= column >= value if op == "gte" else column <= value
+
+        # Substitutions: only rows with a missing ingredient the pantry can stand in for
+        # change the counts, so the exact lookup runs for just those recipes.
+        if graph is not None:
+            everywhere, in_recipe = graph.coverable(pantry_ids)
+            coverable = self._column_vector(everywhere) & ~pantry
+            needs = np.bincount(self.entry_rows, weights=coverable[self.indices], minlength=n) > 0
+            for recipe_id, catalog_id in in_recipe:
+                row = self.row_of.get(recipe_id)
+                if row is not None and catalog_id in self.row_names[row] and catalog_id not in pantry_ids:
+                    needs[row] = True
+            for row in np.flatnonzero(needs & eligible).tolist():
+                avail, miss, _, _ = self._resolve(row, pantry_ids, graph)
+                available[row] = len(avail)
+                missing[row] = len(miss)
+
+        pantry_score = available - missing
+        if primary_goal == "weight_loss":
+            scores = pantry_score + np.maximum(0, 100 - self.total_calories)
+        elif primary_goal == "build_muscle":
+            scores = pantry_score + self.total_protein
+        elif primary_goal == "maintain_weight":
+            scores = pantry_score + np.maximum(0, 100 - np.abs(self.total_calories - 2000))
+        else:
+            scores = pantry_score
+
+        rows = np.flatnonzero(eligible)
+        return rows, scores[rows]
+
+    def _resolve(self, row, pantry_ids, graph):
+        names = dict(self.row_names[row])
+        missing = set(names) - pantry_ids
+        available = set(names) & pantry_ids
+        substitutions_used = []
+        if graph is not None:
+            recipe_id = int(self.recipe_ids[row])
+            for orig_id in list(self.row_names[row]):
+                if orig_id not in missing:
+                    continue
+                sub_id = graph.cover(recipe_id, orig_id, pantry_ids)
+                if sub_id is not None:
+                    missing.remove(orig_id)
+                    available.add(sub_id)
+                    names.setdefault(sub_id, graph.names.get(sub_id, ""))
+                    substitutions_used.append(f"{names[orig_id]} -> {names[sub_id]}")
+        return available, missing, substitutions_used, names
+
+    def explain(self, row, pantry_ids, graph=None):
+        """Available/missing ingredient names and substitutions used for one recipe row."""
+        available, missing, substitutions_used, names = self._resolve(row, pantry_ids, graph)
+        return (
+            [names[catalog_id] for catalog_id in available],
+            [names[catalog_id] for catalog_id in missing],
+            substitutions_used,
+        )
+
+
+def top_k_rows(rows, scores, limit, offset):
+    """
+    Stable top-K over engine output: highest score first, ties in catalog order.
+    Returns (page_rows, page_scores, has_more).
+    """
+    k = offset + limit + 1
+    if k < len(rows):
+        # Partition to the k best, then widen to every row tied with the k-th score
+        kth = np.partition(scores, len(scores) - k)[len(scores) - k]
+        keep = scores >= kth
+        rows, scores = rows[keep], scores[keep]
+    order = np.lexsort((rows, -scores))[:k]
+    page = order[offset:offset + limit]
+    return rows[page], scores[page], len(order) > offset + limit
+
+
+_engine = None
+_engine_stamp = None
+_engine_lock = threading.Lock()
+
+
+def get_engine(stamp=None):
+    """
+    The engine for the current catalog. It is rebuilt whenever catalog_stamp() has moved
+    since it was built, so writes made by other worker processes are picked up too;
+    pass stamp if the caller already has it.
+    """
+    global _engine, _engine_stamp
+    if stamp is None:
+        stamp = catalog_stamp()
+    with _engine_lock:
+        if _engine is None or _engine_stamp != stamp:
+            _engine = ScoringEngine.build()
+            _engine_stamp = stamp
+        return _engine
@@ -0,0 +1,106 @@
+"""
+Full-text recipe search.
+
+On SQLite the recipe name, description, ingredient names and step instructions are
+indexed in an FTS5 table keyed by recipe id (created by migration 0010). recipes.signals
+re-indexes a recipe whenever it or one of its ingredients/steps changes, and the bulk
+importer re-indexes each chunk it writes. Results are ranked with BM25, weighting name
+over ingredients over description over steps, and every query word matches as a prefix.
+
+Other databases fall back to scan_search(), a word-by-word icontains filter.
+"""
+import re
+
+from django.db import connection
+from django.db.models import Exists, Lookup, OuterRef, Q
+
+TABLE = "recipes_recipe_search"
+COLUMNS = ("name", "description", "ingredients", "steps")
+# bm25() weights, in COLUMNS order
+RANK = "bm25(10.0, 2.0, 5.0, 1.0)"
+
+CREATE_SQL = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5("
+    f"{', '.join(COLUMNS)}, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+)
+RANK_SQL = f"INSERT INTO {TABLE}({TABLE}, rank) VALUES ('rank', '{RANK}')"
+INDEX_SQL = f"""
+    INSERT INTO {TABLE}(rowid, {', '.join(COLUMNS)})
+    SELECT r.id, r.name, COALESCE(r.description, ''),
+        COALESCE((SELECT group_concat(i.name, ' ') FROM recipes_ingredient i WHERE i.recipe_id = r.id), ''),
+        COALESCE((SELECT group_concat(s.instruction, ' ') FROM recipes_step s WHERE s.recipe_id = r.id), '')
+    FROM recipes_recipe r
+"""
+
+_WORD = re.compile(r"\w+")
+
+
+class Match(Lookup):
+    """document__match=<FTS5 query>, registered on RecipeSearchEntry.document."""
+    lookup_name = "match"
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f"{lhs} MATCH {rhs}", [*lhs_params, *rhs_params]
+
+
+def enabled(conn=None):
+    return (conn or connection).vendor == "sqlite"
+
+
+def match_expression(q):
+    """FTS5 MATCH string for free text: every word must appear, as a prefix. None if no words."""
+    words = _WORD.findall((q or "").lower())
+    if not words:
+        return None
+    return " ".join(f'"{word}"*' for word in words)
+
+
+# ---------------- index maintenance ----------------
+def index_recipes(recipe_ids):
+    """(Re)index the given recipes; ids that no longer exist are just dropped from the index."""
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids or not enabled():
+        return
+    placeholders = ", ".join(["%s"] * len(recipe_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {TABLE} WHERE rowid IN ({placeholders})", recipe_ids)
+        cursor.execute(f"{INDEX_SQL} WHERE r.id IN ({placeholders})", recipe_ids)
+
+
+def remove_recipes(recipe_ids):
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids or not enabled():
+        return
+    placeholders = ", ".join(["%s"] * len(recipe_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {TABLE} WHERE rowid IN ({placeholders})", recipe_ids)
+
+
+# ---------------- querying ----------------
+def scan_search(queryset, q):
+    """Every word of q as a substring of the name, description, an ingredient or a step."""
+    from .models import Ingredient, Step
+
+    words = _WORD.findall((q or "").lower())
+    if not words:
+        return queryset.none()
+    for word in words:
+        queryset = queryset.filter(
+            Q(name__icontains=word)
+            | Q(description__icontains=word)
+            | Exists(Ingredient.objects.filter(recipe=OuterRef("pk"), name__icontains=word))
+            | Exists(Step.objects.filter(recipe=OuterRef("pk"), instruction__icontains=word))
+        )
+    return queryset
+
+
+def search_recipes(queryset, q):
+    """Filter queryset to recipes matching q, best match first (ties by id)."""
+    if not enabled():
+        return scan_search(queryset, q)
+    match = match_expression(q)
+    if match is None:
+        return queryset.none()
+    return queryset.filter(search_entry__document__match=match).order_by("search_entry__rank", "id")
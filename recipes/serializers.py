@@ -1,5 +1,43 @@
+from django.core.files.storage import default_storage
 from rest_framework import serializers
 from .models import Recipe, Ingredient, Step, FavoriteRecipe, RecipeSubstitution
+from .importer import create_recipes
+from .thumbnails import current_variants
+
+
+def favorite_recipe_ids(request):
+    """Ids of the requesting user's favorites, loaded once and cached on the request."""
+    ids = getattr(request, '_favorite_recipe_ids', None)
+    if ids is None:
+        ids = set(
+            FavoriteRecipe.objects.filter(user=request.user).values_list('recipe_id', flat=True)
+        )
+        request._favorite_recipe_ids = ids
+    return ids
+
+
+def media_url(request, name):
+    url = default_storage.url(name)
+    return request.build_absolute_uri(url) if request is not None else url
+
+
+def variant_urls(request, image_name, variants):
+    """{variant: {format: url}} for the variants rendered from the current image."""
+    return {
+        variant: {ext: media_url(request, name) for ext, name in files.items()}
+        for variant, files in current_variants(image_name, variants).items()
+    }
+
+
+class SparseFieldsMixin:
+    """Accepts fields=[...] to serialize only that subset of the declared fields."""
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
 
 class IngredientSerializer(serializers.ModelSerializer):
     class Meta:
@@ -14,39 +52,100 @@ class StepSerializer(serializers.ModelSerializer):
         model = Step
         fields = ['id', 'step_number', 'instruction']
 
-class RecipeSerializer(serializers.ModelSerializer):
+class RecipeSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     ingredients = IngredientSerializer(many=True)
     steps = StepSerializer(many=True)
     is_favorite = serializers.SerializerMethodField(read_only=True)
+    image_variants = serializers.SerializerMethodField(read_only=True)
 
     class Meta:
         model = Recipe
         fields = [
-            'id', 'name', 'description', 'image', 'category', 'created_by',
-            'created_at', 'servings', 'allergens', 'ingredients', 'steps', 'is_favorite'
+            'id', 'name', 'description', 'image', 'image_variants', 'category', 'created_by',
+            'created_at', 'servings', 'allergens', 'ingredients', 'steps', 'is_favorite',
+            'total_calories', 'total_protein', 'total_carbs', 'total_fat',
+            'calories_per_serving', 'protein_per_serving', 'carbs_per_serving', 'fat_per_serving',
+        ]
+        read_only_fields = [
+            'created_by', 'created_at',
+            'total_calories', 'total_protein', 'total_carbs', 'total_fat',
+            'calories_per_serving', 'protein_per_serving', 'carbs_per_serving', 'fat_per_serving',
         ]
-        read_only_fields = ['created_by', 'created_at']
 
     def get_is_favorite(self, obj):
-        user = self.context.get('request').user
-        if user.is_authenticated:
-            return obj.favorite_recipes.filter(user=user).exists()
-        return False
+        request = self.context.get('request')
+        if request is None or not request.user.is_authenticated:
+            return False
+        return obj.id in favorite_recipe_ids(request)
+
+    def get_image_variants(self, obj):
+        return variant_urls(self.context.get('request'), obj.image.name if obj.image else '', obj.image_variants)
 
     def create(self, validated_data):
-        ingredients_data = validated_data.pop('ingredients', [])
-        steps_data = validated_data.pop('steps', [])
         user = self.context['request'].user
-        validated_data.pop('created_by', None)
+        return create_recipes([validated_data], created_by=user)[0]
+
 
-        recipe = Recipe.objects.create(created_by=user, **validated_data)
+class RecipeSummary:
+    """
+    Compact read-only recipe representation for list, recommendation and meal-plan
+    responses. Rows come straight from .values(), so no model instances or nested
+    serializers are built; ingredients and steps are left to the detail endpoint.
+    """
+    FIELDS = (
+        'id', 'name', 'image', 'image_variants', 'category', 'servings', 'allergens', 'created_at',
+        'calories_per_serving', 'protein_per_serving', 'carbs_per_serving', 'fat_per_serving',
+        'is_favorite',
+    )
+    COLUMNS = tuple(f for f in FIELDS if f != 'is_favorite')
 
-        for ing_data in ingredients_data:
-            Ingredient.objects.create(recipe=recipe, **ing_data)
-        for step_data in steps_data:
-            Step.objects.create(recipe=recipe, **step_data)
+    def __init__(self, request=None, fields=None):
+        self.request = request
+        self.fields = tuple(fields) if fields is not None else self.FIELDS
+        self._rows = {}
+        self._datetime = serializers.DateTimeField()
 
-        return recipe
+    @classmethod
+    def values(cls, queryset, *extra):
+        """Summary rows for queryset, plus any extra (annotated) columns."""
+        return queryset.prefetch_related(None).values(*cls.COLUMNS, *extra)
+
+    def _favorites(self):
+        if self.request is None or not self.request.user.is_authenticated:
+            return set()
+        return favorite_recipe_ids(self.request)
+
+    def render(self, row):
+        data = {}
+        for field in self.fields:
+            if field == 'is_favorite':
+                data[field] = row['id'] in self._favorites()
+            elif field == 'image':
+                data[field] = media_url(self.request, row['image']) if row['image'] else None
+            elif field == 'image_variants':
+                data[field] = variant_urls(self.request, row['image'], row['image_variants'])
+            elif field == 'created_at':
+                data[field] = self._datetime.to_representation(row['created_at'])
+            else:
+                data[field] = row[field]
+        return data
+
+    def prime(self, recipe_ids):
+        """Load the rows for any of recipe_ids not seen yet, in one query."""
+        missing = set(recipe_ids) - self._rows.keys() - {None}
+        if missing:
+            for row in self.values(Recipe.objects.filter(id__in=missing)):
+                self._rows[row['id']] = row
+
+    def get(self, recipe_id):
+        self.prime([recipe_id])
+        row = self._rows.get(recipe_id)
+        return self.render(row) if row is not None else None
+
+    def for_ids(self, recipe_ids):
+        """Summaries in the order of recipe_ids, skipping recipes that no longer exist."""
+        self.prime(recipe_ids)
+        return [self.render(self._rows[i]) for i in recipe_ids if i in self._rows]
 
 
 class FavoriteRecipeSerializer(serializers.ModelSerializer):
@@ -58,4 +157,18 @@ class FavoriteRecipeSerializer(serializers.ModelSerializer):
 class RecipeSubstitutionSerializer(serializers.ModelSerializer):
     class Meta:
         model = RecipeSubstitution
-        fields = ['id', 'recipe', 'original_ingredient', 'substitute_ingredient']
\ No newline at end of file
+        fields = ['id', 'recipe', 'original_ingredient', 'substitute_ingredient']
+
+
+class SubstitutionInputSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = RecipeSubstitution
+        fields = ['original_ingredient', 'substitute_ingredient']
+
+
+class RecipeImportSerializer(RecipeSerializer):
+    """One record of a bulk import: a recipe plus its own substitutions."""
+    substitutions = SubstitutionInputSerializer(many=True, required=False)
+
+    class Meta(RecipeSerializer.Meta):
+        fields = RecipeSerializer.Meta.fields + ['substitutions']
@@ -0,0 +1,151 @@
+from django.db.models.signals import pre_delete, pre_save, post_save, post_delete
+from django.db import transaction
+from django.dispatch import receiver
+from django.utils import timezone
+from pantry.models import PantryChange, PantryItem
+from users.models import AllergyIntolerance, DietaryProfile, HealthGoal
+from .cache import recipe_detail_cache, recommendation_cache
+from .catalog import canonical_key
+from .models import Recipe, Ingredient, IngredientAlias, RecipeSubstitution, Step
+from .search import index_recipes, remove_recipes
+from .similarity import update_signatures
+from .substitutions import mark_refreshed, refresh_scope, substitution_stamp
+from .thumbnails import queue_variants
+
+
+def from_recipe_delete(origin):
+    """
+    Child rows deleted along with their recipe: the recipe's own post_delete receivers
+    clean up after it, so per-row receivers have nothing left to refresh.
+    """
+    return isinstance(origin, Recipe)
+
+
+@receiver([post_save, post_delete], sender=Ingredient)
+def refresh_recipe_derived_fields(sender, instance, origin=None, **kwargs):
+    # Nutrition, allergen mask and the version bump in one UPDATE
+    if from_recipe_delete(origin):
+        return
+    recipe = Recipe.objects.only("id", "servings", "allergens").filter(pk=instance.recipe_id).first()
+    if recipe is not None:
+        recipe.refresh_derived_fields()
+
+
+@receiver(post_save, sender=Recipe)
+def index_recipe(sender, instance, **kwargs):
+    index_recipes([instance.pk])
+
+
+@receiver(post_save, sender=Recipe)
+def render_image_variants(sender, instance, **kwargs):
+    name = instance.image.name if instance.image else ""
+    if name and (instance.image_variants or {}).get("source") != name:
+        queue_variants(instance.pk, name)
+
+
+@receiver(post_delete, sender=Recipe)
+def unindex_recipe(sender, instance, **kwargs):
+    remove_recipes([instance.pk])
+
+
+@receiver(post_delete, sender=Recipe)
+def drop_cached_detail(sender, instance, **kwargs):
+    recipe_detail_cache.invalidate_recipe(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Step)
+def touch_recipe(sender, instance, origin=None, **kwargs):
+    # Ingredient writes are bumped by refresh_recipe_derived_fields
+    if not from_recipe_delete(origin):
+        Recipe.objects.filter(pk=instance.recipe_id).touch()
+
+
+@receiver([post_save, post_delete], sender=Ingredient)
+@receiver([post_save, post_delete], sender=Step)
+def reindex_recipe_text(sender, instance, origin=None, **kwargs):
+    if not from_recipe_delete(origin):
+        index_recipes([instance.recipe_id])
+
+
+@receiver([post_save, post_delete], sender=Ingredient)
+def resign_recipe(sender, instance, origin=None, **kwargs):
+    if not from_recipe_delete(origin):
+        update_signatures([instance.recipe_id])
+
+
+@receiver(pre_save, sender=IngredientAlias)
+def remember_alias_catalog(sender, instance, **kwargs):
+    instance._previous_catalog_id = (
+        IngredientAlias.objects.filter(pk=instance.pk).values_list("catalog_id", flat=True).first()
+        if instance.pk else None
+    )
+
+
+@receiver(post_save, sender=IngredientAlias)
+def relink_alias(sender, instance, **kwargs):
+    """
+    Repointing an alias ("aubergine" -> eggplant) is how synonyms are merged, so move the
+    ingredients, pantry items and substitutions whose names resolve through it over to
+    the new catalog entry, and bump whatever stamps cover them.
+    """
+    previous = getattr(instance, "_previous_catalog_id", None)
+    if previous is None or previous == instance.catalog_id:
+        return
+
+    def through_alias(queryset, name_field, catalog_field, *extra):
+        rows = queryset.filter(**{catalog_field: previous}).values_list(name_field, "pk", *extra)
+        return [row[1:] for row in rows if canonical_key(row[0]) == instance.alias]
+
+    now = timezone.now()
+    with transaction.atomic():
+        ingredients = through_alias(Ingredient.objects, "name", "catalog", "recipe_id")
+        Ingredient.objects.filter(pk__in=[pk for pk, _ in ingredients]).update(catalog=instance.catalog_id)
+        recipe_ids = {recipe_id for _, recipe_id in ingredients}
+        Recipe.objects.filter(pk__in=recipe_ids).touch()
+        update_signatures(recipe_ids)
+
+        items = through_alias(PantryItem.objects, "name", "catalog", "user_id")
+        PantryItem.objects.filter(pk__in=[pk for pk, _ in items]).update(catalog=instance.catalog_id, updated_at=now)
+        for user_id in {user_id for _, user_id in items}:
+            PantryChange.objects.record(user_id, [pk for pk, owner in items if owner == user_id])
+
+        for side in ("original", "substitute"):
+            rows = through_alias(RecipeSubstitution.objects, f"{side}_ingredient", f"{side}_catalog")
+            RecipeSubstitution.objects.filter(pk__in=[pk for pk, in rows]).update(
+                **{f"{side}_catalog": instance.catalog_id}, updated_at=now
+            )
+
+
+@receiver(pre_save, sender=RecipeSubstitution)
+def remember_substitution_scope(sender, instance, **kwargs):
+    instance._stamp_before = substitution_stamp()
+    if instance.pk:
+        instance._previous_recipe_id = (
+            RecipeSubstitution.objects.filter(pk=instance.pk).values_list('recipe_id', flat=True).first()
+        )
+
+
+@receiver(pre_delete, sender=RecipeSubstitution)
+def remember_substitution_stamp(sender, instance, **kwargs):
+    instance._stamp_before = substitution_stamp()
+
+
+@receiver([post_save, post_delete], sender=RecipeSubstitution)
+def refresh_substitution_graph(sender, instance, signal, created=False, **kwargs):
+    scopes = {instance.recipe_id, getattr(instance, '_previous_recipe_id', instance.recipe_id)}
+    for recipe_id in scopes:
+        refresh_scope(recipe_id)
+    count, last = before = instance._stamp_before
+    if signal is post_delete:
+        after = (count - 1, last)
+    else:
+        after = (count + 1 if created else count, instance.updated_at)
+    mark_refreshed(before, after)
+
+
+@receiver([post_save, post_delete], sender=PantryItem)
+@receiver([post_save, post_delete], sender=AllergyIntolerance)
+@receiver([post_save, post_delete], sender=DietaryProfile)
+@receiver([post_save, post_delete], sender=HealthGoal)
+def invalidate_user_recommendations(sender, instance, **kwargs):
+    recommendation_cache.invalidate_user(instance.user_id)
@@ -0,0 +1,111 @@
+"""
+"Similar recipes" by Jaccard similarity of ingredient sets.
+
+Each recipe's set of IngredientCatalog ids is summarised by a MinHash signature of
+NUM_HASHES values; two signatures agree at any one position with probability equal to
+the Jaccard similarity of the sets. Signatures are cut into BANDS bands of ROWS values
+and every band is hashed to a RecipeBucket row, so recipes with similarity J share at
+least one bucket with probability 1 - (1 - J**ROWS)**BANDS (about 0.75 at J=0.4 and
+0.94 at J=0.5). similar_recipes() only looks at recipes sharing a bucket with the
+target, an indexed lookup, and ranks those by signature agreement.
+
+recipes.signals re-signs a recipe whenever its ingredients change and the bulk importer
+signs each chunk it writes.
+"""
+import hashlib
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Count, Q
+
+from .models import Ingredient, Recipe, RecipeBucket, RecipeSignature
+
+BANDS = 21
+ROWS = 3
+NUM_HASHES = BANDS * ROWS
+# Candidates ranked by signature, taken in order of how many bands they share
+MAX_CANDIDATES = 500
+
+# Universal hashes h(x) = (a * x + b) mod p; fixed seed so signatures are stable across processes
+_PRIME = (1 << 31) - 1
+_rng = np.random.default_rng(20261018)
+_A = _rng.integers(1, _PRIME, NUM_HASHES, dtype=np.uint64)
+_B = _rng.integers(0, _PRIME, NUM_HASHES, dtype=np.uint64)
+
+
+def minhash(catalog_ids):
+    """Signature of a non-empty set of catalog ids, as NUM_HASHES uint32 values."""
+    ids = np.fromiter(set(catalog_ids), dtype=np.uint64)
+    return ((_A[:, None] * ids[None, :] + _B[:, None]) % _PRIME).min(axis=1).astype(np.uint32)
+
+
+def band_buckets(signature):
+    """[(band, bucket)] for a signature; buckets are stable signed 64-bit hashes."""
+    return [
+        (band, int.from_bytes(
+            hashlib.blake2b(signature[band * ROWS:(band + 1) * ROWS].tobytes(), digest_size=8).digest(),
+            "big", signed=True,
+        ))
+        for band in range(BANDS)
+    ]
+
+
+def signature_rows(ingredient_sets):
+    """(RecipeSignature, RecipeBucket) instances for {recipe_id: catalog ids}; empty sets get none."""
+    signatures, buckets = [], []
+    for recipe_id, catalog_ids in ingredient_sets.items():
+        if not catalog_ids:
+            continue
+        signature = minhash(catalog_ids)
+        signatures.append(RecipeSignature(recipe_id=recipe_id, minhash=signature.tobytes()))
+        buckets += [RecipeBucket(recipe_id=recipe_id, band=b, bucket=h) for b, h in band_buckets(signature)]
+    return signatures, buckets
+
+
+def update_signatures(recipe_ids):
+    """Re-sign the given recipes from their current ingredients; missing recipes are skipped."""
+    recipe_ids = set(recipe_ids)
+    if not recipe_ids:
+        return
+    ingredient_sets = {
+        pk: set() for pk in Recipe.objects.filter(pk__in=recipe_ids).values_list("pk", flat=True)
+    }
+    pairs = Ingredient.objects.filter(recipe_id__in=ingredient_sets, catalog__isnull=False)
+    for recipe_id, catalog_id in pairs.values_list("recipe_id", "catalog_id"):
+        ingredient_sets[recipe_id].add(catalog_id)
+
+    signatures, buckets = signature_rows(ingredient_sets)
+    with transaction.atomic():
+        RecipeSignature.objects.filter(recipe_id__in=recipe_ids).delete()
+        RecipeBucket.objects.filter(recipe_id__in=recipe_ids).delete()
+        RecipeSignature.objects.bulk_create(signatures)
+        RecipeBucket.objects.bulk_create(buckets)
+
+
+def similar_recipes(recipe_id):
+    """
+    [(recipe_id, estimated Jaccard similarity)] for recipes sharing an LSH bucket with
+    recipe_id, most similar first (ties by id). Two queries however large the catalog is.
+    """
+    minhash_bytes = RecipeSignature.objects.filter(recipe_id=recipe_id).values_list("minhash", flat=True).first()
+    if minhash_bytes is None:
+        return []
+    signature = np.frombuffer(bytes(minhash_bytes), dtype=np.uint32)
+
+    same_bucket = Q()
+    for band, bucket in band_buckets(signature):
+        same_bucket |= Q(band=band, bucket=bucket)
+    candidates = (
+        RecipeBucket.objects.filter(same_bucket).exclude(recipe_id=recipe_id)
+        .values("recipe_id").annotate(shared=Count("id")).order_by("-shared", "recipe_id")
+        .values("recipe_id")[:MAX_CANDIDATES]
+    )
+    rows = list(RecipeSignature.objects.filter(recipe_id__in=candidates).values_list("recipe_id", "minhash"))
+    if not rows:
+        return []
+
+    ids = np.fromiter((pk for pk, _ in rows), dtype=np.int64, count=len(rows))
+    matrix = np.frombuffer(b"".join(bytes(m) for _, m in rows), dtype=np.uint32).reshape(len(rows), NUM_HASHES)
+    scores = (matrix == signature).mean(axis=1)
+    order = np.lexsort((ids, -scores))
+    return [(int(ids[i]), float(scores[i])) for i in order]
@@ -0,0 +1,252 @@
+"""
+Substitution graph over IngredientCatalog ids.
+
+Every RecipeSubstitution row is an edge original -> substitute. Rows without a recipe are
+global edges that apply to every recipe; rows with a recipe only apply inside it. For each
+ingredient the graph keeps a closure table of everything reachable within
+settings.SUBSTITUTION_MAX_HOPS edges, so "can the pantry cover this missing ingredient" is
+a dictionary lookup. Changing one scope's rows only recomputes the closures that path
+through the changed nodes.
+
+Each process keeps one graph and checks it against substitution_stamp() on every
+get_graph(), rebuilding it after writes made elsewhere.
+"""
+import threading
+from collections import Counter, defaultdict
+
+from django.conf import settings
+
+from .catalog import normalize_ingredient_name
+from .models import RecipeSubstitution
+from .versioning import collection_stamp
+
+
+def _bfs(start, neighbours, max_hops):
+    """{node: hops} for nodes reachable from start in 1..max_hops edges, and the nodes expanded."""
+    reach = {}
+    expanded = {start}
+    frontier = [start]
+    for hops in range(1, max_hops + 1):
+        next_frontier = []
+        for node in frontier:
+            for nxt in neighbours(node):
+                if nxt != start and nxt not in reach:
+                    reach[nxt] = hops
+                    next_frontier.append(nxt)
+        if hops < max_hops:
+            expanded.update(next_frontier)
+        frontier = next_frontier
+    return reach, expanded
+
+
+class SubstitutionGraph:
+    def __init__(self, rows, max_hops=2):
+        """rows: iterable of (recipe_id or None, original_catalog_id, substitute_catalog_id, substitute_name)"""
+        self.max_hops = max_hops
+        self.edges = defaultdict(Counter)  # scope (recipe id, None = global) -> Counter[(u, v)]
+        self.names = {}
+        for recipe_id, u, v, name in rows:
+            if u is None or v is None or u == v:
+                continue
+            self.edges[recipe_id][(u, v)] += 1
+            self.names.setdefault(v, name)
+        self._rebuild()
+
+    def _adjacency(self, scope):
+        adjacency = defaultdict(set)
+        for u, v in self.edges.get(scope, ()):
+            adjacency[u].add(v)
+        return adjacency
+
+    def _rebuild(self):
+        self.global_adj = self._adjacency(None)
+        self.global_reach = {}
+        self.global_expanded = {}
+        self.global_reverse = defaultdict(dict)
+        for u in list(self.global_adj):
+            self._close_global(u)
+
+        self.recipe_adj = {}
+        self.recipe_reach = {}
+        self.recipe_reverse = defaultdict(set)
+        self.recipes_by_node = defaultdict(set)
+        self.nodes_by_recipe = {}
+        for scope in self.edges:
+            if scope is not None:
+                self._close_recipe(scope)
+
+    # ---------------- closures ----------------
+    def _drop_global(self, u):
+        for v in self.global_reach.pop(u, {}):
+            self.global_reverse[v].pop(u, None)
+        self.global_expanded.pop(u, None)
+
+    def _close_global(self, u):
+        self._drop_global(u)
+        reach, expanded = _bfs(u, lambda n: self.global_adj.get(n, ()), self.max_hops)
+        if reach:
+            self.global_reach[u] = reach
+            self.global_expanded[u] = expanded
+            for v, hops in reach.items():
+                self.global_reverse[v][u] = hops
+
+    def _drop_recipe(self, recipe_id):
+        for u, reach in self.recipe_reach.pop(recipe_id, {}).items():
+            for v in reach:
+                self.recipe_reverse[v].discard((recipe_id, u))
+        for node in self.nodes_by_recipe.pop(recipe_id, ()):
+            self.recipes_by_node[node].discard(recipe_id)
+        self.recipe_adj.pop(recipe_id, None)
+
+    def _close_recipe(self, recipe_id):
+        """Closures inside one recipe, for every start node whose paths can use its edges."""
+        self._drop_recipe(recipe_id)
+        adjacency = self._adjacency(recipe_id)
+        if not adjacency:
+            return
+        self.recipe_adj[recipe_id] = adjacency
+
+        def neighbours(node):
+            return adjacency.get(node, set()) | self.global_adj.get(node, set())
+
+        # Start nodes: the recipe's own sources, plus anything reaching them through global edges
+        starts = set(adjacency)
+        for source in adjacency:
+            starts.update(u for u, hops in self.global_reverse.get(source, {}).items() if hops < self.max_hops)
+
+        closures = {}
+        nodes = set()
+        for u in starts:
+            reach, expanded = _bfs(u, neighbours, self.max_hops)
+            closures[u] = reach
+            nodes |= expanded
+            for v in reach:
+                self.recipe_reverse[v].add((recipe_id, u))
+        for node in nodes:
+            self.recipes_by_node[node].add(recipe_id)
+        self.nodes_by_recipe[recipe_id] = nodes
+        self.recipe_reach[recipe_id] = closures
+
+    # ---------------- incremental refresh ----------------
+    def replace_scope(self, recipe_id, rows):
+        """Swap in the current rows of one scope (recipe id, or None for global edges)."""
+        edges = Counter()
+        for u, v, name in rows:
+            if u is not None and v is not None and u != v:
+                edges[(u, v)] += 1
+                self.names.setdefault(v, name)
+        old_nodes = {u for u, _ in self.edges.get(recipe_id, ())}
+        if edges:
+            self.edges[recipe_id] = edges
+        else:
+            self.edges.pop(recipe_id, None)
+
+        if recipe_id is not None:
+            self._close_recipe(recipe_id)
+            return
+
+        # Global change: recompute every closure that expands one of the changed sources
+        self.global_adj = self._adjacency(None)
+        changed = old_nodes | {u for u, _ in edges}
+        affected = set(changed)
+        for u, expanded in self.global_expanded.items():
+            if expanded & changed:
+                affected.add(u)
+        touched = set()
+        for u in affected:
+            touched.update(self.global_reach.get(u, ()))
+            self._close_global(u)
+            touched.update(self.global_reach.get(u, ()))
+
+        # Recipe closures that walk a changed node, or whose sources gained/lost global starts
+        recipes = set()
+        for node in changed:
+            recipes |= self.recipes_by_node.get(node, set())
+        recipes |= {scope for scope, adjacency in self.recipe_adj.items() if touched.intersection(adjacency)}
+        for scope in recipes:
+            self._close_recipe(scope)
+
+    # ---------------- lookups ----------------
+    def reach(self, recipe_id, u):
+        """{substitute: hops} for ingredient u inside recipe_id."""
+        closures = self.recipe_reach.get(recipe_id)
+        if closures is not None and u in closures:
+            return closures[u]
+        return self.global_reach.get(u, {})
+
+    def cover(self, recipe_id, u, pantry_ids):
+        """Closest substitute for u that the pantry holds, or None."""
+        best = None
+        for v, hops in self.reach(recipe_id, u).items():
+            if v in pantry_ids and (best is None or (hops, v) < best):
+                best = (hops, v)
+        return best[1] if best else None
+
+    def coverable(self, pantry_ids):
+        """
+        Ingredients the pantry can stand in for: a set of catalog ids usable in every recipe,
+        and a set of (recipe_id, catalog_id) pairs that only hold inside one recipe.
+        """
+        everywhere, in_recipe = set(), set()
+        for v in pantry_ids:
+            everywhere.update(self.global_reverse.get(v, ()))
+            in_recipe.update(self.recipe_reverse.get(v, ()))
+        return everywhere, in_recipe
+
+
+def graph_rows(queryset):
+    for recipe_id, u, v, name in queryset.values_list(
+        "recipe_id", "original_catalog_id", "substitute_catalog_id", "substitute_ingredient"
+    ).iterator():
+        yield recipe_id, u, v, normalize_ingredient_name(name)
+
+
+def substitution_stamp():
+    """(row count, latest updated_at) of RecipeSubstitution; moved by writes from any process."""
+    return collection_stamp(RecipeSubstitution.objects.all(), "updated_at")
+
+
+_graph = None
+_graph_stamp = None
+_graph_lock = threading.Lock()
+
+
+def get_graph(stamp=None):
+    """
+    The graph for the current substitution rows. It is rebuilt whenever
+    substitution_stamp() differs from the stamp it was built or last refreshed at, so
+    writes made by other worker processes are picked up too; pass stamp if the caller
+    already has it.
+    """
+    global _graph, _graph_stamp
+    if stamp is None:
+        stamp = substitution_stamp()
+    with _graph_lock:
+        if _graph is None or _graph_stamp != stamp:
+            _graph = SubstitutionGraph(
+                graph_rows(RecipeSubstitution.objects.all()),
+                max_hops=getattr(settings, "SUBSTITUTION_MAX_HOPS", 2),
+            )
+            _graph_stamp = stamp
+        return _graph
+
+
+def refresh_scope(recipe_id):
+    """Reload one scope's rows into the live graph (no-op until the graph is first built)."""
+    with _graph_lock:
+        if _graph is None:
+            return
+        rows = graph_rows(RecipeSubstitution.objects.filter(recipe_id=recipe_id))
+        _graph.replace_scope(recipe_id, [row[1:] for row in rows])
+
+
+def mark_refreshed(before, after):
+    """
+    After refresh_scope() has applied one write that moved substitution_stamp() from
+    before to after, keep the live graph if that write is the only change since it was
+    current. Otherwise another process wrote too and get_graph() will rebuild it.
+    """
+    global _graph_stamp
+    with _graph_lock:
+        if _graph is not None and _graph_stamp == before and substitution_stamp() == after:
+            _graph_stamp = after
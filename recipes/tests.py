@@ -1,3 +1,856 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import DatabaseError, connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+import numpy as np
+from PIL import Image
+from rest_framework.test import APIClient
+
+from users.models import AllergyIntolerance, User
+from pantry.models import PantryChange, PantryItem
+from .allergens import ALLERGY_BITS, mask_for_allergies, mask_for_names
+from .cache import RecommendationCache, recipe_detail_cache, recommendation_cache
+from .importer import import_stream
+from .models import (
+    FavoriteRecipe, Ingredient, IngredientAlias, IngredientCatalog, Recipe, RecipeSignature, RecipeSubstitution,
+    Step,
+)
+from .scoring import ScoringEngine, get_engine, top_k_rows
+from .serializers import RecipeSummary
+from .substitutions import get_graph
+from .thumbnails import job_args, render_variants, store_variants, variant_names
+from .units import from_base, to_base
+
+
+class RecipeVersionTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("cook", "cook@example.com", "pw")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.recipe = Recipe.objects.create(name="Soup", created_by=self.user)
+
+    def get(self, etag=None):
+        headers = {"HTTP_IF_NONE_MATCH": etag} if etag else {}
+        return self.client.get(f"/api/recipes/{self.recipe.pk}/", **headers)
+
+    def test_stale_instance_save_bumps_version(self):
+        Ingredient.objects.create(recipe=self.recipe, name="carrot", quantity=2, unit="pcs")
+        etag = self.get()["ETag"]
+
+        self.recipe.name = "Stew"
+        self.recipe.save()
+
+        self.assertEqual(self.recipe.version, Recipe.objects.get(pk=self.recipe.pk).version)
+        self.assertEqual(self.recipe.version, 3)
+        response = self.get(etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertIn(b'"Stew"', response.content)
+
+
+class PantryStampTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("cook", "cook@example.com", "pw")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        recipe = Recipe.objects.create(name="Rice bowl", created_by=self.user)
+        Ingredient.objects.create(recipe=recipe, name="rice", quantity=200, unit="g")
+        self.rice = PantryItem.objects.create(user=self.user, name="rice", quantity=100, unit="g")
+
+    def get(self, etag=None):
+        headers = {"HTTP_IF_NONE_MATCH": etag} if etag else {}
+        return self.client.get("/api/recipes/?max_missing=0", **headers)
+
+    def test_quantity_change_revalidates(self):
+        response = self.get()
+        self.assertEqual(response.data["results"][0]["pantry_sufficient"], 0)
+
+        self.rice.quantity = 500
+        self.rice.save()
+
+        response = self.get(response["ETag"])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["results"][0]["pantry_sufficient"], 1)
+
+
+class IngredientSignalTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("cook", "cook@example.com", "pw")
+
+    def recipe_with(self, count):
+        recipe = Recipe.objects.create(name="Soup", created_by=self.user)
+        for i in range(count):
+            Ingredient.objects.create(recipe=recipe, name="water", quantity=i, calories_per_unit=1)
+        return recipe
+
+    def test_one_recipe_update_per_ingredient_write(self):
+        recipe = self.recipe_with(1)
+        with CaptureQueriesContext(connection) as queries:
+            Ingredient.objects.create(recipe=recipe, name="water", quantity=2, calories_per_unit=1)
+        updates = [q for q in queries.captured_queries if q["sql"].startswith('UPDATE "recipes_recipe"')]
+        self.assertEqual(len(updates), 1)
+        recipe.refresh_from_db()
+        self.assertEqual((recipe.version, recipe.total_calories, recipe.ingredient_count), (3, 2, 2))
+
+    def test_recipe_delete_skips_ingredient_receivers(self):
+        small, large = self.recipe_with(2), self.recipe_with(20)
+        with CaptureQueriesContext(connection) as small_delete:
+            small.delete()
+        with CaptureQueriesContext(connection) as large_delete:
+            large.delete()
+        self.assertEqual(len(large_delete.captured_queries), len(small_delete.captured_queries))
+
+
+class UnitTests(SimpleTestCase):
+    def test_volume_with_density_is_based_in_grams(self):
+        self.assertEqual(to_base(2, "Cups", "milk"), (2 * 236.588 * 1.03, "g"))
+        self.assertAlmostEqual(from_base(to_base(2, "cups", "milk")[0], "l", "milk"), 0.473176)
+
+    def test_volume_without_density_stays_in_millilitres(self):
+        self.assertEqual(to_base(1.5, "l", "stock"), (1500, "ml"))
+        self.assertEqual(to_base(2, "tbsp.", "stock"), (2 * 14.7868, "ml"))
+
+    def test_unknown_unit_has_no_base_quantity(self):
+        self.assertEqual(to_base(2, "cloves", "garlic"), (None, ""))
+
+
+class IngredientAliasTests(TestCase):
+    def test_repointed_alias_relinks_rows(self):
+        user = User.objects.create_user("cook", "cook@example.com", "pw")
+        recipe = Recipe.objects.create(name="Moussaka", created_by=user)
+        ingredient = Ingredient.objects.create(recipe=recipe, name="Aubergines", quantity=1)
+        other = Ingredient.objects.create(recipe=recipe, name="aubergine leaves", quantity=1)
+        item = PantryItem.objects.create(user=user, name="aubergine", quantity=2, unit="pcs")
+        substitution = RecipeSubstitution.objects.create(original_ingredient="aubergine", substitute_ingredient="zucchini")
+        eggplant = IngredientCatalog.objects.get(pk=IngredientCatalog.objects.resolve("eggplant"))
+        recipe.refresh_from_db()
+        version, stamp = recipe.version, PantryChange.objects.filter(user=user).latest("id").id
+        signature = bytes(RecipeSignature.objects.get(recipe=recipe).minhash)
+
+        alias = IngredientAlias.objects.get(alias="aubergine")
+        alias.catalog = eggplant
+        alias.save()
+
+        for row in (ingredient, other, item, substitution):
+            row.refresh_from_db()
+        self.assertEqual(ingredient.catalog_id, eggplant.id)
+        self.assertNotEqual(other.catalog_id, eggplant.id)
+        self.assertEqual(item.catalog_id, eggplant.id)
+        self.assertEqual(substitution.original_catalog_id, eggplant.id)
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.version, version + 1)
+        self.assertGreater(PantryChange.objects.filter(user=user).latest("id").id, stamp)
+        self.assertNotEqual(bytes(RecipeSignature.objects.get(recipe=recipe).minhash), signature)
+
+
+class EngineStampTests(TestCase):
+    def test_rebuilt_after_write_from_another_process(self):
+        recipe = Recipe.objects.create(name="Soup")
+        Ingredient.objects.create(recipe=recipe, name="water", quantity=1)
+        engine = get_engine()
+        self.assertIs(get_engine(), engine)
+
+        # A write in another worker: no signals reach this process, only the row changes
+        Recipe.objects.filter(pk=recipe.pk).update(total_calories=50)
+        Recipe.objects.filter(pk=recipe.pk).touch()
+
+        rebuilt = get_engine()
+        self.assertIsNot(rebuilt, engine)
+        self.assertEqual(rebuilt.total_calories.tolist(), [50])
+
+
+class SubstitutionGraphStampTests(TestCase):
+    def setUp(self):
+        self.recipe = Recipe.objects.create(name="Soup")
+        self.row = RecipeSubstitution.objects.create(
+            recipe=self.recipe, original_ingredient="milk", substitute_ingredient="oat milk"
+        )
+        self.graph = get_graph()
+
+    def test_local_write_refreshes_in_place(self):
+        RecipeSubstitution.objects.create(original_ingredient="butter", substitute_ingredient="oil")
+        self.assertIs(get_graph(), self.graph)
+
+    def test_rebuilt_after_write_from_another_process(self):
+        RecipeSubstitution.objects.filter(pk=self.row.pk).update(
+            original_catalog=None, updated_at=timezone.now()
+        )
+        self.assertIsNot(get_graph(), self.graph)
+
+
+class RecommendationCacheTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("cook", "cook@example.com", "pw")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.recipe = Recipe.objects.create(name="Rice bowl")
+        Ingredient.objects.create(recipe=self.recipe, name="rice", quantity=1)
+
+    def recommended_ids(self):
+        response = self.client.get("/api/recipes/what_can_i_cook/")
+        self.assertEqual(response.status_code, 200)
+        return [data["id"] for data in response.data["results"]]
+
+    def test_pantry_write_from_another_process(self):
+        self.assertEqual(self.recommended_ids(), [])
+
+        # A batch write in another worker: rows and change log only, no signals here
+        item = PantryItem.objects.bulk_create([PantryItem(
+            user=self.user, name="rice", quantity=1, catalog_id=IngredientCatalog.objects.resolve("rice"),
+        )])[0]
+        PantryChange.objects.record(self.user.id, [item.id])
+
+        self.assertEqual(self.recommended_ids(), [self.recipe.id])
+
+    def test_entries_hold_no_engine(self):
+        recommendation_cache.clear()
+        self.recommended_ids()
+        values = [entry[0] for entry in recommendation_cache._entries.values()]
+        self.assertEqual(len(values), 1)
+        self.assertFalse(any(isinstance(part, ScoringEngine) for part in values[0]))
+        self.assertGreater(recommendation_cache.stats()["bytes"], 0)
+
+    def test_catalog_write_keeps_other_entries(self):
+        recommendation_cache.clear()
+        self.recommended_ids()
+        Ingredient.objects.create(recipe=self.recipe, name="beans", quantity=1)
+        RecipeSubstitution.objects.create(original_ingredient="rice", substitute_ingredient="quinoa")
+        self.assertEqual(recommendation_cache.stats()["entries"], 1)
+
+    def test_stamp_mismatch_is_a_miss(self):
+        cache = RecommendationCache(1024)
+        self.assertEqual(cache.get_or_compute(1, "key", "a", lambda: 1), 1)
+        self.assertEqual(cache.get_or_compute(1, "key", "a", lambda: 2), 1)
+        self.assertEqual(cache.get_or_compute(1, "key", "b", lambda: 3), 3)
+
+
+class BackfillNutritionTests(TestCase):
+    def test_backfill_bumps_version(self):
+        recipe = Recipe.objects.create(name="Soup", servings=2)
+        Ingredient.objects.create(recipe=recipe, name="water", quantity=2, calories_per_unit=5)
+        Recipe.objects.filter(pk=recipe.pk).update(total_calories=0)
+        version, updated_at = Recipe.objects.values_list("version", "updated_at").get(pk=recipe.pk)
+
+        call_command("backfill_recipe_nutrition", stdout=io.StringIO())
+
+        recipe.refresh_from_db()
+        self.assertEqual((recipe.total_calories, recipe.calories_per_serving), (10, 5))
+        self.assertEqual(recipe.version, version + 1)
+        self.assertGreater(recipe.updated_at, updated_at)
+
+
+class RecipeDetailCacheTests(TestCase):
+    def setUp(self):
+        recipe_detail_cache.clear()
+        self.user = User.objects.create_user("cook", "cook@example.com", "pw")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.recipe = Recipe.objects.create(name="Soup", created_by=self.user)
+        self.carrot = Ingredient.objects.create(recipe=self.recipe, name="carrot", quantity=2)
+
+    def get(self, etag=None):
+        headers = {"HTTP_IF_NONE_MATCH": etag} if etag else {}
+        return self.client.get(f"/api/recipes/{self.recipe.pk}/", **headers)
+
+    def test_unchanged_recipe_is_not_modified(self):
+        etag = self.get()["ETag"]
+        self.assertEqual(self.get(etag).status_code, 304)
+
+    def test_ingredient_edit_serves_new_body(self):
+        etag = self.get()["ETag"]
+        self.carrot.name = "parsnip"
+        self.carrot.save()
+
+        response = self.get(etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual([i["name"] for i in json.loads(response.content)["ingredients"]], ["parsnip"])
+
+    def test_recipe_edit_serves_new_body(self):
+        etag = self.get()["ETag"]
+        recipe = Recipe.objects.get(pk=self.recipe.pk)
+        recipe.servings = 4
+        recipe.save()
+
+        response = self.get(etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)["servings"], 4)
+
+    def test_favorite_is_per_user_over_a_shared_body(self):
+        self.get()
+        self.client.post(f"/api/recipes/{self.recipe.pk}/favorite/")
+        self.assertTrue(json.loads(self.get().content)["is_favorite"])
+
+        other = APIClient()
+        other.force_authenticate(User.objects.create_user("guest", "guest@example.com", "pw"))
+        self.assertFalse(json.loads(other.get(f"/api/recipes/{self.recipe.pk}/").content)["is_favorite"])
+        self.assertEqual(recipe_detail_cache.stats()["entries"], 1)
+
+
+class RecipeImageTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        self.user = User.objects.create_user("cook", "cook@example.com", "pw")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_api_create_renders_variants(self):
+        image = io.BytesIO()
+        Image.new("RGB", (800, 600), "red").save(image, "PNG")
+        upload = SimpleUploadedFile("photo.png", image.getvalue(), content_type="image/png")
+        with self.settings(MEDIA_ROOT=self.media, RECIPE_THUMBNAIL_WORKERS=0):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post("/api/recipes/", {
+                    "name": "Pic", "image": upload,
+                    "ingredients[0]name": "tomato", "ingredients[0]quantity": 2,
+                    "steps[0]step_number": 1, "steps[0]instruction": "Slice",
+                }, format="multipart")
+        self.assertEqual(response.status_code, 201, response.data)
+        recipe = Recipe.objects.get(pk=response.data["id"])
+        self.assertEqual(recipe.image_variants["source"], recipe.image.name)
+        self.assertEqual(set(recipe.image_variants), {"source", "thumb", "card", "full"})
+
+
+    def test_overlapping_jobs_keep_each_others_files(self):
+        with self.settings(MEDIA_ROOT=self.media):
+            image = io.BytesIO()
+            Image.new("RGB", (300, 200), "blue").save(image, "PNG")
+            source = default_storage.save("recipes/photo.png", image)
+            recipe = Recipe.objects.create(name="Pic", image=source)
+            first, second, stale = (render_variants(*job_args(recipe.pk, source)) for _ in range(3))
+            stale["source"] = "recipes/replaced.png"
+
+            store_variants(recipe.pk, first)
+            store_variants(recipe.pk, second)
+            store_variants(recipe.pk, stale)
+
+            recipe.refresh_from_db()
+            self.assertEqual(recipe.image_variants, second)
+            self.assertTrue(all(default_storage.exists(name) for name in variant_names(second)))
+            discarded = variant_names(first) | variant_names(stale)
+            self.assertFalse(any(default_storage.exists(name) for name in discarded))
+
+def recipe_record(name, ingredient="rice"):
+    return {
+        "name": name,
+        "ingredients": [{"name": ingredient, "quantity": 2, "calories_per_unit": 10}],
+        "steps": [{"step_number": 1, "instruction": "Cook"}],
+    }
+
+
+class ImportTests(TestCase):
+    def jsonl(self, *records):
+        return [record if isinstance(record, str) else json.dumps(record) for record in records]
+
+    def test_jsonl_reports_invalid_rows_and_writes_the_rest(self):
+        stats = import_stream(self.jsonl(
+            recipe_record("Rice"), "{not json", {"name": "No ingredients"}, recipe_record("Beans", "beans"),
+        ))
+        self.assertEqual((stats["rows"], stats["created"], stats["failed"]), (4, 2, 2))
+        self.assertEqual([error["row"] for error in stats["errors"]], [2, 3])
+        self.assertIn("ingredients", stats["errors"][1]["errors"])
+
+        rice = Recipe.objects.get(name="Rice")
+        self.assertEqual((rice.total_calories, rice.ingredient_count), (20, 1))
+        self.assertIsNotNone(rice.ingredients.get().catalog_id)
+        self.assertTrue(RecipeSignature.objects.filter(recipe=rice).exists())
+
+    def test_csv(self):
+        lines = io.StringIO()
+        writer = csv.writer(lines)
+        writer.writerow(["name", "servings", "allergens", "ingredients", "steps"])
+        writer.writerow(["Peanut noodles", "2", "peanuts;soy",
+                         json.dumps([{"name": "noodles", "quantity": 1}]), json.dumps([])])
+        writer.writerow(["Broken", "2", "", "[oops", "[]"])
+        lines.seek(0)
+
+        stats = import_stream(lines, "csv")
+        self.assertEqual((stats["created"], stats["failed"]), (1, 1))
+        recipe = Recipe.objects.get(name="Peanut noodles")
+        self.assertEqual((recipe.servings, recipe.allergens), (2, ["peanuts", "soy"]))
+        self.assertEqual(recipe.ingredients.get().name, "noodles")
+
+    def test_chunk_boundaries(self):
+        progress = []
+        stats = import_stream(
+            self.jsonl(*(recipe_record(f"Recipe {i}") for i in range(5))),
+            chunk_size=2, progress=lambda s: progress.append(s["rows"]),
+        )
+        self.assertEqual(progress, [2, 4, 5])
+        self.assertEqual(stats["created"], 5)
+        self.assertEqual(Ingredient.objects.count(), 5)
+
+    def test_failed_chunk_writes_nothing(self):
+        with mock.patch.object(Step.objects, "bulk_create", side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError):
+                import_stream(self.jsonl(recipe_record("Rice")))
+        self.assertFalse(Recipe.objects.exists())
+        self.assertFalse(Ingredient.objects.exists())
+
+    def test_bulk_import_endpoint(self):
+        admin = User.objects.create_user("admin", "admin@example.com", "pw", is_staff=True)
+        client = APIClient()
+        client.force_authenticate(admin)
+        upload = SimpleUploadedFile(
+            "recipes.jsonl", "\n".join(self.jsonl(recipe_record("Rice"), "{")).encode(),
+        )
+        response = client.post("/api/recipes/bulk_import/", {"file": upload}, format="multipart")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.data["created"], response.data["failed"]), (1, 1))
+        self.assertEqual(Recipe.objects.get().created_by, admin)
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.curry = Recipe.objects.create(name="Chickpea curry", description="Weeknight staple")
+        Ingredient.objects.create(recipe=self.curry, name="chickpeas", quantity=1)
+        self.salad = Recipe.objects.create(name="Green salad", description="Goes well with curry")
+        Ingredient.objects.create(recipe=self.salad, name="lettuce", quantity=1)
+        self.toast = Recipe.objects.create(name="Toast")
+        Step.objects.create(recipe=self.toast, step_number=1, instruction="Serve with leftover curry")
+
+    def search(self, q):
+        response = self.client.get("/api/recipes/", {"q": q, "fields": "id"})
+        self.assertEqual(response.status_code, 200)
+        return [row["id"] for row in response.data["results"]]
+
+    def test_name_match_ranks_above_description_and_steps(self):
+        self.assertEqual(self.search("curry"), [self.curry.id, self.salad.id, self.toast.id])
+
+    def test_every_word_must_match_as_a_prefix(self):
+        self.assertEqual(self.search("chick cur"), [self.curry.id])
+        self.assertEqual(self.search("chickpea toast"), [])
+
+    def test_ingredient_edit_reindexes(self):
+        self.assertEqual(self.search("lettuce"), [self.salad.id])
+        Ingredient.objects.filter(recipe=self.salad).get().delete()
+        Ingredient.objects.create(recipe=self.toast, name="lettuce", quantity=1)
+        self.assertEqual(self.search("lettuce"), [self.toast.id])
+
+
+class RecipeListPaginationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.recipes = [Recipe.objects.create(name=f"Recipe {i}") for i in range(5)]
+        # Pairs of recipes share a timestamp, so pages must break ties on id
+        now = timezone.now()
+        for i, recipe in enumerate(self.recipes):
+            recipe.created_at = now - timedelta(minutes=i // 2)
+        Recipe.objects.bulk_update(self.recipes, ["created_at"])
+        self.newest_first = sorted(self.recipes, key=lambda r: (r.created_at, r.id), reverse=True)
+
+    def page(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return [row["id"] for row in response.data["results"]], response.data["next"], response.data["previous"]
+
+    def test_next_and_previous_pages(self):
+        ids = [recipe.id for recipe in self.newest_first]
+        first, next_url, previous_url = self.page("/api/recipes/?limit=2&fields=id")
+        self.assertEqual((first, previous_url), (ids[:2], None))
+        second, next_url, previous_url = self.page(next_url)
+        self.assertEqual(second, ids[2:4])
+        last, end, _ = self.page(next_url)
+        self.assertEqual((last, end), (ids[4:], None))
+        back, _, start = self.page(previous_url)
+        self.assertEqual((back, start), (ids[:2], None))
+
+    def test_new_rows_do_not_shift_later_pages(self):
+        _, next_url, _ = self.page("/api/recipes/?limit=2&fields=id")
+        Recipe.objects.create(name="Newer")
+        second, _, _ = self.page(next_url)
+        self.assertEqual(second, [recipe.id for recipe in self.newest_first[2:4]])
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.client.get("/api/recipes/?cursor=bogus").status_code, 400)
+
+    def test_fields_trims_list_and_detail(self):
+        response = self.client.get("/api/recipes/?fields=id,name")
+        self.assertEqual(set(response.data["results"][0]), {"id", "name"})
+        response = self.client.get("/api/recipes/?fields=name,ingredients")
+        self.assertEqual(set(response.data["results"][0]), {"name", "ingredients"})
+        response = self.client.get(f"/api/recipes/{self.recipes[0].id}/?fields=steps")
+        self.assertEqual(response.data, {"steps": []})
+
+    def test_unknown_field_is_rejected(self):
+        response = self.client.get("/api/recipes/?fields=id,secret")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("secret", str(response.data["fields"]))
+
+
+class RecipeSummaryTests(TestCase):
+    def setUp(self):
+        recipe_detail_cache.clear()
+        self.user = User.objects.create_user("cook", "cook@example.com", "pw")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.recipe = Recipe.objects.create(name="Porridge", category="breakfast", servings=2)
+        Ingredient.objects.create(recipe=self.recipe, name="oats", quantity=1, calories_per_unit=300)
+        self.client.post(f"/api/recipes/{self.recipe.id}/favorite/")
+
+    def test_list_rows_match_the_detail_representation(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/recipes/")
+        row = response.data["results"][0]
+        self.assertEqual(tuple(row), RecipeSummary.FIELDS)
+        detail = self.client.get(f"/api/recipes/{self.recipe.id}/").json()
+        self.assertEqual(json.loads(json.dumps(row)), {field: detail[field] for field in RecipeSummary.FIELDS})
+        self.assertEqual((row["calories_per_serving"], row["is_favorite"], row["image"]), (150, True, None))
+        self.assertFalse(any("recipes_ingredient" in q["sql"] for q in queries.captured_queries))
+
+    def test_for_ids_keeps_order_and_skips_missing(self):
+        other = Recipe.objects.create(name="Toast")
+        summaries = RecipeSummary(fields=["id", "name"]).for_ids([other.id, 0, self.recipe.id])
+        self.assertEqual(summaries, [
+            {"id": other.id, "name": "Toast"}, {"id": self.recipe.id, "name": "Porridge"},
+        ])
+
+
+class FacetTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        for name, category, calories, allergen in (
+            ("Pancakes", "breakfast", 400, "milk"),
+            ("Omelette", "breakfast", 150, "egg"),
+            ("Stir fry", "dinner", 200, "rice"),
+            ("Risotto", "dinner", 800, "milk"),
+        ):
+            recipe = Recipe.objects.create(name=name, category=category)
+            Ingredient.objects.create(recipe=recipe, name=allergen, quantity=1, calories_per_unit=calories)
+
+    def facets(self, **params):
+        response = self.client.get("/api/recipes/", params)
+        self.assertEqual(response.status_code, 200)
+        return response.data["results"], response.data["facets"]
+
+    def test_counts_without_filters(self):
+        results, facets = self.facets()
+        self.assertEqual(len(results), 4)
+        self.assertEqual(facets["category"]["breakfast"], 2)
+        self.assertEqual(facets["category"]["lunch"], 0)
+        self.assertEqual(facets["allergen_free"]["dairy"], 2)
+        # Half-open buckets: 200 and 400 fall into the bucket they start
+        self.assertEqual(
+            facets["calories"], {"0-200": 1, "200-400": 1, "400-600": 1, "600-800": 0, "800+": 1}
+        )
+        self.assertEqual(facets["ingredients"], {"0": 0, "1-5": 4, "6-10": 0, "11-15": 0, "16+": 0})
+
+    def test_every_recipe_falls_in_one_bucket(self):
+        Recipe.objects.create(name="Water", category="other")
+        _, facets = self.facets()
+        self.assertEqual(facets["ingredients"]["0"], 1)
+        self.assertEqual(sum(facets["ingredients"].values()), 5)
+        self.assertEqual(sum(facets["calories"].values()), 5)
+
+    def test_each_facet_ignores_its_own_filter(self):
+        results, facets = self.facets(category="dinner", allergen_free="dairy")
+        self.assertEqual([row["name"] for row in results], ["Stir fry"])
+        # Other categories still count dairy-free recipes; dairy-free counts only dinners
+        self.assertEqual((facets["category"]["breakfast"], facets["category"]["dinner"]), (1, 1))
+        self.assertEqual(facets["allergen_free"]["dairy"], 1)
+        self.assertEqual(facets["allergen_free"]["eggs"], 2)
+        self.assertEqual(sum(facets["calories"].values()), 1)
+
+    def test_facets_in_one_query_on_the_first_page_only(self):
+        with CaptureQueriesContext(connection) as queries:
+            _, facets = self.facets(limit=2)
+        # catalog_stamp() counts recipes too; the facet query is the one with many COUNTs
+        aggregates = [q for q in queries.captured_queries if q["sql"].count("COUNT(") > 1]
+        self.assertEqual(len(aggregates), 1)
+        next_url = self.client.get("/api/recipes/", {"limit": 2}).data["next"]
+        self.assertNotIn("facets", self.client.get(next_url).data)
+
+    def test_unknown_value_is_rejected(self):
+        response = self.client.get("/api/recipes/", {"category": "brunch"})
+        self.assertEqual(response.status_code, 400)
+
+
+class PantryCoverageTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("cook", "cook@example.com", "pw")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.recipes = {}
+        for name, ingredients in (
+            ("Rice bowl", ["rice", "egg"]),
+            ("Fried rice", ["rice", "egg", "peas"]),
+            ("Pea soup", ["peas", "onions", "stock"]),
+        ):
+            recipe = self.recipes[name] = Recipe.objects.create(name=name)
+            for ingredient in ingredients:
+                Ingredient.objects.create(recipe=recipe, name=ingredient, quantity=100, unit="g")
+        PantryItem.objects.create(user=self.user, name="rice", quantity=1, unit="kg")
+        PantryItem.objects.create(user=self.user, name="Eggs", quantity=50, unit="g")
+        PantryItem.objects.create(user=self.user, name="onion", quantity=1, unit="pcs")
+
+    def test_annotation(self):
+        rows = {
+            recipe.name: (recipe.pantry_matched, recipe.pantry_missing, recipe.pantry_total)
+            for recipe in Recipe.objects.with_pantry_coverage(self.user)
+        }
+        self.assertEqual(rows, {"Rice bowl": (2, 0, 2), "Fried rice": (2, 1, 3), "Pea soup": (1, 2, 3)})
+
+    def test_max_missing_filters_and_orders_by_coverage(self):
+        response = self.client.get("/api/recipes/", {"max_missing": 1})
+        self.assertEqual(response.status_code, 200)
+        results = response.data["results"]
+        self.assertEqual([row["name"] for row in results], ["Rice bowl", "Fried rice"])
+        # 50 g of eggs against a 100 g need: present, but not enough
+        self.assertEqual(
+            [(row["pantry_matched"], row["pantry_missing"], row["pantry_sufficient"]) for row in results],
+            [(2, 0, 1), (2, 1, 1)],
+        )
+
+    def test_max_missing_validation(self):
+        self.assertEqual(self.client.get("/api/recipes/", {"max_missing": -1}).status_code, 400)
+        self.assertEqual(self.client.get("/api/recipes/", {"max_missing": "x"}).status_code, 400)
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.get("/api/recipes/", {"max_missing": 0}).status_code, 401)
+
+
+class SimilarRecipesTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        base = ["rice", "egg", "peas", "carrot", "onion", "soy sauce", "garlic", "ginger"]
+        self.target = self.recipe("Fried rice", base)
+        self.close = self.recipe("Egg fried rice", base[:7] + ["spring onion"])
+        self.far = self.recipe("Veg rice", base[:4] + ["tofu", "chili", "lime", "basil"])
+        self.unrelated = self.recipe("Pancakes", ["flour", "milk", "butter", "sugar"])
+
+    def recipe(self, name, ingredients):
+        recipe = Recipe.objects.create(name=name)
+        for ingredient in ingredients:
+            Ingredient.objects.create(recipe=recipe, name=ingredient, quantity=1)
+        return recipe
+
+    def test_ranked_by_ingredient_overlap(self):
+        response = self.client.get(f"/api/recipes/{self.target.id}/similar/")
+        self.assertEqual(response.status_code, 200)
+        ids = [row["id"] for row in response.data["results"]]
+        # LSH finds the weaker match only with high probability, so it need not be listed
+        self.assertEqual(ids[0], self.close.id)
+        self.assertTrue(set(ids) <= {self.close.id, self.far.id})
+        self.assertGreater(response.data["results"][0]["similarity"], 0.5)
+
+    def test_follows_ingredient_edits(self):
+        for ingredient in ("flour", "milk", "butter", "sugar"):
+            Ingredient.objects.create(recipe=self.target, name=ingredient, quantity=1)
+        Ingredient.objects.filter(recipe=self.target).exclude(
+            name__in=["flour", "milk", "butter", "sugar"]
+        ).delete()
+        results = self.client.get(f"/api/recipes/{self.target.id}/similar/").data["results"]
+        self.assertEqual(results[0]["id"], self.unrelated.id)
+        self.assertEqual(results[0]["similarity"], 1)
+
+    def test_unknown_recipe(self):
+        self.assertEqual(self.client.get("/api/recipes/0/similar/").status_code, 404)
+
+
+class WhatCanICookTests(TestCase):
+    def setUp(self):
+        recommendation_cache.clear()
+        self.user = User.objects.create_user("cook", "cook@example.com", "pw")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.omelette = self.recipe("Omelette", ["egg", "butter", "chives"])
+        self.rice = self.recipe("Rice bowl", ["rice", "egg"])
+        self.pasta = self.recipe("Pasta", ["spaghetti", "tomato"])
+        for name in ("Eggs", "rice", "butter"):
+            PantryItem.objects.create(user=self.user, name=name, quantity=1)
+
+    def recipe(self, name, ingredients):
+        recipe = Recipe.objects.create(name=name)
+        for ingredient in ingredients:
+            Ingredient.objects.create(recipe=recipe, name=ingredient, quantity=1)
+        return recipe
+
+    def cook(self):
+        response = self.client.get("/api/recipes/what_can_i_cook/")
+        self.assertEqual(response.status_code, 200)
+        return response.data["results"]
+
+    def test_ranked_by_pantry_coverage(self):
+        results = self.cook()
+        # Recipes sharing nothing with the pantry are left out
+        self.assertEqual(
+            [(row["id"], row["score"]) for row in results], [(self.rice.id, 2), (self.omelette.id, 1)]
+        )
+        self.assertEqual(sorted(results[1]["available_ingredients"]), ["butter", "egg"])
+        self.assertEqual(results[1]["missing_ingredients"], ["chives"])
+
+    def test_substitution_covers_a_missing_ingredient(self):
+        RecipeSubstitution.objects.create(original_ingredient="chives", substitute_ingredient="rice")
+        omelette = next(row for row in self.cook() if row["id"] == self.omelette.id)
+        self.assertEqual((omelette["score"], omelette["missing_ingredients"]), (3, []))
+        self.assertEqual(omelette["substitutions_used"], ["chives -> rice"])
+
+    def test_allergies_exclude_recipes(self):
+        AllergyIntolerance.objects.create(user=self.user, allergy_type="dairy")
+        self.assertEqual([row["id"] for row in self.cook()], [self.rice.id])
+
+
+class FavoriteQueryTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("cook", "cook@example.com", "pw")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def list_queries(self, count, fields):
+        recipes = [Recipe.objects.create(name=f"Recipe {i}") for i in range(count)]
+        for recipe in recipes[::2]:
+            FavoriteRecipe.objects.create(user=self.user, recipe=recipe)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/recipes/", {"fields": fields})
+        favorites = {recipe.id for recipe in recipes[::2]}
+        self.assertEqual({row["id"] for row in response.data["results"] if row["is_favorite"]}, favorites)
+        favorite_queries = [q for q in queries.captured_queries if "recipes_favoriterecipe" in q["sql"]]
+        Recipe.objects.all().delete()
+        return len(queries.captured_queries), len(favorite_queries)
+
+    def test_summary_rows_load_favorites_once(self):
+        one, one_favorites = self.list_queries(1, "id,is_favorite")
+        self.assertEqual(self.list_queries(10, "id,is_favorite"), (one, one_favorites))
+
+    def test_serialized_rows_load_favorites_once(self):
+        one, one_favorites = self.list_queries(1, "id,steps,is_favorite")
+        self.assertEqual(self.list_queries(10, "id,steps,is_favorite"), (one, one_favorites))
+
+
+class TopKTests(SimpleTestCase):
+    def test_pages_match_a_full_stable_sort(self):
+        rng = np.random.default_rng(4)
+        rows = np.arange(50, dtype=np.int64)
+        scores = rng.integers(0, 5, 50)  # plenty of ties
+        expected = sorted(rows.tolist(), key=lambda row: (-scores[row], row))
+        for limit in (1, 3, 7, 20):
+            paged = []
+            for offset in range(0, 60, limit):
+                page, page_scores, has_more = top_k_rows(rows, scores, limit, offset)
+                paged += page.tolist()
+                self.assertEqual(page_scores.tolist(), [scores[row] for row in page.tolist()])
+                self.assertEqual(has_more, offset + limit < len(rows))
+            self.assertEqual(paged, expected)
+
+    def test_empty(self):
+        page, _, has_more = top_k_rows(np.array([], dtype=np.int64), np.array([]), 10, 0)
+        self.assertEqual((page.tolist(), has_more), ([], False))
+
+
+class RecommendationPagingTests(TestCase):
+    def test_cursor_pages_cover_the_ranking_once(self):
+        recommendation_cache.clear()
+        user = User.objects.create_user("cook", "cook@example.com", "pw")
+        client = APIClient()
+        client.force_authenticate(user)
+        PantryItem.objects.create(user=user, name="rice", quantity=1)
+        for i in range(7):
+            recipe = Recipe.objects.create(name=f"Rice {i}")
+            Ingredient.objects.create(recipe=recipe, name="rice", quantity=1)
+            for j in range(i % 3):
+                Ingredient.objects.create(recipe=recipe, name=f"extra {j}", quantity=1)
+
+        everything = client.get("/api/recipes/what_can_i_cook/", {"limit": 100}).data["results"]
+        paged, url = [], "/api/recipes/what_can_i_cook/?limit=3"
+        while url:
+            response = client.get(url)
+            paged += response.data["results"]
+            url = response.data["next"]
+        self.assertEqual([row["id"] for row in paged], [row["id"] for row in everything])
+        self.assertEqual(len(paged), 7)
+        self.assertEqual([row["score"] for row in paged], sorted((row["score"] for row in paged), reverse=True))
+
+
+class CleanUpModeTests(TestCase):
+    def setUp(self):
+        recommendation_cache.clear()
+        self.user = User.objects.create_user("cook", "cook@example.com", "pw")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        today = timezone.now().date()
+        for name, days in (("spinach", 0), ("yogurt", 3), ("rice", 30)):
+            PantryItem.objects.create(
+                user=self.user, name=name, quantity=1, expiry_date=today + timedelta(days=days)
+            )
+        self.both = self.recipe("Spinach raita", ["spinach", "yogurt"])
+        self.spinach = self.recipe("Spinach soup", ["spinach", "stock"])
+        self.yogurt = self.recipe("Yogurt bowl", ["yogurt", "honey"])
+        # Rice only expires next month, so it scores nothing
+        self.unscored = [self.recipe(f"Rice {i}", ["rice"]) for i in range(3)]
+
+    def recipe(self, name, ingredients):
+        recipe = Recipe.objects.create(name=name)
+        for ingredient in ingredients:
+            Ingredient.objects.create(recipe=recipe, name=ingredient, quantity=1)
+        return recipe
+
+    def ids(self, **params):
+        response = self.client.get("/api/recipes/clean_up_mode/", params)
+        self.assertEqual(response.status_code, 200)
+        return [row["id"] for row in response.data["results"]], response.data["next"]
+
+    def test_scored_recipes_then_the_rest_by_id(self):
+        ids, next_url = self.ids(limit=10)
+        expected = [self.both.id, self.spinach.id, self.yogurt.id] + [recipe.id for recipe in self.unscored]
+        self.assertEqual((ids, next_url), (expected, None))
+
+    def test_pages_across_the_zero_score_boundary(self):
+        paged, url = [], "/api/recipes/clean_up_mode/?limit=2"
+        while url:
+            response = self.client.get(url)
+            paged += [row["id"] for row in response.data["results"]]
+            url = response.data["next"]
+        self.assertEqual(paged, self.ids(limit=10)[0])
+
+    def test_allergens_excluded_from_both_parts(self):
+        AllergyIntolerance.objects.create(user=self.user, allergy_type="dairy")
+        ids, _ = self.ids(limit=10)
+        self.assertEqual(ids, [self.spinach.id] + [recipe.id for recipe in self.unscored])
+
+
+class AllergenMaskTests(TestCase):
+    def test_keywords_set_their_bits(self):
+        self.assertEqual(mask_for_names(["Parmesan"]), ALLERGY_BITS["dairy"])
+        self.assertEqual(mask_for_names(["eggs"]), ALLERGY_BITS["eggs"])
+        self.assertEqual(mask_for_names(["plain flour"]), ALLERGY_BITS["wheat"] | ALLERGY_BITS["gluten"])
+        self.assertEqual(mask_for_names(["peanut butter"]), ALLERGY_BITS["peanuts"] | ALLERGY_BITS["dairy"])
+        self.assertEqual(mask_for_names(["tree_nuts"]), ALLERGY_BITS["tree_nuts"])
+        self.assertEqual(mask_for_names(["gluten-free pasta"]), ALLERGY_BITS["wheat"] | ALLERGY_BITS["gluten"])
+        self.assertEqual(mask_for_names(["dairy free", "rice"]), 0)
+
+    def test_mask_follows_ingredients_and_tags(self):
+        recipe = Recipe.objects.create(name="Salad", allergens=["sesame"])
+        ingredient = Ingredient.objects.create(recipe=recipe, name="feta", quantity=1)
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.allergen_mask, ALLERGY_BITS["sesame"] | ALLERGY_BITS["dairy"])
+        ingredient.delete()
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.allergen_mask, ALLERGY_BITS["sesame"])
+
+    def test_without_allergens(self):
+        plain = Recipe.objects.create(name="Rice")
+        Ingredient.objects.create(recipe=plain, name="rice", quantity=1)
+        nutty = Recipe.objects.create(name="Pesto")
+        Ingredient.objects.create(recipe=nutty, name="pine nuts", quantity=1)
+        cheesy = Recipe.objects.create(name="Cheese toast")
+        Ingredient.objects.create(recipe=cheesy, name="cheddar", quantity=1)
+
+        def remaining(*allergies):
+            mask = mask_for_allergies(allergies)
+            return set(Recipe.objects.without_allergens(mask).values_list("name", flat=True))
+
+        self.assertEqual(remaining(), {"Rice", "Pesto", "Cheese toast"})
+        self.assertEqual(remaining("tree_nuts"), {"Rice", "Cheese toast"})
+        self.assertEqual(remaining("tree_nuts", "dairy"), {"Rice"})
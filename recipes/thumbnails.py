@@ -0,0 +1,160 @@
+"""
+Fixed-size WebP/JPEG variants of Recipe.image.
+
+Saving a recipe whose image changed queues render_variants() on a process pool
+(settings.RECIPE_THUMBNAIL_WORKERS processes; 0 renders inline), so request threads only
+pay for the hand-off. When a job finishes, the variant names are stored in
+Recipe.image_variants, unless the image was replaced in the meantime. The
+generate_thumbnails command backfills existing images on its own pool.
+
+Variants are written next to the original in the default (filesystem) storage under
+recipes/variants/<recipe id>/<job>/, one directory per job so overlapping jobs for the
+same recipe never touch each other's files. Whichever set loses (the replaced one, or
+the job's own if its image changed meanwhile) is deleted when the result is stored.
+"""
+import os
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Recipe
+
+# name -> (width, height, crop). Cropped variants are exactly that size; the others
+# are shrunk to fit inside it and never enlarged.
+VARIANTS = {
+    "thumb": (160, 160, True),
+    "card": (640, 400, True),
+    "full": (1600, 1600, False),
+}
+FORMATS = {
+    "webp": ("WEBP", {"quality": 80, "method": 4}),
+    "jpeg": ("JPEG", {"quality": 82, "optimize": True, "progressive": True}),
+}
+VARIANT_DIR = "recipes/variants"
+
+
+def render_variants(recipe_id, source_name, source_path, media_root):
+    """
+    Worker-process entry point: write every variant of one image and return the
+    image_variants value, {"source": source_name, variant: {format: storage name}}.
+    Only touches the filesystem, so it needs no Django setup in the worker.
+    """
+    from PIL import Image, ImageOps
+
+    directory = f"{VARIANT_DIR}/{recipe_id}/{uuid.uuid4().hex[:12]}"
+    os.makedirs(os.path.join(media_root, directory))
+
+    stem = os.path.splitext(os.path.basename(source_name))[0]
+    variants = {"source": source_name}
+    with Image.open(source_path) as original:
+        image = ImageOps.exif_transpose(original).convert("RGB")
+    for variant, (width, height, crop) in VARIANTS.items():
+        if crop:
+            resized = ImageOps.fit(image, (width, height), Image.LANCZOS)
+        else:
+            resized = image.copy()
+            resized.thumbnail((width, height), Image.LANCZOS)
+        variants[variant] = {}
+        for ext, (pil_format, options) in FORMATS.items():
+            name = f"{directory}/{stem}-{variant}.{ext}"
+            resized.save(os.path.join(media_root, name), pil_format, **options)
+            variants[variant][ext] = name
+    return variants
+
+
+def current_variants(image_name, variants):
+    """The stored variants if they were rendered from image_name, else {}."""
+    if not image_name or not variants or variants.get("source") != image_name:
+        return {}
+    return {k: v for k, v in variants.items() if k != "source"}
+
+
+def job_args(recipe_id, image_name):
+    return recipe_id, image_name, default_storage.path(image_name), default_storage.location
+
+
+def variant_names(variants):
+    return {
+        name
+        for variant, formats in (variants or {}).items() if variant != "source"
+        for name in formats.values()
+    }
+
+
+def discard_variants(names):
+    """Delete variant files and the job directories they leave empty."""
+    for name in names:
+        default_storage.delete(name)
+    for directory in {os.path.dirname(name) for name in names}:
+        try:
+            os.rmdir(default_storage.path(directory))
+        except OSError:
+            pass
+
+
+def store_variants(recipe_id, variants):
+    """
+    Save a finished job's result unless the recipe's image changed since it was queued,
+    then delete whichever files are no longer referenced.
+    """
+    previous = Recipe.objects.filter(pk=recipe_id).values_list("image_variants", flat=True).first()
+    stored = Recipe.objects.filter(pk=recipe_id, image=variants["source"]).update(
+        image_variants=variants, version=F("version") + 1, updated_at=timezone.now()
+    )
+    if stored:
+        discard_variants(variant_names(previous) - variant_names(variants))
+    else:
+        discard_variants(variant_names(variants))
+
+
+# ---------------- upload queue ----------------
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _workers():
+    return getattr(settings, "RECIPE_THUMBNAIL_WORKERS", 2)
+
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=_workers())
+        return _pool
+
+
+def _finished(recipe_id, future):
+    try:
+        variants = future.result()
+    except (OSError, ValueError):  # unreadable upload; the recipe keeps serving the original
+        return
+    # Runs on the pool's callback thread, which keeps no request cycle to close its connection
+    close_old_connections()
+    try:
+        store_variants(recipe_id, variants)
+    finally:
+        connection.close()
+
+
+def queue_variants(recipe_id, image_name):
+    """Render variants for a newly saved image once the surrounding transaction commits."""
+    def submit():
+        args = job_args(recipe_id, image_name)
+        if not _workers():
+            try:
+                variants = render_variants(*args)
+            except (OSError, ValueError):
+                return
+            store_variants(recipe_id, variants)
+            return
+        future = get_pool().submit(render_variants, *args)
+        future.add_done_callback(lambda f: _finished(recipe_id, f))
+
+    transaction.on_commit(submit)
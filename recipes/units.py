@@ -0,0 +1,86 @@
+"""
+Unit conversion to canonical base quantities.
+
+Every unit maps to one of three base units through a precomputed factor table: grams
+for mass, millilitres for volume and pieces for counts. Ingredients with a known
+density (DENSITY, g/ml, keyed by IngredientCatalog-style canonical name) are based in
+grams whatever unit they come in, so "2 cups milk" and "1 l milk" become comparable.
+
+Ingredient and PantryItem store base_quantity/base_unit next to the quantity and unit
+they were entered with. Quantities only compare when their base units match; a unit
+this module doesn't know gives no base quantity at all.
+"""
+import re
+
+from .catalog import canonical_key
+
+GRAM, MILLILITRE, PIECE = "g", "ml", "pcs"
+
+_MASS = {"g": 1, "gram": 1, "kg": 1000, "kilogram": 1000, "mg": 0.001, "milligram": 0.001,
+         "oz": 28.3495, "ounce": 28.3495, "lb": 453.592, "pound": 453.592}
+_VOLUME = {"ml": 1, "millilitre": 1, "milliliter": 1, "cl": 10, "dl": 100,
+           "l": 1000, "litre": 1000, "liter": 1000,
+           "tsp": 4.92892, "teaspoon": 4.92892, "tbsp": 14.7868, "tablespoon": 14.7868,
+           "cup": 236.588, "fl oz": 29.5735, "fluid ounce": 29.5735,
+           "pint": 473.176, "quart": 946.353, "gallon": 3785.41}
+_COUNT = {"pcs": 1, "pc": 1, "piece": 1, "whole": 1, "each": 1, "": 1}
+
+# normalized unit -> (base unit, factor to base)
+FACTORS = {
+    **{unit: (GRAM, factor) for unit, factor in _MASS.items()},
+    **{unit: (MILLILITRE, factor) for unit, factor in _VOLUME.items()},
+    **{unit: (PIECE, factor) for unit, factor in _COUNT.items()},
+}
+
+# g/ml for common pantry staples
+DENSITY = {
+    "water": 1.0, "milk": 1.03, "cream": 1.01, "yogurt": 1.03, "buttermilk": 1.03,
+    "butter": 0.911, "oil": 0.92, "olive oil": 0.91, "vegetable oil": 0.92,
+    "flour": 0.53, "all-purpose flour": 0.53, "whole wheat flour": 0.51,
+    "sugar": 0.85, "brown sugar": 0.93, "powdered sugar": 0.56,
+    "salt": 1.2, "honey": 1.42, "maple syrup": 1.32, "rice": 0.85, "oats": 0.41,
+    "cocoa powder": 0.42, "baking powder": 0.9, "baking soda": 1.1,
+}
+
+_SEPARATORS = re.compile(r"[.\s]+")
+
+
+def normalize_unit(unit):
+    """Lowercase, dot-free, singular form of a unit ("Tbsps." -> "tbsp"), or None if unknown."""
+    key = _SEPARATORS.sub(" ", (unit or "").lower()).strip()
+    if key in FACTORS:
+        return key
+    if key.endswith("s") and key[:-1] in FACTORS:
+        return key[:-1]
+    return None
+
+
+def base_factor(unit, name=""):
+    """(base unit, factor) converting `unit` of ingredient `name` to base, or (None, None)."""
+    unit = normalize_unit(unit)
+    if unit is None:
+        return None, None
+    base_unit, factor = FACTORS[unit]
+    density = DENSITY.get(canonical_key(name))
+    if base_unit == MILLILITRE and density is not None:
+        return GRAM, factor * density
+    return base_unit, factor
+
+
+def to_base(quantity, unit, name=""):
+    """(base_quantity, base_unit) for a quantity, or (None, "") when the unit is unknown."""
+    base_unit, factor = base_factor(unit, name)
+    if base_unit is None or quantity is None:
+        return None, ""
+    return quantity * factor, base_unit
+
+
+def from_base(base_quantity, unit, name=""):
+    """The inverse of to_base(): base_quantity expressed in `unit` again."""
+    _, factor = base_factor(unit, name)
+    return base_quantity / factor
+
+
+def set_base_quantity(obj):
+    """Fill obj.base_quantity/base_unit from its quantity, unit and name."""
+    obj.base_quantity, obj.base_unit = to_base(obj.quantity, obj.unit, obj.name)
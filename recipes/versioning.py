@@ -0,0 +1,88 @@
+"""
+Conditional GET for polled read endpoints.
+
+Recipes and meal plans carry a version counter and updated_at stamp that are bumped on
+every write to them or their child rows (see Recipe.save, RecipeQuerySet.touch and the
+signal receivers). Views derive an ETag and Last-Modified from those stamps with a couple
+of aggregate queries and answer 304 Not Modified before any serializer runs.
+
+Responses also depend on the user's favorites (is_favorite), so their stamp is part of
+every validator. Collection stamps include the row count so deletions change them too.
+
+The same stamps tell the per-process caches (recipes.cache, the scoring engine and the
+substitution graph) when another worker has written.
+"""
+import hashlib
+
+from django.contrib.auth import get_user_model
+from django.db.models import Count, Max, Sum
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from .models import Recipe
+
+
+def make_etag(*parts):
+    return '"%s"' % hashlib.md5("|".join(str(p) for p in parts).encode()).hexdigest()
+
+
+def collection_stamp(queryset, field):
+    """(row count, latest value of field) for a queryset."""
+    stamp = queryset.aggregate(count=Count("pk"), last=Max(field))
+    return stamp["count"], stamp["last"]
+
+
+def catalog_stamp():
+    return collection_stamp(Recipe.objects.all(), "updated_at")
+
+
+def favorites_stamp(user):
+    if not user.is_authenticated:
+        return 0, None
+    return collection_stamp(user.favorite_recipes.all(), "added_at")
+
+
+def profile_stamp(user):
+    """
+    (latest pantry change, dietary preference, health goal) of a user. Every pantry write,
+    bulk ones included, records a PantryChange, so its id moves with any pantry edit.
+    """
+    return get_user_model().objects.filter(pk=user.pk).annotate(
+        pantry=Max("pantry_changes__id")
+    ).values_list("pantry", "dietary_profile__dietary_preference", "health_goal__primary_goal").first()
+
+
+def pantry_stamp(user):
+    """
+    Changes whenever the catalog entries in the user's pantry, or the base quantity held
+    of any of them, do: the inputs of pantry coverage and pantry_sufficient.
+    """
+    totals = (
+        user.pantry_items.filter(catalog__isnull=False).order_by("catalog_id", "base_unit")
+        .values("catalog_id", "base_unit").annotate(total=Sum("base_quantity"))
+        .values_list("catalog_id", "base_unit", "total")
+    )
+    return make_etag(*totals)
+
+
+def conditional_response(request, etag, last_modified, render):
+    """
+    Return 304 if the request's validators still match, else render() the response.
+    last_modified is an aware datetime or None. Both responses carry the validators.
+    """
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    if response is None:
+        response = render()
+    if response.status_code in (200, 304):
+        response["ETag"] = etag
+        if timestamp is not None:
+            response["Last-Modified"] = http_date(timestamp)
+        # Per-user content: only the client may cache it, and it must revalidate
+        patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def latest(*timestamps):
+    present = [t for t in timestamps if t is not None]
+    return max(present) if present else None
@@ -1,24 +1,204 @@
 from rest_framework import viewsets
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotAuthenticated, ValidationError
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
-from rest_framework.permissions import AllowAny, IsAuthenticated
-from .models import Recipe, FavoriteRecipe
-from .serializers import RecipeSerializer
+from rest_framework.permissions import AllowAny, IsAuthenticated, IsAdminUser
+from .models import Recipe, Ingredient, FavoriteRecipe
+from .serializers import RecipeSerializer, RecipeSummary, favorite_recipe_ids
+from .allergens import mask_for_allergies
+from .ranking import RecipeCursorPagination, get_page_params, paginated_response
+from .cache import recipe_detail_cache, recommendation_cache
+from .importer import import_stream
+from .search import search_recipes
+from .similarity import similar_recipes
+from .facets import facet_counts, facet_filters, with_allergen_aliases
+from .versioning import (
+    catalog_stamp, conditional_response, favorites_stamp, latest, make_etag, pantry_stamp, profile_stamp,
+)
+from .scoring import get_engine, top_k_rows
+from .substitutions import get_graph, substitution_stamp
 from pantry.models import PantryItem
+from pantry.products import cache_stats as product_cache_stats
+from django.db.models import Q
+from django.http import Http404, HttpResponse
 from django.utils import timezone
+from datetime import timedelta
+import io
+import numpy as np
 
 class RecipeViewSet(viewsets.ModelViewSet):
-    queryset = Recipe.objects.all().prefetch_related(
-        'ingredients', 'steps', 'favorite_recipes', 'substitutions'
-    ).order_by('-created_at')
+    queryset = Recipe.objects.order_by('-created_at', '-id')
     serializer_class = RecipeSerializer
     permission_classes = [AllowAny]
+    pagination_class = RecipeCursorPagination
+
+    # Relations RecipeSerializer nests, prefetched only when the response includes them
+    PREFETCH_FIELDS = ('ingredients', 'steps')
 
     def get_permissions(self):
         if self.action in ['create', 'favorite', 'what_can_i_cook', 'clean_up_mode']:
             return [IsAuthenticated()]
+        if self.action in ['cache_stats', 'bulk_import']:
+            return [IsAdminUser()]
         return [AllowAny()]
 
+    # ?min_calories=&max_calories=&min_protein=&max_protein= (per serving)
+    NUTRITION_FILTERS = {
+        'min_calories': 'calories_per_serving__gte',
+        'max_calories': 'calories_per_serving__lte',
+        'min_protein': 'protein_per_serving__gte',
+        'max_protein': 'protein_per_serving__lte',
+    }
+
+    def get_queryset(self):
+        return self.unfiltered_queryset().filter(*self.list_filters().values())
+
+    def unfiltered_queryset(self):
+        """The list queryset before facet/nutrition filters, which facet counts need."""
+        queryset = with_allergen_aliases(super().get_queryset())
+        fields = self.requested_fields()
+        queryset = queryset.prefetch_related(
+            *(name for name in self.PREFETCH_FIELDS if fields is None or name in fields)
+        )
+        q = self.request.query_params.get('q')
+        if q:
+            # ?q= full-text search, best match first
+            queryset = search_recipes(queryset, q)
+        if self.max_missing() is not None:
+            queryset = queryset.with_pantry_coverage(self.request.user)
+            if not q:
+                queryset = queryset.order_by('pantry_missing', '-pantry_matched', '-created_at', '-id')
+        return queryset
+
+    def list_filters(self):
+        """{name: Q}: the facets (recipes.facets) plus the per-serving protein bounds."""
+        filters = facet_filters(self.request.query_params)
+        filters['protein'] = Q(**{
+            lookup: value for lookup, value in self.nutrition_bounds().items() if lookup.startswith('protein')
+        })
+        max_missing = self.max_missing()
+        if max_missing is not None:
+            filters['pantry'] = Q(pantry_missing__lte=max_missing)
+        return filters
+
+    # Annotated by Recipe.objects.with_pantry_coverage() and added to each listed recipe
+    COVERAGE_FIELDS = ('pantry_matched', 'pantry_missing', 'pantry_total')
+
+    def max_missing(self):
+        """?max_missing=N: only recipes missing at most N ingredients from the user's pantry."""
+        value = self.request.query_params.get('max_missing')
+        if self.action != 'list' or value in (None, ''):
+            return None
+        if not self.request.user.is_authenticated:
+            raise NotAuthenticated("Sign in to filter recipes by your pantry.")
+        try:
+            value = int(value)
+        except ValueError:
+            raise ValidationError({'max_missing': "Must be a whole number."})
+        if value < 0:
+            raise ValidationError({'max_missing': "Must not be negative."})
+        return value
+
+    def requested_fields(self):
+        """?fields=id,name,... on list/retrieve, or None for the full representation."""
+        param = self.request.query_params.get('fields')
+        if not param or self.action not in ('list', 'retrieve'):
+            return None
+        fields = [name.strip() for name in param.split(',') if name.strip()]
+        unknown = set(fields) - set(RecipeSerializer.Meta.fields)
+        if unknown:
+            raise ValidationError({"fields": f"Unknown field(s): {', '.join(sorted(unknown))}."})
+        return fields
+
+    def get_serializer(self, *args, **kwargs):
+        kwargs.setdefault('fields', self.requested_fields())
+        return super().get_serializer(*args, **kwargs)
+
+    def list(self, request, *args, **kwargs):
+        count, last_updated = catalog_stamp()
+        favorites, last_favorited = favorites_stamp(request.user)
+        parts = ['recipes', count, last_updated, favorites, last_favorited]
+        if self.max_missing() is not None:
+            parts.append(pantry_stamp(request.user))
+        etag = make_etag(*parts)
+        return conditional_response(
+            request, etag, latest(last_updated, last_favorited),
+            lambda: self.render_list(request, *args, **kwargs),
+        )
+
+    def render_list(self, request, *args, **kwargs):
+        # Summaries from .values() rows, unless ?fields= asks for more than a summary holds
+        fields = self.requested_fields()
+        queryset = self.filter_queryset(self.get_queryset())
+        coverage = self.COVERAGE_FIELDS if self.max_missing() is not None else ()
+        if fields is not None and not set(fields) <= set(RecipeSummary.FIELDS):
+            page = self.paginate_queryset(queryset)
+            results = self.get_serializer(page, many=True).data
+            extras = [{'id': recipe.pk, **{name: getattr(recipe, name) for name in coverage}} for recipe in page]
+        else:
+            summary = RecipeSummary(request, fields)
+            page = self.paginate_queryset(RecipeSummary.values(queryset, *coverage))
+            results = [summary.render(row) for row in page]
+            extras = [{'id': row['id'], **{name: row[name] for name in coverage}} for row in page]
+        if coverage:
+            # How many ingredients the pantry holds enough of, for this page's recipes only
+            sufficient = dict(
+                Recipe.objects.filter(id__in=[extra['id'] for extra in extras])
+                .with_pantry_sufficiency(request.user).values_list('id', 'pantry_sufficient')
+            )
+            for data, extra in zip(results, extras):
+                data.update({name: extra[name] for name in coverage})
+                data['pantry_sufficient'] = sufficient.get(extra['id'], 0)
+        response = self.get_paginated_response(results)
+        # Facets describe the whole result set, so they come with the first page only
+        if not request.query_params.get('cursor'):
+            response.data['facets'] = facet_counts(self.unfiltered_queryset(), self.list_filters())
+        return response
+
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            pk = int(kwargs['pk'])
+        except ValueError:
+            return super().retrieve(request, *args, **kwargs)
+        stamp = Recipe.objects.filter(pk=pk).values_list('version', 'updated_at').first()
+        if stamp is None:
+            return super().retrieve(request, *args, **kwargs)
+        version, updated_at = stamp
+        is_favorite = request.user.is_authenticated and pk in favorite_recipe_ids(request)
+        if self.requested_fields() is None and request.accepted_renderer.format == 'json':
+            render = lambda: self.render_cached_detail(request, pk, version, is_favorite)
+        else:
+            render = lambda: super(RecipeViewSet, self).retrieve(request, *args, **kwargs)
+        return conditional_response(request, make_etag('recipe', pk, version, is_favorite), updated_at, render)
+
+    # Every field but the per-user is_favorite, which is merged into the cached bytes
+    SHARED_DETAIL_FIELDS = [f for f in RecipeSerializer.Meta.fields if f != 'is_favorite']
+
+    def render_cached_detail(self, request, pk, version, is_favorite):
+        def render():
+            serializer = RecipeSerializer(
+                self.get_object(), context=self.get_serializer_context(), fields=self.SHARED_DETAIL_FIELDS
+            )
+            return JSONRenderer().render(serializer.data)
+
+        body = recipe_detail_cache.get_or_render(pk, version, request.build_absolute_uri('/'), render)
+        # body is a compact JSON object: splice the last field in before its closing brace
+        body = body[:-1] + b',"is_favorite":' + (b'true}' if is_favorite else b'false}')
+        return HttpResponse(body, content_type='application/json')
+
+    def nutrition_bounds(self):
+        bounds = {}
+        for param, lookup in self.NUTRITION_FILTERS.items():
+            value = self.request.query_params.get(param)
+            if value in (None, ''):
+                continue
+            try:
+                bounds[lookup] = float(value)
+            except ValueError:
+                raise ValidationError({param: "Must be a number."})
+        return bounds
+
     def perform_create(self, serializer):
         serializer.save(created_by=self.request.user)
 
@@ -31,112 +211,152 @@ class RecipeViewSet(viewsets.ModelViewSet):
             return Response({"status": "removed from favorites"})
         return Response({"status": "added to favorites"})
 
+    @action(detail=True, methods=['get'])
+    def similar(self, request, pk=None):
+        """Recipes with the most similar ingredient sets (recipes.similarity), with a similarity score."""
+        try:
+            recipe_id = int(pk)
+        except ValueError:
+            raise Http404
+        ranked = similar_recipes(recipe_id)
+        if not ranked and not Recipe.objects.filter(pk=recipe_id).exists():
+            raise Http404
+
+        limit, offset = get_page_params(request)
+        page = ranked[offset:offset + limit]
+        results = RecipeSummary(request).for_ids([recipe_id for recipe_id, _ in page])
+        scores = dict(page)
+        for data in results:
+            data['similarity'] = round(scores[data['id']], 3)
+        return paginated_response(request, results, limit, offset, len(ranked) > offset + limit)
+
     @action(detail=False, methods=['get'])
     def what_can_i_cook(self, request):
         user = request.user
-        pantry_items = PantryItem.objects.filter(user=user)
-        pantry_names = {item.name.lower() for item in pantry_items}
-
-        # User data
-        user_allergies = {a.allergy_type.lower() for a in user.allergies.all()}
-        dietary_pref = getattr(user, 'dietary_profile', None)
-        health_goal = getattr(user, 'health_goal', None)
+        bounds = self.nutrition_bounds()
 
-        suggested = []
+        # User data; with the catalog and substitution stamps it decides whether a cached ranking holds
+        allergy_mask = mask_for_allergies(user.allergies.values_list('allergy_type', flat=True))
+        profile = profile_stamp(user)
+        _, dietary_preference, primary_goal = profile
+        catalog, substitutions = catalog_stamp(), substitution_stamp()
 
-        for recipe in Recipe.objects.all().prefetch_related('ingredients', 'substitutions'):
-            ingredient_names = {ing.name.lower() for ing in recipe.ingredients.all()}
+        def rank():
+            pantry_ids = frozenset(
+                PantryItem.objects.filter(user=user, catalog__isnull=False).values_list('catalog_id', flat=True)
+            )
+            engine = get_engine(catalog)
+            rows, scores = engine.score(
+                pantry_ids,
+                allergen_mask=allergy_mask,
+                dietary_preference=dietary_preference,
+                primary_goal=primary_goal,
+                nutrition_bounds=bounds,
+                graph=get_graph(substitutions),
+            )
+            # Recipe ids rather than engine rows: entries must not keep an engine alive
+            return pantry_ids, engine.recipe_ids[rows], scores
 
-            # Skip allergens
-            if user_allergies & ingredient_names:
-                continue
+        pantry_ids, recipe_ids, scores = recommendation_cache.get_or_compute(
+            user.id, ('what_can_i_cook', tuple(sorted(bounds.items()))),
+            (catalog, substitutions, allergy_mask, profile), rank,
+        )
+        engine, graph = get_engine(catalog), get_graph(substitutions)
 
-            # Dietary preference
-            if dietary_pref and dietary_pref.dietary_preference != 'none':
-                recipe_tags = {tag.lower() for tag in recipe.allergens}
-                if dietary_pref.dietary_preference.lower() not in recipe_tags:
-                    continue
-
-            missing = ingredient_names - pantry_names
-            available = ingredient_names & pantry_names
-
-            # Substitutions
-            substitutions_used = []
-            for sub in recipe.substitutions.all():
-                orig = sub.original_ingredient.lower()
-                sub_name = sub.substitute_ingredient.lower()
-                if orig in missing and sub_name in pantry_names:
-                    missing.remove(orig)
-                    available.add(sub_name)
-                    substitutions_used.append(f"{orig} -> {sub_name}")
-
-            # Nutrition totals
-            total_calories = sum(ing.quantity * ing.calories_per_unit for ing in recipe.ingredients.all())
-            total_protein = sum(ing.quantity * ing.protein_per_unit for ing in recipe.ingredients.all())
-            total_carbs = sum(ing.quantity * ing.carbs_per_unit for ing in recipe.ingredients.all())
-            total_fat = sum(ing.quantity * ing.fat_per_unit for ing in recipe.ingredients.all())
-
-            # Health goal scoring
-            health_score = 0
-            if health_goal:
-                if health_goal.primary_goal == 'weight_loss':
-                    health_score = max(0, 100 - total_calories)
-                elif health_goal.primary_goal == 'build_muscle':
-                    health_score = total_protein
-                elif health_goal.primary_goal == 'maintain_weight':
-                    health_score = max(0, 100 - abs(total_calories - 2000))
-
-            pantry_score = len(available) - len(missing)
-            final_score = pantry_score + health_score
-
-            suggested.append({
-                "recipe": recipe,
-                "available": list(available),
-                "missing": list(missing),
-                "substitutions_used": substitutions_used,
-                "score": final_score
-            })
-
-        suggested.sort(key=lambda x: x['score'], reverse=True)
+        limit, offset = get_page_params(request)
+        page_ids, page_scores, has_more = top_k_rows(recipe_ids, scores, limit, offset)
+        summary = RecipeSummary(request)
+        summary.prime(page_ids.tolist())
 
         results = []
-        for s in suggested:
-            serializer = RecipeSerializer(s['recipe'], context={'request': request})
-            data = serializer.data
-            data['available_ingredients'] = s['available']
-            data['missing_ingredients'] = s['missing']
-            data['substitutions_used'] = s['substitutions_used']
-            data['score'] = s['score']
+        for recipe_id, score in zip(page_ids.tolist(), page_scores.tolist()):
+            data = summary.get(recipe_id)
+            row = engine.row_of.get(recipe_id)
+            if data is None or row is None:
+                continue
+            available, missing, substitutions_used = engine.explain(row, pantry_ids, graph)
+            data['available_ingredients'] = available
+            data['missing_ingredients'] = missing
+            data['substitutions_used'] = substitutions_used
+            data['score'] = score
             results.append(data)
 
-        return Response(results)
+        return paginated_response(request, results, limit, offset, has_more)
 
     @action(detail=False, methods=['get'])
     def clean_up_mode(self, request):
         user = request.user
         today = timezone.now().date()
-        pantry_items = PantryItem.objects.filter(user=user)
-        soon_expiring = {item.name.lower(): item.expiry_date for item in pantry_items if item.expiry_date}
+        allergy_mask = mask_for_allergies(user.allergies.values_list('allergy_type', flat=True))
 
-        user_allergies = {a.allergy_type.lower() for a in user.allergies.all()}
+        def rank():
+            # Only items expiring within the week can add to a recipe's score
+            weights = {}
+            expiring = PantryItem.objects.filter(
+                user=user, catalog__isnull=False,
+                expiry_date__range=(today, today + timedelta(days=6)),
+            ).values_list('catalog_id', 'expiry_date')
+            for catalog_id, expiry_date in expiring:
+                weights[catalog_id] = max(weights.get(catalog_id, 0), 7 - (expiry_date - today).days)
 
-        suggestions = []
-        for recipe in Recipe.objects.all().prefetch_related('ingredients'):
-            ingredient_names = {ing.name.lower() for ing in recipe.ingredients.all()}
+            # Walk only the index entries for expiring ingredients
+            scores = {}
+            pairs = Ingredient.objects.filter(
+                catalog_id__in=weights,
+                recipe__in=Recipe.objects.without_allergens(allergy_mask),
+            ).values_list('recipe_id', 'catalog_id').distinct()
+            for recipe_id, catalog_id in pairs:
+                scores[recipe_id] = scores.get(recipe_id, 0) + weights[catalog_id]
 
-            # Skip if recipe has allergens
-            if user_allergies & ingredient_names:
-                continue
+            return (
+                np.fromiter(scores, dtype=np.int64, count=len(scores)),
+                np.fromiter(scores.values(), dtype=np.int64, count=len(scores)),
+                frozenset(weights),
+            )
+
+        recipe_ids, scores, expiring_ids = recommendation_cache.get_or_compute(
+            user.id, ('clean_up_mode', today), (catalog_stamp(), allergy_mask, profile_stamp(user)), rank
+        )
 
-            score = 0
-            for name in ingredient_names:
-                if name in soon_expiring:
-                    days_until_expiry = (soon_expiring[name] - today).days
-                    if days_until_expiry >= 0:
-                        score += max(0, 7 - days_until_expiry)
+        limit, offset = get_page_params(request)
+        page_ids, _, has_more = top_k_rows(recipe_ids, scores, limit, offset)
+        page_ids = page_ids.tolist()
 
-            suggestions.append({"recipe": recipe, "score": score})
+        # Zero-score recipes follow the scored ones in id order, fetched only when paged into
+        unscored = Recipe.objects.without_allergens(allergy_mask).exclude(
+            id__in=Ingredient.objects.filter(catalog_id__in=expiring_ids).values('recipe_id')
+        ).order_by('id')
+        if len(page_ids) < limit:
+            start = max(0, offset - len(recipe_ids))
+            needed = limit - len(page_ids)
+            tail = list(unscored.values_list('id', flat=True)[start:start + needed + 1])
+            has_more = len(tail) > needed
+            page_ids += tail[:needed]
+        elif not has_more:
+            has_more = unscored.exists()
+
+        results = RecipeSummary(request).for_ids(page_ids)
+        return paginated_response(request, results, limit, offset, has_more)
+
+    @action(detail=False, methods=['get'])
+    def cache_stats(self, request):
+        return Response({
+            "recommendations": recommendation_cache.stats(),
+            "recipe_detail": recipe_detail_cache.stats(),
+            "products": product_cache_stats(),
+        })
 
-        suggestions.sort(key=lambda x: x['score'], reverse=True)
-        results = [RecipeSerializer(s['recipe'], context={'request': request}).data for s in suggestions]
-        return Response(results)
\ No newline at end of file
+    @action(detail=False, methods=['post'])
+    def bulk_import(self, request):
+        """Multipart upload of a .jsonl or .csv file (field "file"), streamed in chunks."""
+        upload = request.FILES.get('file')
+        if upload is None:
+            raise ValidationError({"file": "A JSONL or CSV file is required."})
+        file_format = request.data.get('file_format') or (
+            'csv' if upload.name.lower().endswith('.csv') else 'jsonl'
+        )
+        if file_format not in ('jsonl', 'csv'):
+            raise ValidationError({"file_format": "Must be jsonl or csv."})
+        lines = io.TextIOWrapper(upload.file, encoding='utf-8', newline='')
+        stats = import_stream(lines, file_format, created_by=request.user)
+        return Response(stats, status=201 if stats['created'] else (400 if stats['failed'] else 200))